@@ -3,6 +3,7 @@
 # ==============================================================================
 
 # Built-in libraries
+import json  # For returning structured predictions as text
 import os  # For file and environment variable management
 from datetime import datetime, timedelta  # For working with dates and time intervals
 from zoneinfo import ZoneInfo  # For timezone support
@@ -11,12 +12,20 @@ from zoneinfo import ZoneInfo  # For timezone support
 import tkinter as tk  # For GUI creation
 from tkinter import ttk, scrolledtext  # For enhanced widgets like drop-downs and scrollable text boxes
 
-# OpenAI and Azure libraries
-from openai import AzureOpenAI  # For accessing Azure OpenAI APIs
-
-# Financial libraries
-import yfinance as yf  # For fetching stock data
-import talib  # For technical analysis of stock data (RSI, MACD, etc.)
+# Local modules
+from completion_cache import completion_cache  # On-disk cache for GPT completions
+from structured_prediction import (  # JSON schema predictions with a short, validated rationale
+    PREDICTION_FORMAT, STRUCTURED_INSTRUCTIONS, format_prediction, structured_prediction, structured_prediction_async
+)
+from price_cache import get_history  # Local OHLCV cache with incremental downloads
+from indicators import CONVERGENCE_TOLERANCE, IndicatorState, calculate_pre_window_metrics  # Vectorized technical indicators (RSI, MACD, etc.)
+from gui_worker import AnalysisWorker  # Background worker for the analyze pipeline
+from tracing import traced  # Per-stage latency spans
+from trading_calendar import is_trading_day, next_trading_day, previous_trading_day  # Oslo Børs trading days
+from lazy import LazyObject, lazy_import  # Deferred imports and client construction
+
+# Deferred imports (loaded on first use)
+yf = lazy_import("yfinance")  # For fetching company information
 
 # ==============================================================================
 # Part 2: Azure OpenAI Initialization
@@ -25,83 +34,142 @@ import talib  # For technical analysis of stock data (RSI, MACD, etc.)
 os.environ["AZURE_OPENAI_API_KEY"] = "b08434afe34a4b4a96caec0bc074338a"
 os.environ["AZURE_OPENAI_ENDPOINT"] = "https://gpt-ban443-2.openai.azure.com/openai/deployments/Group03/chat/completions?api-version=2023-03-15-preview"
 
-client = AzureOpenAI(api_key=os.getenv("AZURE_OPENAI_API_KEY"), api_version="2023-05-15",
-                     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"))
+
+def create_openai_client():
+    """Create the Azure OpenAI client (called on the first GPT request)."""
+    from openai import AzureOpenAI  # Deferred: importing openai is slow
+    return AzureOpenAI(api_key=os.getenv("AZURE_OPENAI_API_KEY"), api_version="2024-08-01-preview",
+                       azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"))
+
+
+client = LazyObject(create_openai_client)
 
 # ==============================================================================
 # Part 3: Utility functions
 # ==============================================================================
 
-def gpt_prediction(final_prompt):
-    """Fetch GPT prediction."""
+def prediction_messages(final_prompt, structured=False):
+    """
+    Build the chat messages for the prediction request: the static instructions first and
+    the data from prepare_final_prompt() last, so consecutive requests share a long prefix.
+    """
+    instructions = PREDICTION_INSTRUCTIONS + (STRUCTURED_INSTRUCTIONS if structured else "")
+    return [
+        {"role": "system",
+         "content": "You are an expert at predicting stock price movement for Norwegian stocks based on stock data, "
+                    "technical indicators and trends, with a focus on predicting short-term movements"},
+        {"role": "user", "content": f"{instructions}\n\n{final_prompt}"}
+    ]
+
+
+@traced()
+def gpt_prediction(final_prompt, on_token=None, prediction_format=None):
+    """
+    Fetch GPT prediction. With `on_token`, the text is streamed to the callback as it is generated.
+    In the "json" prediction format the answer is a validated {class, confidence, rationale} object,
+    returned as JSON text (the callback gets it formatted for display).
+    """
     try:
-        response = client.chat.completions.create(
+        if (prediction_format or PREDICTION_FORMAT) == "json":
+            prediction = structured_prediction(client, prediction_messages(final_prompt, structured=True))
+            if on_token is not None:
+                on_token(format_prediction(prediction))
+            return json.dumps(prediction)
+
+        # Served from the local completion cache when the same request was made before
+        return completion_cache.complete(
+            client,
             model="GPT4o-API",
-            messages=[
-                {"role": "system",
-                 "content": "You are an expert at predicting stock price movement for Norwegian stocks based on stock data, "
-                            "technical indicators and trends, with a focus on predicting short-term movements"},
-                {"role": "user", "content": final_prompt}
-            ],
+            messages=prediction_messages(final_prompt),
             max_tokens=1800,
-            temperature=0.3
+            temperature=0.3,
+            on_token=on_token
         )
-        return response.choices[0].message.content.strip()
     except Exception as e:
         return f"Error: Exception occurred during prediction: {str(e)}"
 
+
+async def gpt_prediction_async(final_prompt, chat_client, prediction_format=None):
+    """Fetch GPT prediction through a rate-limited async client (async_gpt.AsyncChatClient), as batch_backtest.py does."""
+    try:
+        if (prediction_format or PREDICTION_FORMAT) == "json":
+            prediction = await structured_prediction_async(
+                chat_client, prediction_messages(final_prompt, structured=True)
+            )
+            return json.dumps(prediction)
+        return await completion_cache.complete_async(
+            chat_client, prediction_messages(final_prompt), max_tokens=1800, temperature=0.3
+        )
+    except Exception as e:
+        return f"Error: Exception occurred during prediction: {str(e)}"
+
+# Static part of the prediction prompt. It is the same for every reference day, so it comes first and
+# forms a common prefix that the provider's prompt cache reuses; the reference day's data follows it.
+PREDICTION_INSTRUCTIONS = (
+    "### Prediction Task ###\n"
+    "Using the factors below, predict the stock price movement of the company over the next 3 trading days. "
+    "This is defined as the percentage change from the reference day's closing price to the closing price at the end of the third trading day.\n\n"
+
+    "### Classification Rules ###\n"
+    "- **Bullish**: Corresponding to a price increase of more than +2%.\n"
+    "- **Neutral**: Corresponding to a price change between -2% and +2% (inclusive).\n"
+    "- **Bearish**: Corresponding to a price decrease of more than -2%.\n\n"
+
+    "### Provide Prediction ###\n"
+    "Provide your prediction with a concise rationale, addressing the following:\n"
+    "- How reference-day metrics support the prediction.\n"
+    "- How short-term indicators (calculated from data before the reference day) reflect recent price behavior leading up to the reference day.\n"
+    "- How intermediate-term indicators (calculated from data before the reference day) provide broader context for the outlook.\n"
+    "- Consider the sector and market capitalization as context for expected volatility and behavior.\n"
+    "Note: The provided data stops at the reference day. Your prediction should focus on post-reference price movement starting from the closing price of the reference day."
+)
+
+# Template for the per-reference-day data, filled in by prepare_final_prompt()
+FINAL_PROMPT_TEMPLATE = (
+    "### Company Details ###\n"
+    "- **Symbol**: {symbol}\n"
+    "- **Sector**: {sector} (e.g., Technology, Energy, Healthcare, etc.)\n"
+    "- **Market Capitalization**: {market_cap:,} NOK\n\n"
+
+    "### Reference Day Metrics ###\n"
+    "- **Reference Day Price Change**: {reference[price_change]}% (Change from open to close on the reference day)\n"
+    "- **Reference Day Closing Price**: {reference[closing_price]:.2f}NOK (Final price at market close on the reference day)\n"
+    "- **Intraday Volatility (Reference Day**): {reference[volatility]:.2f}NOK (High - Low price range on the reference day)\n"
+    "- **Reference-Day Volume Spike**: {reference[volume_spike]:.2f}% (Volume compared to 5-day average before reference)\n\n"
+
+    "### Short-Term Technical Indicators ###\n"
+    "- **Pre-reference 3-Day Moving Average**: {pre[three_day_ma]:.2f}NOK\n"
+    "(Calculated using data from 3 trading days prior to the reference, ending with the closing price on the day before the reference).\n"
+    "- **Pre-reference 5-Day Price Momentum**: {pre[five_day_momentum]:.2f}%\n"
+    "(Momentum of price changes over the 5 trading days leading up to, but not including, the reference day).\n"
+    "- **Pre-reference ATR (3-Days)**: {pre[atr_three_day]:.2f}NOK\n"
+    "(Average True Range calculated over the 3 trading days prior to the reference).\n"
+    "- **Pre-reference 5-Day RSI**: {pre[rsi_5_value]:.2f} ({pre[rsi_5_status]})\n\n"
+    "(Relative Strength Index calculated for the 5 trading days leading up to, but not including, the reference day).\n\n"
+
+    "### Intermediate-Term Technical Indicators ###\n"
+    "- **Pre-reference 20-Day Moving Average**: {pre[twenty_day_ma]:.2f}NOK\n"
+    "(Intermediate trend calculated using data from the 20 trading days prior to the reference, ending with the closing price on the day before the reference).\n"
+    "- **Pre-reference 20-Day RSI**: {pre[rsi_20_value]:.2f} ({pre[rsi_20_status]})\n"
+    "(Relative Strength Index calculated for the 20 trading days leading up to, but not including, the reference day).\n"
+    "- **Pre-reference MACD (12-26-9)**: {pre[macd_value]:.2f}, MACD Signal: {pre[macd_signal_value]:.2f} "
+    "({pre[macd_status]})\n"
+    "(Momentum and trend changes calculated using data up to, but not including, the reference day).\n"
+)
+
+
 def prepare_final_prompt(symbol, reference_metrics, pre_reference_metrics, sector, market_cap):
     """
-    Prepare the final prompt for GPT based on the calculated metrics.
+    Prepare the per-reference-day part of the prompt for GPT based on the calculated metrics.
+    It is sent after PREDICTION_INSTRUCTIONS (see prediction_messages).
     """
-    return (
-        f"### Company Details ###\n"
-        f"- **Sector**: {sector} (e.g., Technology, Energy, Healthcare, etc.)\n"
-        f"- **Market Capitalization**: {market_cap:,} NOK\n\n"
-
-        f"### Reference Day Metrics ###\n"
-        f"- **Reference Day Price Change**: {reference_metrics['price_change']}% (Change from open to close on the reference day)\n"
-        f"- **Reference Day Closing Price**: {reference_metrics['closing_price']:.2f}NOK (Final price at market close on the reference day)\n"
-        f"- **Intraday Volatility (Reference Day**): {reference_metrics['volatility']:.2f}NOK (High - Low price range on the reference day)\n"
-        f"- **Reference-Day Volume Spike**: {reference_metrics['volume_spike']:.2f}% (Volume compared to 5-day average before reference)\n\n"
-
-        f"### Short-Term Technical Indicators ###\n"
-        f"- **Pre-reference 3-Day Moving Average**: {pre_reference_metrics['three_day_ma']:.2f}NOK\n"
-        f"(Calculated using data from 3 trading days prior to the reference, ending with the closing price on the day before the reference).\n"
-        f"- **Pre-reference 5-Day Price Momentum**: {pre_reference_metrics['five_day_momentum']:.2f}%\n"
-        f"(Momentum of price changes over the 5 trading days leading up to, but not including, the reference day).\n"
-        f"- **Pre-reference ATR (3-Days)**: {pre_reference_metrics['atr_three_day']:.2f}NOK\n"
-        f"(Average True Range calculated over the 3 trading days prior to the reference).\n"
-        f"- **Pre-reference 5-Day RSI**: {pre_reference_metrics['rsi_5_value']:.2f} ({pre_reference_metrics['rsi_5_status']})\n\n"
-        f"(Relative Strength Index calculated for the 5 trading days leading up to, but not including, the reference day).\n\n"
-
-        f"### Intermediate-Term Technical Indicators ###\n"
-        f"- **Pre-reference 20-Day Moving Average**: {pre_reference_metrics['twenty_day_ma']:.2f}NOK\n"
-        f"(Intermediate trend calculated using data from the 20 trading days prior to the reference, ending with the closing price on the day before the reference).\n"
-        f"- **Pre-reference 20-Day RSI**: {pre_reference_metrics['rsi_20_value']:.2f} ({pre_reference_metrics['rsi_20_status']})\n"
-        f"(Relative Strength Index calculated for the 20 trading days leading up to, but not including, the reference day).\n"
-        f"- **Pre-reference MACD (12-26-9)**: {pre_reference_metrics['macd_value']:.2f}, MACD Signal: {pre_reference_metrics['macd_signal_value']:.2f} "
-        f"({pre_reference_metrics['macd_status']})\n"
-        f"(Momentum and trend changes calculated using data up to, but not including, the reference day).\n"
-
-        f"### Prediction Task ###\n"
-        f"Using the factors above, predict the stock price movement for {symbol} over the next 3 trading days. "
-        f"This is defined as the percentage change from the reference day's closing price to the closing price at the end of the third trading day.\n\n"
-
-        f"### Classification Rules ###\n"
-        f"- **Bullish**: Corresponding to a price increase of more than +2%.\n"
-        f"- **Neutral**: Corresponding to a price change between -2% and +2% (inclusive).\n"
-        f"- **Bearish**: Corresponding to a price decrease of more than -2%.\n\n"
-
-        f"### Provide Prediction ###\n"
-        f"Provide your prediction with a concise rationale, addressing the following:\n"
-        f"- How reference-day metrics support the prediction.\n"
-        f"- How short-term indicators (calculated from data before the reference day) reflect recent price behavior leading up to the reference day.\n"
-        f"- How intermediate-term indicators (calculated from data before the reference day) provide broader context for the outlook.\n"
-        f"- Consider the sector and market capitalization as context for expected volatility and behavior.\n"
-        f"Note: The provided data stops at the reference day. Your prediction should focus on post-reference price movement starting from the closing price of the reference day."
+    return FINAL_PROMPT_TEMPLATE.format(
+        symbol=symbol, sector=sector, market_cap=market_cap,
+        reference=reference_metrics, pre=pre_reference_metrics
     )
 
+
+@traced()
 def fetch_company_info(symbol, reference_metrics):
     """
     Fetch and return company information including sector and market capitalization.
@@ -121,19 +189,27 @@ def fetch_company_info(symbol, reference_metrics):
 # Part 4: Calculation functions
 # ==============================================================================
 
-def calculate_reference_day_metrics(symbol, reference_date_str, lookback_years=1):
+@traced()
+def calculate_reference_day_metrics(symbol, reference_date_str, tolerance=CONVERGENCE_TOLERANCE):
     """
     Calculate metrics for the reference day.
+
+    Only the trading days the indicators need to converge within `tolerance`
+    are fetched before the reference (see IndicatorState.warmup_bars).
     """
     try:
         # Parse reference date
         reference_date = datetime.strptime(reference_date_str, "%Y-%m-%d").replace(tzinfo=ZoneInfo("Europe/Oslo"))
-        lookback_days = lookback_years * 365
 
-        # Fetch historical stock data
-        stock_data = yf.Ticker(symbol).history(
-            start=(reference_date - timedelta(days=lookback_days)).strftime("%Y-%m-%d"),
-            end=(reference_date + timedelta(days=20)).strftime("%Y-%m-%d")
+        # Reject holidays and weekends before downloading anything
+        if not is_trading_day(reference_date):
+            raise ValueError(f"The reference date {reference_date} is not a valid trading day.")
+
+        # Fetch historical stock data up to and including the 3rd trading day after the reference
+        stock_data = get_history(
+            symbol,
+            start=previous_trading_day(reference_date, IndicatorState.warmup_bars(tolerance)).strftime("%Y-%m-%d"),
+            end=(next_trading_day(reference_date, 3) + timedelta(days=1)).strftime("%Y-%m-%d")
         )
 
         # Validate if data is empty
@@ -176,125 +252,17 @@ def calculate_reference_day_metrics(symbol, reference_date_str, lookback_years=1
 def calculate_pre_reference_data(stock_data, reference_date):
     """
     Calculate pre-reference data metrics for a given stock data and reference date.
+
+    The indicators are computed as vectorized array kernels (see indicators.py)
+    instead of being added as columns to the DataFrame.
     """
     try:
-        # Drop rows with missing 'Close' values
-        stock_data = stock_data.dropna(subset=["Close"])
-
-        # Ensure enough data for RSI calculation
-        if len(stock_data) >= 5:
-            stock_data["RSI_5"] = talib.RSI(stock_data["Close"], timeperiod=5)
-            stock_data["RSI_20"] = talib.RSI(stock_data["Close"], timeperiod=20)
-        else:
-            raise ValueError("RSI_5 could not be calculated. Ensure sufficient data is available.")
-
-        # Calculate MACD
-        stock_data["MACD"], stock_data["MACD_signal"], _ = talib.MACD(
-            stock_data["Close"], fastperiod=12, slowperiod=26, signalperiod=9
-        )
-
-        # Validate MACD calculation
-        if stock_data["MACD"].isna().all() or stock_data["MACD_signal"].isna().all():
-            raise ValueError("MACD could not be calculated. Ensure sufficient data is available.")
-
-        # Calculate ATR
-        stock_data["Previous_Close"] = stock_data["Close"].shift(1)
-        stock_data["TR"] = stock_data.apply(
-            lambda row: max(
-                row["High"] - row["Low"],  # High - Low
-                abs(row["High"] - row["Previous_Close"]),  # High - Previous Close
-                abs(row["Low"] - row["Previous_Close"])  # Low - Previous Close
-            ),
-            axis=1
-        )
-        stock_data["ATR_3"] = stock_data["TR"].rolling(window=3).mean()
-
-        # Validate ATR calculation
-        if stock_data["ATR_3"].isna().all():
-            raise ValueError("ATR_3 could not be calculated. Ensure sufficient data is available.")
-
-        # Calculate Moving Averages
-        stock_data["3_day_MA"] = stock_data["Close"].rolling(window=3).mean()
-        stock_data["20_day_MA"] = stock_data["Close"].rolling(window=20).mean()
-
-        # Validate Moving Averages
-        if stock_data["3_day_MA"].isna().all():
-            raise ValueError("3_day_MA could not be calculated. Ensure sufficient data is available.")
-        if stock_data["20_day_MA"].isna().all():
-            raise ValueError("20_day_MA could not be calculated. Ensure sufficient data is available.")
-
-        # Calculate Momentum
-        stock_data["5_day_momentum"] = (
-            (stock_data["Close"] - stock_data["Close"].shift(5)) / stock_data["Close"].shift(5)
-        ) * 100
-
-        # Validate Momentum
-        if stock_data["5_day_momentum"].isna().all():
-            raise ValueError("5_day_momentum could not be calculated. Ensure sufficient data is available.")
-
-        # Filter pre-reference data
-        pre_reference_data = stock_data.loc[stock_data.index < reference_date]
-
-        if len(pre_reference_data) < 20:
-            raise ValueError("Not enough data for 20-day pre-reference analysis.")
-
-        # Tail subsets
-        pre_reference_20d = pre_reference_data.tail(20)
-        pre_reference_10d = pre_reference_data.tail(10)
-        pre_reference_5d = pre_reference_data.tail(5)
-
-        # Metrics dictionary aligned with prompt names
-        metrics = {}
-
-        # Volatility metrics
-        metrics["pre_reference_volatility_5d"] = pre_reference_5d["High"].sub(pre_reference_5d["Low"]).mean()
-        metrics["pre_reference_volatility_10d"] = pre_reference_10d["High"].sub(pre_reference_10d["Low"]).mean()
-
-        # Price change percentages
-        metrics["pre_reference_change_5d"] = round(
-            ((pre_reference_5d["Close"].iloc[-1] - pre_reference_5d["Close"].iloc[0]) /
-             pre_reference_5d["Close"].iloc[0]) * 100, 2)
-        metrics["pre_reference_change_10d"] = round(
-            ((pre_reference_10d["Close"].iloc[-1] - pre_reference_10d["Close"].iloc[0]) /
-             pre_reference_10d["Close"].iloc[0]) * 100, 2)
-        metrics["pre_reference_change_20d"] = round(
-            ((pre_reference_20d["Close"].iloc[-1] - pre_reference_20d["Close"].iloc[0]) /
-             pre_reference_20d["Close"].iloc[0]) * 100, 2)
-
-        # Latest RSI, MACD, and Moving Averages values
-        last_row = pre_reference_data.iloc[-1]
-        metrics["rsi_5_value"] = last_row["RSI_5"]
-        metrics["rsi_20_value"] = last_row["RSI_20"]
-        metrics["macd_value"] = last_row["MACD"]
-        metrics["macd_signal_value"] = last_row["MACD_signal"]
-        metrics["atr_three_day"] = last_row["ATR_3"]
-        metrics["three_day_ma"] = last_row["3_day_MA"]
-        metrics["twenty_day_ma"] = last_row["20_day_MA"]
-        metrics["five_day_momentum"] = last_row["5_day_momentum"]
-
-        # Determine RSI statuses
-        metrics["rsi_5_status"] = (
-            "Overbought" if metrics["rsi_5_value"] > 70
-            else "Oversold" if metrics["rsi_5_value"] < 30
-            else "Neutral"
-        )
-        metrics["rsi_20_status"] = (
-            "Overbought" if metrics["rsi_20_value"] > 70
-            else "Oversold" if metrics["rsi_20_value"] < 30
-            else "Neutral"
-        )
-
-        # Determine MACD status
-        metrics["macd_status"] = (
-            "Bullish Crossover" if metrics["macd_value"] > metrics["macd_signal_value"]
-            else "Bearish Crossover"
-        )
-
-        return metrics
+        return calculate_pre_window_metrics(stock_data, reference_date, label="reference")
     except Exception as e:
         raise ValueError(f"Error in pre-reference data calculations: {str(e)}")
 
 
+@traced()
 def calculate_post_reference_metrics(stock_data, reference_date, reference_day_close):
     """
     Calculate post-reference metrics.
@@ -321,6 +289,12 @@ def calculate_post_reference_metrics(stock_data, reference_date, reference_day_c
 # Part 5: Display functions
 # ==============================================================================
 
+def start_streamed_section(chat_display, heading):
+    """Insert a section heading and return a callback that appends streamed text below it."""
+    chat_display.insert(tk.END, f"### {heading} ###\n")
+    return lambda token: chat_display.insert(tk.END, token)
+
+
 def display_data(chat_display, reference_date_str, sector, market_cap, reference_metrics, pre_reference_metrics):
     """
     Display the company and stock data used in the prompt in the chat display.
@@ -379,7 +353,7 @@ class ChatbotGUI:
         master.resizable(True, True)
 
         self.create_widgets()
-
+        self.worker = AnalysisWorker(master, self.chat_display, self.status_var)
 
     def create_widgets(self):
         """Create input fields and buttons for the chatbot interface."""
@@ -394,8 +368,20 @@ class ChatbotGUI:
         self.reference_date_entry = ttk.Entry(self.master, width=50)
         self.reference_date_entry.pack(pady=5)
 
-        # Button to submit the query
-        ttk.Button(self.master, text="Analyze", command=self.analyze).pack(pady=10)
+        # Prose answer with the full rationale, or a structured prediction with a short one
+        self.full_rationale_var = tk.BooleanVar(value=PREDICTION_FORMAT != "json")
+        ttk.Checkbutton(self.master, text="Full rationale (unchecked: short structured prediction)",
+                        variable=self.full_rationale_var).pack(pady=5)
+
+        # Buttons to submit the query or cancel the running analysis
+        button_frame = ttk.Frame(self.master)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Analyze", command=self.analyze).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Cancel", command=self.cancel).pack(side=tk.LEFT, padx=5)
+
+        # Status line showing the current stage and the number of queued analyses
+        self.status_var = tk.StringVar(value="Ready.")
+        ttk.Label(self.master, textvariable=self.status_var).pack()
 
         # Scrollable text box for displaying the result
         self.chat_display = scrolledtext.ScrolledText(self.master, wrap=tk.WORD, width=80, height=20)
@@ -429,41 +415,56 @@ class ChatbotGUI:
     # -------------------------------------------------------------------------
 
     def analyze(self):
-        """Handle the user's query and fetch the appropriate data for analysis."""
+        """Validate the user's query and queue the analysis on the background worker."""
         # Validate inputs
         reference_date_str, reference_date, symbol = self.validate_inputs()
         if not reference_date_str or not reference_date or not symbol:
             return  # Exit if validation fails
 
+        self.worker.submit(
+            f"{symbol} on {reference_date_str}", self.run_analysis,
+            reference_date_str, reference_date, symbol, "text" if self.full_rationale_var.get() else "json"
+        )
+
+    def cancel(self):
+        """Cancel the analysis that is currently running."""
+        self.worker.cancel()
+
+    def run_analysis(self, job, reference_date_str, reference_date, symbol, prediction_format=None):
+        """Fetch the data for one analysis (runs on the worker thread and writes to the job)."""
         try:
             # Calculate reference day metrics
+            job.progress("Calculating reference day metrics")
             reference_metrics = calculate_reference_day_metrics(symbol, reference_date_str)
             stock_data = reference_metrics.pop("stock_data")
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error calculating reference day metrics: {str(e)}\n\n")
+            job.insert(tk.END, f"Error calculating reference day metrics: {str(e)}\n\n")
             return
 
         try:
             # Calculate pre-reference metrics
+            job.progress("Calculating pre-reference metrics")
             pre_reference_metrics = calculate_pre_reference_data(stock_data, reference_date)
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error calculating pre-reference metrics: {str(e)}\n\n")
+            job.insert(tk.END, f"Error calculating pre-reference metrics: {str(e)}\n\n")
             return
 
         try:
             # Fetch company information
+            job.progress("Fetching company information")
             sector, market_cap = fetch_company_info(symbol, reference_metrics)
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error fetching company information: {str(e)}\n\n")
+            job.insert(tk.END, f"Error fetching company information: {str(e)}\n\n")
             return
 
         try:
             # Calculate post-reference metrics
+            job.progress("Calculating post-reference metrics")
             post_reference_metrics = calculate_post_reference_metrics(
                 stock_data, reference_date, reference_metrics["closing_price"]
             )
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error calculating post-reference metrics: {str(e)}\n\n")
+            job.insert(tk.END, f"Error calculating post-reference metrics: {str(e)}\n\n")
             return
 
         try:
@@ -472,33 +473,35 @@ class ChatbotGUI:
                 symbol, reference_metrics, pre_reference_metrics, sector, market_cap
             )
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error preparing the prompt: {str(e)}\n")
+            job.insert(tk.END, f"Error preparing the prompt: {str(e)}\n")
             return
 
         try:
             # Display data used in the prompt
             display_data(
-                self.chat_display, reference_date_str, sector, market_cap,
+                job, reference_date_str, sector, market_cap,
                 reference_metrics, pre_reference_metrics
             )
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error displaying data: {str(e)}\n")
+            job.insert(tk.END, f"Error displaying data: {str(e)}\n")
             return
 
         try:
-            prediction = gpt_prediction(final_prompt)
-            if "Error" in prediction:
+            job.progress("Fetching prediction")
+            on_token = start_streamed_section(job, "Prediction")
+            prediction = gpt_prediction(final_prompt, on_token, prediction_format)
+            if prediction.startswith("Error"):
                 raise ValueError("GPT failed to generate a prediction.")
-            self.chat_display.insert(tk.END, f"### Prediction ###\n{prediction}\n\n")
+            job.insert(tk.END, "\n\n")
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error fetching prediction: {str(e)}\n")
+            job.insert(tk.END, f"Error fetching prediction: {str(e)}\n")
 
         try:
             # Display post-reference-day data for validation
 
-            display_post_reference_data(self.chat_display, post_reference_metrics)
+            display_post_reference_data(job, post_reference_metrics)
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error displaying post-reference data: {str(e)}\n")
+            job.insert(tk.END, f"Error displaying post-reference data: {str(e)}\n")
             return
 
 
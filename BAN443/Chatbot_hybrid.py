@@ -3,6 +3,7 @@
 # ==============================================================================
 
 # Standard libraries
+import json  # For returning structured predictions as text
 import os  # For file and environment variable management
 from datetime import datetime, timedelta  # For working with dates and time intervals
 from zoneinfo import ZoneInfo  # For timezone support
@@ -11,14 +12,26 @@ from zoneinfo import ZoneInfo  # For timezone support
 import tkinter as tk  # For GUI creation
 from tkinter import ttk, scrolledtext  # For enhanced widgets like drop-downs and scrollable text boxes
 
-# Azure and OpenAI libraries
-from openai import AzureOpenAI  # For accessing Azure OpenAI APIs
-from azure.storage.blob import BlobServiceClient  # For working with Azure Blob Storage
-
-# Third-pary libraries
-import yfinance as yf  # For fetching stock data
-import talib  # For technical analysis of stock data (RSI, MACD, etc.)
-import fitz  # PyMuPDF for extracting text from PDFs
+# Local modules
+from article_sentiment import CLASSIFICATION_FORMAT, aggregate_sentiments, score_articles  # Per-article sentiment cache
+from article_dedup import describe_duplicates, remove_near_duplicates  # MinHash near-duplicate detection
+from sentiment_lexicon import SENTIMENT_MODE, SENTIMENT_MODES, prescore_sentiment  # Finance-lexicon scorer and GPT gate
+from article_ingest import ingest_articles  # Parallel, cached article download and text extraction
+from completion_cache import completion_cache  # On-disk cache for GPT completions
+from structured_prediction import (  # JSON schema predictions with a short, validated rationale
+    PREDICTION_FORMAT, STRUCTURED_INSTRUCTIONS, format_prediction, structured_prediction, structured_prediction_async
+)
+from price_cache import company_name, get_history  # Local OHLCV cache with incremental downloads
+from indicators import CONVERGENCE_TOLERANCE, IndicatorState, calculate_pre_window_metrics  # Vectorized technical indicators (RSI, MACD, etc.)
+from gui_worker import AnalysisWorker  # Background worker for the analyze pipeline
+from tracing import traced  # Per-stage latency spans
+from trading_calendar import is_trading_day, next_trading_day, previous_trading_day  # Oslo Børs trading days
+from lazy import LazyObject, lazy_import  # Deferred imports and client construction
+from blob_listing import BlobNameIndex  # Paginated, cached and searchable blob names
+from article_index import MAX_ARTICLE_AGE_DAYS, relevant_articles  # BM25 search over the extracted articles
+
+# Deferred imports (loaded on first use)
+yf = lazy_import("yfinance")  # For fetching company information
 
 # ==============================================================================
 # Part 2: Azure OpenAI Initialization
@@ -26,16 +39,32 @@ import fitz  # PyMuPDF for extracting text from PDFs
 
 os.environ["AZURE_OPENAI_API_KEY"] = "add key here"
 os.environ["AZURE_OPENAI_ENDPOINT"] = "add endpoint here"
-client = AzureOpenAI(api_key=os.getenv("AZURE_OPENAI_API_KEY"), api_version="2023-05-15",
-                     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"))
+
+
+def create_openai_client():
+    """Create the Azure OpenAI client (called on the first GPT request)."""
+    from openai import AzureOpenAI  # Deferred: importing openai is slow
+    return AzureOpenAI(api_key=os.getenv("AZURE_OPENAI_API_KEY"), api_version="2024-08-01-preview",
+                       azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"))
+
+
+client = LazyObject(create_openai_client)
 
 # ==============================================================================
 # Part 3: Set up Blob Service Client
 # ==============================================================================
 connection_string = "add string here"
 container_name = "chatbot-articles"
-blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-container_client = blob_service_client.get_container_client(container_name)
+
+
+def create_container_client():
+    """Create the blob container client (called on the first blob request)."""
+    from azure.storage.blob import BlobServiceClient  # Deferred: importing the Azure SDK is slow
+    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    return blob_service_client.get_container_client(container_name)
+
+
+container_client = LazyObject(create_container_client)
 
 # ==============================================================================
 # Part 4: Utility Functions
@@ -43,103 +72,139 @@ container_client = blob_service_client.get_container_client(container_name)
 
 def download_pdf(blob_name):
     """Download a PDF from Azure Blob Storage and extract its text."""
-    blob_client = container_client.get_blob_client(blob_name)
-    pdf_content = blob_client.download_blob().readall()
-
-    pdf_path = f'downloaded_{blob_name}'
-    with open(pdf_path, 'wb') as pdf_file:
-        pdf_file.write(pdf_content)
-
-    return extract_text_from_pdf(pdf_path)
+    return ingest_articles(container_client, [blob_name])[blob_name]
 
 
-def extract_text_from_pdf(pdf_path):
-    """Extract text from a downloaded PDF file."""
-    text = ""
-    with fitz.open(pdf_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
+def process_articles(selected_articles):
+    """Download and extract text from the selected articles concurrently, in memory."""
+    return ingest_articles(container_client, selected_articles)
 
 
-def process_articles(selected_articles):
-    """Download and extract text from the selected articles."""
-    return {name: download_pdf(name) for name in selected_articles}
+def prediction_messages(final_prompt, structured=False):
+    """
+    Build the chat messages for the prediction request: the static instructions first and
+    the data from prepare_final_prompt() last, so consecutive requests share a long prefix.
+    """
+    instructions = PREDICTION_INSTRUCTIONS + (STRUCTURED_INSTRUCTIONS if structured else "")
+    return [
+        {"role": "system",
+          "content": "You are an expert at predicting stock price movement for Norwegian stocks based on sentiment in the news,"
+                     "stock data, technical indicators and trends, with a focus on predicting short-term movements "},
+        {"role": "user", "content": f"{instructions}\n\n{final_prompt}"}
+    ]
 
 
-def gpt_prediction(final_prompt):
-    """Fetch GPT prediction."""
+@traced()
+def gpt_prediction(final_prompt, on_token=None, prediction_format=None):
+    """
+    Fetch GPT prediction. With `on_token`, the text is streamed to the callback as it is generated.
+    In the "json" prediction format the answer is a validated {class, confidence, rationale} object,
+    returned as JSON text (the callback gets it formatted for display).
+    """
     try:
-        response = client.chat.completions.create(
+        if (prediction_format or PREDICTION_FORMAT) == "json":
+            prediction = structured_prediction(client, prediction_messages(final_prompt, structured=True))
+            if on_token is not None:
+                on_token(format_prediction(prediction))
+            return json.dumps(prediction)
+
+        # Served from the local completion cache when the same request was made before
+        return completion_cache.complete(
+            client,
             model="GPT4o-API",
-            messages=[
-                {"role": "system",
-                  "content": "You are an expert at predicting stock price movement for Norwegian stocks based on sentiment in the news,"
-                             "stock data, technical indicators and trends, with a focus on predicting short-term movements "},
-                {"role": "user", "content": final_prompt}
-            ],
+            messages=prediction_messages(final_prompt),
             max_tokens=1800,
-            temperature=0.3
+            temperature=0.3,
+            on_token=on_token
         )
-        return response.choices[0].message.content.strip()
     except Exception as e:
         return f"Error: Exception occurred during prediction: {str(e)}"
 
+
+async def gpt_prediction_async(final_prompt, chat_client, prediction_format=None):
+    """Fetch GPT prediction through a rate-limited async client (async_gpt.AsyncChatClient), as batch_backtest.py does."""
+    try:
+        if (prediction_format or PREDICTION_FORMAT) == "json":
+            prediction = await structured_prediction_async(
+                chat_client, prediction_messages(final_prompt, structured=True)
+            )
+            return json.dumps(prediction)
+        return await completion_cache.complete_async(
+            chat_client, prediction_messages(final_prompt), max_tokens=1800, temperature=0.3
+        )
+    except Exception as e:
+        return f"Error: Exception occurred during prediction: {str(e)}"
+
+# Static part of the prediction prompt. It is the same for every event, so it comes first and
+# forms a common prefix that the provider's prompt cache reuses; the event's data follows it.
+PREDICTION_INSTRUCTIONS = (
+    "### Prediction Task ###\n"
+    "Using the factors below, predict the stock price movement of the company over the next 3 trading days. "
+    "This is defined as the percentage change from the event day's closing price to the closing price at the end of the third trading day.\n\n"
+
+    "### Classification Rules ###\n"
+    "- **Bullish**: Corresponding to a price increase of more than +2%.\n"
+    "- **Neutral**: Corresponding to a price change between -2% and +2% (inclusive).\n"
+    "- **Bearish**: Corresponding to a price decrease of more than -2%.\n\n"
+
+    "### Provide Prediction ###\n"
+    "Provide your prediction with a concise rationale, addressing the following:\n"
+    "- How sentiment analysis (based on financial news released on the event day) and event-day metrics support the prediction.\n"
+    "- How short-term indicators (calculated from data before the event day) reflect recent price behavior leading up to the event day.\n"
+    "- How intermediate-term indicators (calculated from data before the event day) provide broader context for the outlook.\n"
+    "- Consider the sector and market capitalization as context for expected volatility and behavior.\n"
+    "Note: The provided data stops at the event day. Your prediction should focus on post-event price movement starting from the closing price of the event day."
+)
+
+# Template for the per-event data, filled in by prepare_final_prompt()
+FINAL_PROMPT_TEMPLATE = (
+    "### Company Details ###\n"
+    "- **Symbol**: {symbol}\n"
+    "- **Sector**: {sector} (e.g., Technology, Energy, Healthcare, etc.)\n"
+    "- **Market Capitalization**: {market_cap:,} NOK\n\n"
+
+    "### Sentiment and Technical Analysis ###\n"
+    "- **Sentiment Analysis Summary**: {sentiment}\n\n"
+
+    "### event Day Metrics ###\n"
+    "- **Event Day Price Change**: {event[price_change]}% (Change from open to close on the event day)\n"
+    "- **Event Day Closing Price**: {event[closing_price]:.2f}NOK (Final price at market close on the event day)\n"
+    "- **Intraday Volatility (event Day)**: {event[volatility]:.2f}NOK (High - Low price range on the event day)\n"
+    "- **Event-Day Volume Spike**: {event[volume_spike]:.2f}% (Volume compared to 5-day average before event)\n\n"
+
+    "### Short-Term Technical Indicators ###\n"
+    "- **Pre-event 3-Day Moving Average**: {pre[three_day_ma]:.2f}NOK\n"
+    "(Calculated using data from 3 trading days prior to the event, ending with the closing price on the day before the event).\n"
+    "- **Pre-event 5-Day Price Momentum**: {pre[five_day_momentum]:.2f}%\n"
+    "(Momentum of price changes over the 5 trading days leading up to, but not including, the event day).\n"
+    "- **Pre-event ATR (3-Days)**: {pre[atr_three_day]:.2f}NOK\n"
+    "(Average True Range calculated over the 3 trading days prior to the event).\n"
+    "- **Pre-event 5-Day RSI**: {pre[rsi_5_value]:.2f} ({pre[rsi_5_status]})\n\n"
+    "(Relative Strength Index calculated for the 5 trading days leading up to, but not including, the event day.).\n\n"
+
+    "### Intermediate-Term Technical Indicators ###\n"
+    "- **Pre-event 20-Day Moving Average**: {pre[twenty_day_ma]:.2f}NOK\n"
+    "(Intermediate trend calculated using data from the 20 trading days prior to the event, ending with the closing price on the day before the event).\n"
+    "- **Pre-event 20-Day RSI**: {pre[rsi_20_value]:.2f} ({pre[rsi_20_status]})\n"
+    "(Relative Strength Index calculated for the 20 trading days leading up to, but not including, the event day.)\n"
+    "- **Pre-event MACD (12-26-9)**: {pre[macd_value]:.2f}, MACD Signal: {pre[macd_signal_value]:.2f} "
+    "({pre[macd_status]})\n"
+    "(Momentum and trend changes calculated using data up to, but not including, the event day).\n"
+)
+
+
 def prepare_final_prompt(symbol, event_metrics, pre_event_metrics, sector, market_cap, sentiment_response):
     """
-    Prepare the final prompt for GPT based on the calculated metrics.
+    Prepare the per-event part of the prompt for GPT based on the calculated metrics.
+    It is sent after PREDICTION_INSTRUCTIONS (see prediction_messages).
     """
-    return (
-        f"### Company Details ###\n"
-        f"- **Sector**: {sector} (e.g., Technology, Energy, Healthcare, etc.)\n"
-        f"- **Market Capitalization**: {market_cap:,} NOK\n\n"
-        
-        f"### Sentiment and Technical Analysis ###\n"
-        f"- **Sentiment Analysis Summary**: {sentiment_response}\n\n"
-
-        f"### event Day Metrics ###\n"
-        f"- **Event Day Price Change**: {event_metrics['price_change']}% (Change from open to close on the event day)\n"
-        f"- **Event Day Closing Price**: {event_metrics['closing_price']:.2f}NOK (Final price at market close on the event day)\n"
-        f"- **Intraday Volatility (event Day)**: {event_metrics['volatility']:.2f}NOK (High - Low price range on the event day)\n"
-        f"- **Event-Day Volume Spike**: {event_metrics['volume_spike']:.2f}% (Volume compared to 5-day average before event)\n\n"
-
-        f"### Short-Term Technical Indicators ###\n"
-        f"- **Pre-event 3-Day Moving Average**: {pre_event_metrics['three_day_ma']:.2f}NOK\n"
-        f"(Calculated using data from 3 trading days prior to the event, ending with the closing price on the day before the event).\n"
-        f"- **Pre-event 5-Day Price Momentum**: {pre_event_metrics['five_day_momentum']:.2f}%\n"
-        f"(Momentum of price changes over the 5 trading days leading up to, but not including, the event day).\n"
-        f"- **Pre-event ATR (3-Days)**: {pre_event_metrics['atr_three_day']:.2f}NOK\n"
-        f"(Average True Range calculated over the 3 trading days prior to the event).\n"
-        f"- **Pre-event 5-Day RSI**: {pre_event_metrics['rsi_5_value']:.2f} ({pre_event_metrics['rsi_5_status']})\n\n"
-        f"(Relative Strength Index calculated for the 5 trading days leading up to, but not including, the event day.).\n\n"
-
-        f"### Intermediate-Term Technical Indicators ###\n"
-        f"- **Pre-event 20-Day Moving Average**: {pre_event_metrics['twenty_day_ma']:.2f}NOK\n"
-        f"(Intermediate trend calculated using data from the 20 trading days prior to the event, ending with the closing price on the day before the event).\n"
-        f"- **Pre-event 20-Day RSI**: {pre_event_metrics['rsi_20_value']:.2f} ({pre_event_metrics['rsi_20_status']})\n"
-        f"(Relative Strength Index calculated for the 20 trading days leading up to, but not including, the event day.)\n"
-        f"- **Pre-event MACD (12-26-9)**: {pre_event_metrics['macd_value']:.2f}, MACD Signal: {pre_event_metrics['macd_signal_value']:.2f} "
-        f"({pre_event_metrics['macd_status']})\n"
-        f"(Momentum and trend changes calculated using data up to, but not including, the event day).\n"
-
-        f"### Prediction Task ###\n"
-        f"Using the factors above, predict the stock price movement for {symbol} over the next 3 trading days. "
-        f"This is defined as the percentage change from the event day's closing price to the closing price at the end of the third trading day.\n\n"
-
-        f"### Classification Rules ###\n"
-        f"- **Bullish**: Corresponding to a price increase of more than +2%.\n"
-        f"- **Neutral**: Corresponding to a price change between -2% and +2% (inclusive).\n"
-        f"- **Bearish**: Corresponding to a price decrease of more than -2%.\n\n"
-
-        f"### Provide Prediction ###\n"
-        f"Provide your prediction with a concise rationale, addressing the following:\n"
-        f"- How sentiment analysis (based on financial news released on the event day) and event-day metrics support the prediction.\n"
-        f"- How short-term indicators (calculated from data before the event day) reflect recent price behavior leading up to the event day.\n"
-        f"- How intermediate-term indicators (calculated from data before the event day) provide broader context for the outlook.\n"
-        f"- Consider the sector and market capitalization as context for expected volatility and behavior.\n"
-        f"Note: The provided data stops at the event day. Your prediction should focus on post-event price movement starting from the closing price of the event day."
+    return FINAL_PROMPT_TEMPLATE.format(
+        symbol=symbol, sector=sector, market_cap=market_cap,
+        event=event_metrics, pre=pre_event_metrics, sentiment=sentiment_response
     )
 
+
+@traced()
 def fetch_company_info(symbol, event_metrics):
     """
     Fetch and return company information including sector and market capitalization.
@@ -159,8 +224,8 @@ def fetch_company_info(symbol, event_metrics):
 # ==============================================================================
 # Part 5: Data Processing and Analysis
 # ==============================================================================
-def analyze_sentiments_for_articles(articles):
-    """Analyze the sentiment of articles and return combined sentiment and summary."""
+def sentiment_messages(articles):
+    """Build the chat messages for the sentiment analysis request."""
     combined_text = "\n\n".join([f"{name}: {text}" for name, text in articles.items()])
     categorization_rules = (
         "Categorization Rules for predicting stock price movement over the next 3 trading days "
@@ -176,22 +241,47 @@ def analyze_sentiments_for_articles(articles):
         f"Analyze the sentiment strength, direction, and relevance of these articles that came out today on the event date. "
         f"Evaluate how the sentiment is likely to influence investor decisions and company's stock price movement over the next 3 trading days. "
         f"Classify the sentiment using the rules below and provide both classification and a brief summary of key points driving your classification:\n\n"
-        f"{categorization_rules}\n{combined_text}"
+        f"{categorization_rules}{CLASSIFICATION_FORMAT}\n{combined_text}"
     )
+    return [
+        {"role": "system",
+          "content": "You are an expert at analyzing the implications of sentiment strength, direction, and "
+                     "relevance of financial news on stock prices, with a focus on predicting short-term movements for Norwegian stocks."},
+        {"role": "user", "content": prompt}
+    ]
+
 
+@traced()
+def analyze_sentiments_for_articles(articles, on_token=None, sentiment_mode=None):
+    """
+    Analyze the sentiment of articles and return combined sentiment and summary.
+    With `on_token`, each article's response is streamed to the callback as it is generated
+    (after a note on the skipped near duplicates), followed by the aggregate that is returned.
+    `sentiment_mode` ('gpt', 'lexicon' or 'gate') defaults to sentiment_lexicon.SENTIMENT_MODE.
+    """
     try:
-        response = client.chat.completions.create(
-            model="GPT4o-API",
-            messages=[
-                {"role": "system",
-                  "content": "You are an expert at analyzing the implications of sentiment strength, direction, and "
-                             "relevance of financial news on stock prices, with a focus on predicting short-term movements for Norwegian stocks."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.3
+        # Republished copies of the same story are sent only once
+        articles, duplicates, tokens_saved = remove_near_duplicates(articles)
+        if duplicates and on_token is not None:
+            on_token(describe_duplicates(duplicates, tokens_saved) + "\n\n")
+
+        # Clear-cut cases are answered by the finance lexicon without a GPT call
+        response = prescore_sentiment(articles, sentiment_mode)
+        if response is not None:
+            if on_token is not None:
+                on_token(response)
+            return response
+
+        # Each article is classified once and cached; the selection is aggregated from the stored results.
+        # The callback gets every article's response, the prompt only the short aggregate.
+        responses = score_articles(
+            client, articles, sentiment_messages, model="GPT4o-API", max_tokens=1000, temperature=0.3,
+            on_token=on_token
         )
-        return response.choices[0].message.content.strip()
+        response = aggregate_sentiments(responses)
+        if on_token is not None:
+            on_token(response)
+        return response
     except Exception as e:
         return f"Error: Exception occurred during prediction: {str(e)}"
 
@@ -199,19 +289,27 @@ def analyze_sentiments_for_articles(articles):
 # Part 4: Calculation functions
 # ==============================================================================
 
-def calculate_event_day_metrics(symbol, event_date_str, lookback_years=1):
+@traced()
+def calculate_event_day_metrics(symbol, event_date_str, tolerance=CONVERGENCE_TOLERANCE):
     """
     Calculate metrics for the event day.
+
+    Only the trading days the indicators need to converge within `tolerance`
+    are fetched before the event (see IndicatorState.warmup_bars).
     """
     try:
         # Parse event date
         event_date = datetime.strptime(event_date_str, "%Y-%m-%d").replace(tzinfo=ZoneInfo("Europe/Oslo"))
-        lookback_days = lookback_years * 365
 
-        # Fetch historical stock data
-        stock_data = yf.Ticker(symbol).history(
-            start=(event_date - timedelta(days=lookback_days)).strftime("%Y-%m-%d"),
-            end=(event_date + timedelta(days=20)).strftime("%Y-%m-%d")
+        # Reject holidays and weekends before downloading anything
+        if not is_trading_day(event_date):
+            raise ValueError(f"The event date {event_date} is not a valid trading day.")
+
+        # Fetch historical stock data up to and including the 3rd trading day after the event
+        stock_data = get_history(
+            symbol,
+            start=previous_trading_day(event_date, IndicatorState.warmup_bars(tolerance)).strftime("%Y-%m-%d"),
+            end=(next_trading_day(event_date, 3) + timedelta(days=1)).strftime("%Y-%m-%d")
         )
 
         # Validate if data is empty
@@ -254,134 +352,31 @@ def calculate_event_day_metrics(symbol, event_date_str, lookback_years=1):
 def calculate_pre_event_data(stock_data, event_date):
     """
     Calculate pre-event data metrics for a given stock data and event date.
+
+    The indicators are computed as vectorized array kernels (see indicators.py)
+    instead of being added as columns to the DataFrame.
     """
     try:
-        # Drop rows with missing 'Close' values
-        stock_data = stock_data.dropna(subset=["Close"])
-
-        # Ensure enough data for RSI calculation
-        if len(stock_data) >= 5:
-            stock_data["RSI_5"] = talib.RSI(stock_data["Close"], timeperiod=5)
-            stock_data["RSI_20"] = talib.RSI(stock_data["Close"], timeperiod=20)
-        else:
-            raise ValueError("RSI_5 could not be calculated. Ensure sufficient data is available.")
-
-        # Calculate MACD
-        stock_data["MACD"], stock_data["MACD_signal"], _ = talib.MACD(
-            stock_data["Close"], fastperiod=12, slowperiod=26, signalperiod=9
-        )
-
-        # Validate MACD calculation
-        if stock_data["MACD"].isna().all() or stock_data["MACD_signal"].isna().all():
-            raise ValueError("MACD could not be calculated. Ensure sufficient data is available.")
-
-        # Calculate ATR
-        stock_data["Previous_Close"] = stock_data["Close"].shift(1)
-        stock_data["TR"] = stock_data.apply(
-            lambda row: max(
-                row["High"] - row["Low"],  # High - Low
-                abs(row["High"] - row["Previous_Close"]),  # High - Previous Close
-                abs(row["Low"] - row["Previous_Close"])  # Low - Previous Close
-            ),
-            axis=1
-        )
-        stock_data["ATR_3"] = stock_data["TR"].rolling(window=3).mean()
-
-        # Validate ATR calculation
-        if stock_data["ATR_3"].isna().all():
-            raise ValueError("ATR_3 could not be calculated. Ensure sufficient data is available.")
-
-        # Calculate Moving Averages
-        stock_data["3_day_MA"] = stock_data["Close"].rolling(window=3).mean()
-        stock_data["20_day_MA"] = stock_data["Close"].rolling(window=20).mean()
-
-        # Validate Moving Averages
-        if stock_data["3_day_MA"].isna().all():
-            raise ValueError("3_day_MA could not be calculated. Ensure sufficient data is available.")
-        if stock_data["20_day_MA"].isna().all():
-            raise ValueError("20_day_MA could not be calculated. Ensure sufficient data is available.")
-
-        # Calculate Momentum
-        stock_data["5_day_momentum"] = (
-            (stock_data["Close"] - stock_data["Close"].shift(5)) / stock_data["Close"].shift(5)
-        ) * 100
-
-        # Validate Momentum
-        if stock_data["5_day_momentum"].isna().all():
-            raise ValueError("5_day_momentum could not be calculated. Ensure sufficient data is available.")
-
-        # Filter pre-event data
-        pre_event_data = stock_data.loc[stock_data.index < event_date]
-
-        if len(pre_event_data) < 20:
-            raise ValueError("Not enough data for 20-day pre-event analysis.")
-
-        # Tail subsets
-        pre_event_20d = pre_event_data.tail(20)
-        pre_event_10d = pre_event_data.tail(10)
-        pre_event_5d = pre_event_data.tail(5)
-
-        # Metrics dictionary aligned with prompt names
-        metrics = {}
-
-        # Volatility metrics
-        metrics["pre_event_volatility_5d"] = pre_event_5d["High"].sub(pre_event_5d["Low"]).mean()
-        metrics["pre_event_volatility_10d"] = pre_event_10d["High"].sub(pre_event_10d["Low"]).mean()
-
-        # Price change percentages
-        metrics["pre_event_change_5d"] = round(
-            ((pre_event_5d["Close"].iloc[-1] - pre_event_5d["Close"].iloc[0]) /
-             pre_event_5d["Close"].iloc[0]) * 100, 2)
-        metrics["pre_event_change_10d"] = round(
-            ((pre_event_10d["Close"].iloc[-1] - pre_event_10d["Close"].iloc[0]) /
-             pre_event_10d["Close"].iloc[0]) * 100, 2)
-        metrics["pre_event_change_20d"] = round(
-            ((pre_event_20d["Close"].iloc[-1] - pre_event_20d["Close"].iloc[0]) /
-             pre_event_20d["Close"].iloc[0]) * 100, 2)
-
-        # Latest RSI, MACD, and Moving Averages values
-        last_row = pre_event_data.iloc[-1]
-        metrics["rsi_5_value"] = last_row["RSI_5"]
-        metrics["rsi_20_value"] = last_row["RSI_20"]
-        metrics["macd_value"] = last_row["MACD"]
-        metrics["macd_signal_value"] = last_row["MACD_signal"]
-        metrics["atr_three_day"] = last_row["ATR_3"]
-        metrics["three_day_ma"] = last_row["3_day_MA"]
-        metrics["twenty_day_ma"] = last_row["20_day_MA"]
-        metrics["five_day_momentum"] = last_row["5_day_momentum"]
-
-        # Determine RSI statuses
-        metrics["rsi_5_status"] = (
-            "Overbought" if metrics["rsi_5_value"] > 70
-            else "Oversold" if metrics["rsi_5_value"] < 30
-            else "Neutral"
-        )
-        metrics["rsi_20_status"] = (
-            "Overbought" if metrics["rsi_20_value"] > 70
-            else "Oversold" if metrics["rsi_20_value"] < 30
-            else "Neutral"
-        )
-
-        # Determine MACD status
-        metrics["macd_status"] = (
-            "Bullish Crossover" if metrics["macd_value"] > metrics["macd_signal_value"]
-            else "Bearish Crossover"
-        )
-
-        return metrics
+        return calculate_pre_window_metrics(stock_data, event_date, label="event")
     except Exception as e:
         raise ValueError(f"Error in pre-event data calculations: {str(e)}")
 
 
+@traced()
 def calculate_post_event_metrics(symbol, event_date):
     """
     Fetch stock data and calculate post-event metrics.
     """
     try:
-        # Fetch only relevant stock data: event day + at least 3 trading days after
-        stock_data = yf.Ticker(symbol).history(
+        # Reject holidays and weekends before downloading anything
+        if not is_trading_day(event_date):
+            raise ValueError(f"The event date {event_date} is not a valid trading day.")
+
+        # Fetch only relevant stock data: event day up to and including the 3rd trading day after
+        stock_data = get_history(
+            symbol,
             start=event_date.strftime("%Y-%m-%d"),
-            end=(event_date + timedelta(days=7)).strftime("%Y-%m-%d")  # Buffer for non-trading days
+            end=(next_trading_day(event_date, 3) + timedelta(days=1)).strftime("%Y-%m-%d")
         )
 
         # Validate if data is empty
@@ -427,12 +422,10 @@ def calculate_post_event_metrics(symbol, event_date):
 # ==============================================================================
 # Part 6: Display Functions
 # ==============================================================================
-def display_sentiment_analysis(chat_display, sentiment_response):
-    """Display the sentiment analysis results in the chat display."""
-    chat_display.insert(
-        tk.END,
-        f"### Sentiment Analysis ###\n{sentiment_response}\n\n"
-    )
+def start_streamed_section(chat_display, heading):
+    """Insert a section heading and return a callback that appends streamed text below it."""
+    chat_display.insert(tk.END, f"### {heading} ###\n")
+    return lambda token: chat_display.insert(tk.END, token)
 
 
 def display_data(chat_display, event_date_str, sector, market_cap, event_metrics, pre_event_metrics):
@@ -489,6 +482,7 @@ class ChatbotGUI:
         master.resizable(True, True)
 
         self.create_widgets()
+        self.worker = AnalysisWorker(master, self.chat_display, self.status_var)
         self.load_blob_names()
 
     # -------------------------------------------------------------------------
@@ -499,9 +493,20 @@ class ChatbotGUI:
         ttk.Label(self.master, text="Select articles for sentiment analysis (hold Ctrl to select multiple):").pack(
             pady=5)
 
+        # Search field that filters the articles by name as the user types
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(self.master, textvariable=self.search_var, width=50)
+        search_entry.pack(pady=5)
+        search_entry.bind("<KeyRelease>", lambda event: self.schedule_filter())
+
         # Drop-down menu for selecting multiple articles
         self.article_listbox = tk.Listbox(self.master, selectmode=tk.MULTIPLE, width=50)
         self.article_listbox.pack(pady=5)
+        self.article_listbox.bind("<<ListboxSelect>>", lambda event: self.update_selection())
+
+        # Number of matching articles and listing progress
+        self.article_count_var = tk.StringVar()
+        ttk.Label(self.master, textvariable=self.article_count_var).pack()
 
         # Input field for stock ticker symbol
         ttk.Label(self.master, text="Enter stock symbol (e.g., DNB.OL):").pack(pady=5)
@@ -513,18 +518,82 @@ class ChatbotGUI:
         self.event_date_entry = ttk.Entry(self.master, width=50)
         self.event_date_entry.pack(pady=5)
 
-        # Button to submit the query
-        ttk.Button(self.master, text="Analyze", command=self.analyze).pack(pady=10)
+        # Sentiment scoring: GPT, the finance lexicon alone, or the lexicon with GPT for uncertain cases
+        ttk.Label(self.master, text="Sentiment scoring (gpt, lexicon or gate):").pack(pady=5)
+        self.sentiment_mode_var = tk.StringVar(value=SENTIMENT_MODE)
+        ttk.Combobox(self.master, textvariable=self.sentiment_mode_var, values=SENTIMENT_MODES,
+                     state="readonly", width=47).pack(pady=5)
+
+        # Prose answer with the full rationale, or a structured prediction with a short one
+        self.full_rationale_var = tk.BooleanVar(value=PREDICTION_FORMAT != "json")
+        ttk.Checkbutton(self.master, text="Full rationale (unchecked: short structured prediction)",
+                        variable=self.full_rationale_var).pack(pady=5)
+
+        # Buttons to submit the query or cancel the running analysis
+        button_frame = ttk.Frame(self.master)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Suggest articles", command=self.suggest_articles).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Analyze", command=self.analyze).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Cancel", command=self.cancel).pack(side=tk.LEFT, padx=5)
+
+        # Status line showing the current stage and the number of queued analyses
+        self.status_var = tk.StringVar(value="Ready.")
+        ttk.Label(self.master, textvariable=self.status_var).pack()
 
         # Scrollable text box for displaying the result
         self.chat_display = scrolledtext.ScrolledText(self.master, wrap=tk.WORD, width=80, height=20)
         self.chat_display.pack(padx=10, pady=10, expand=True, fill=tk.BOTH)
 
     def load_blob_names(self):
-        """Load available reports from the blob container."""
-        available_blobs = container_client.list_blobs()
-        for blob in available_blobs:
-            self.article_listbox.insert(tk.END, blob.name)  # Add article names to the listbox
+        """
+        Show the article names cached by the previous run right away and refresh
+        them from the blob container page by page in the background.
+        """
+        self.blob_index = BlobNameIndex(container_client, container_name=container_name)
+        self.selected_articles = []  # Kept across filtering
+        self._filter_job = None
+        self.filter_articles()
+        self.blob_index.refresh()
+        self.master.after(200, self.poll_blob_names)
+
+    def poll_blob_names(self):
+        """Add newly listed article names to the listbox until the listing is done."""
+        if self.blob_index.poll() or not self.blob_index.loading:
+            self.filter_articles()
+        if self.blob_index.loading:
+            self.master.after(200, self.poll_blob_names)
+
+    def schedule_filter(self):
+        """Filter the articles shortly after the user stops typing."""
+        if self._filter_job is not None:
+            self.master.after_cancel(self._filter_job)
+        self._filter_job = self.master.after(150, self.filter_articles)
+
+    def filter_articles(self):
+        """Show the articles matching the search field, keeping earlier selections."""
+        self._filter_job = None
+        names = self.blob_index.search(self.search_var.get())
+        self.article_listbox.delete(0, tk.END)
+        if names:
+            self.article_listbox.insert(tk.END, *names)
+        for index, name in enumerate(names):
+            if name in self.selected_articles:
+                self.article_listbox.selection_set(index)
+
+        status = f"Showing {len(names)} of {len(self.blob_index.names):,} articles"
+        if self.blob_index.loading:
+            status += " (loading...)"
+        if self.blob_index.error:
+            status += f" (listing failed: {self.blob_index.error})"
+        self.article_count_var.set(status)
+
+    def update_selection(self):
+        """Remember the selected articles, including those hidden by the current filter."""
+        visible = set(self.article_listbox.get(0, tk.END))
+        selected = [self.article_listbox.get(i) for i in self.article_listbox.curselection()]
+        self.selected_articles = [
+            name for name in self.selected_articles if name not in visible
+        ] + selected
 
     # -------------------------------------------------------------------------
     # Helper Functions
@@ -550,109 +619,153 @@ class ChatbotGUI:
         return event_date_str, event_date, symbol
 
     def get_selected_articles(self):
-        """Retrieve selected articles from the UI listbox."""
-        selected_indices = self.article_listbox.curselection()
-        return [self.article_listbox.get(i) for i in selected_indices]
+        """Retrieve selected articles from the UI listbox (including those hidden by the filter)."""
+        return list(self.selected_articles)
+
+    def suggest_articles(self):
+        """Queue a search for the indexed articles most relevant to the symbol in the days up to the event date."""
+        event_date_str, event_date, symbol = self.validate_inputs()
+        if not event_date_str or not symbol:
+            return  # Exit if validation fails
+
+        self.worker.submit(f"Article suggestions for {symbol}", self.run_suggestion, symbol, event_date)
+
+    def run_suggestion(self, job, symbol, event_date):
+        """Search the article index (runs on the worker thread, as updating the index reads the article cache)."""
+        job.progress("Searching articles")
+        names = relevant_articles(symbol, event_date, company_name(symbol))
+        if not names:
+            job.insert(
+                tk.END, f"No indexed articles about {symbol} in the {MAX_ARTICLE_AGE_DAYS} days up to the event date.\n\n"
+            )
+            return
+        job.call(self.select_articles, names)
+        job.insert(tk.END, f"Selected {len(names)} articles about {symbol}: {', '.join(names)}\n\n")
+
+    def select_articles(self, names):
+        """Select the given articles in the article list (main thread)."""
+        self.selected_articles = names
+        self.search_var.set("")
+        self.filter_articles()
 
     # -------------------------------------------------------------------------
     # Main Analyze Function
     # -------------------------------------------------------------------------
     def analyze(self):
-        """Handle the user's query and fetch the appropriate data for analysis."""
+        """Validate the user's query and queue the analysis on the background worker."""
         # Validate inputs
         event_date_str, event_date, symbol = self.validate_inputs()
         if not event_date_str or not event_date or not symbol:
             return  # Exit if validation fails
 
-        # Retrieve and process selected articles
+        # Retrieve selected articles
         selected_articles = self.get_selected_articles()
         if not selected_articles:
             self.chat_display.insert(tk.END, "No articles selected. Please choose at least one article.\n\n")
             return
 
+        self.worker.submit(
+            f"{symbol} on {event_date_str}", self.run_analysis,
+            event_date_str, event_date, symbol, selected_articles, self.sentiment_mode_var.get(),
+            "text" if self.full_rationale_var.get() else "json"
+        )
+
+    def cancel(self):
+        """Cancel the analysis that is currently running."""
+        self.worker.cancel()
+
+    def run_analysis(self, job, event_date_str, event_date, symbol, selected_articles, sentiment_mode=None,
+                     prediction_format=None):
+        """Fetch the data for one analysis (runs on the worker thread and writes to the job)."""
         try:
+            job.progress("Downloading articles")
             articles = process_articles(selected_articles)
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error processing articles: {str(e)}\n\n")
+            job.insert(tk.END, f"Error processing articles: {str(e)}\n\n")
             return
 
         # Analyze and display sentiment for the articles
         try:
-            sentiment_response = analyze_sentiments_for_articles(articles)
-            display_sentiment_analysis(self.chat_display, sentiment_response)
+            job.progress("Analyzing sentiment")
+            on_token = start_streamed_section(job, "Sentiment Analysis")
+            sentiment_response = analyze_sentiments_for_articles(articles, on_token, sentiment_mode)
+            if sentiment_response.startswith("Error"):
+                job.insert(tk.END, sentiment_response)
+            job.insert(tk.END, "\n\n")
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error analyzing sentiment: {str(e)}\n\n")
+            job.insert(tk.END, f"Error analyzing sentiment: {str(e)}\n\n")
             return
 
         try:
             # Calculate event day metrics
+            job.progress("Calculating event day metrics")
             event_metrics = calculate_event_day_metrics(symbol, event_date_str)
             stock_data = event_metrics.pop("stock_data")
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error calculating event day metrics: {str(e)}\n\n")
+            job.insert(tk.END, f"Error calculating event day metrics: {str(e)}\n\n")
             return
 
         try:
             # Calculate pre-event metrics
+            job.progress("Calculating pre-event metrics")
             pre_event_metrics = calculate_pre_event_data(stock_data, event_date)
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error calculating pre-event metrics: {str(e)}\n\n")
+            job.insert(tk.END, f"Error calculating pre-event metrics: {str(e)}\n\n")
             return
 
         try:
             # Fetch company information
+            job.progress("Fetching company information")
             sector, market_cap = fetch_company_info(symbol, event_metrics)
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error fetching company information: {str(e)}\n\n")
+            job.insert(tk.END, f"Error fetching company information: {str(e)}\n\n")
             return
 
         try:
             # Calculate post-event metrics
+            job.progress("Calculating post-event metrics")
             post_event_metrics = calculate_post_event_metrics(symbol, event_date)
-
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error calculating post-event metrics: {str(e)}\n\n")
+            job.insert(tk.END, f"Error calculating post-event metrics: {str(e)}\n\n")
             return
 
-
         try:
             # Prepare the GPT prompt
             final_prompt = prepare_final_prompt(
                 symbol, event_metrics, pre_event_metrics, sector, market_cap, sentiment_response
             )
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error preparing the prompt: {str(e)}\n")
+            job.insert(tk.END, f"Error preparing the prompt: {str(e)}\n")
             return
 
         try:
             # Display data used in the prompt
             display_data(
-                self.chat_display, event_date_str, sector, market_cap,
+                job, event_date_str, sector, market_cap,
                 event_metrics, pre_event_metrics
             )
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error displaying data: {str(e)}\n")
+            job.insert(tk.END, f"Error displaying data: {str(e)}\n")
             return
 
         try:
-            prediction = gpt_prediction(final_prompt)
-            if "Error" in prediction:
+            job.progress("Fetching prediction")
+            on_token = start_streamed_section(job, "Hybrid prediction")
+            prediction = gpt_prediction(final_prompt, on_token, prediction_format)
+            if prediction.startswith("Error"):
                 raise ValueError("GPT failed to generate a prediction.")
-            self.chat_display.insert(tk.END, f"### Hybrid prediction ###\n{prediction}\n\n")
+            job.insert(tk.END, "\n\n")
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error fetching prediction: {str(e)}\n")
+            job.insert(tk.END, f"Error fetching prediction: {str(e)}\n")
 
         try:
             # Display post-event-day data for validation
-
-            display_post_event_data(self.chat_display, post_event_metrics)
+            display_post_event_data(job, post_event_metrics)
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error displaying post-event data: {str(e)}\n")
+            job.insert(tk.END, f"Error displaying post-event data: {str(e)}\n")
             return
 
 
-
-
 # ==============================================================================
 # Part 8 - Run the GUI
 # ==============================================================================
@@ -11,31 +11,50 @@ from zoneinfo import ZoneInfo  # For timezone support
 import tkinter as tk  # For GUI creation
 from tkinter import ttk, scrolledtext  # For enhanced widgets like drop-downs and scrollable text boxes
 
-# OpenAI and Azure libraries
-from openai import AzureOpenAI  # For accessing Azure OpenAI APIs
-from azure.storage.blob import BlobServiceClient  # For working with Azure Blob Storage
-
-# Financial libraries
-import yfinance as yf  # For fetching stock data
-
-# PDF processing
-import fitz  # PyMuPDF for extracting text from PDFs
+# Local modules
+from article_sentiment import CLASSIFICATION_FORMAT, aggregate_sentiments, score_articles  # Per-article sentiment cache
+from article_dedup import describe_duplicates, remove_near_duplicates  # MinHash near-duplicate detection
+from sentiment_lexicon import SENTIMENT_MODE, SENTIMENT_MODES, prescore_sentiment  # Finance-lexicon scorer and GPT gate
+from article_ingest import ingest_articles  # Parallel, cached article download and text extraction
+from price_cache import company_name, get_history  # Local OHLCV cache with incremental downloads
+from gui_worker import AnalysisWorker  # Background worker for the analyze pipeline
+from tracing import traced  # Per-stage latency spans
+from trading_calendar import is_trading_day, next_trading_day  # Oslo Børs trading days
+from lazy import LazyObject  # Deferred imports and client construction
+from blob_listing import BlobNameIndex  # Paginated, cached and searchable blob names
+from article_index import MAX_ARTICLE_AGE_DAYS, relevant_articles  # BM25 search over the extracted articles
 
 # ==============================================================================
 # Part 2: Azure OpenAI Initialization
 # ==============================================================================
 os.environ["AZURE_OPENAI_API_KEY"] = "add key here"
 os.environ["AZURE_OPENAI_ENDPOINT"] = "add endpoint here"
-client = AzureOpenAI(api_key=os.getenv("AZURE_OPENAI_API_KEY"), api_version="2023-05-15",
-                     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"))
+
+
+def create_openai_client():
+    """Create the Azure OpenAI client (called on the first GPT request)."""
+    from openai import AzureOpenAI  # Deferred: importing openai is slow
+    return AzureOpenAI(api_key=os.getenv("AZURE_OPENAI_API_KEY"), api_version="2023-05-15",
+                       azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"))
+
+
+client = LazyObject(create_openai_client)
 
 # ==============================================================================
 # Part 3: Set up Blob Service Client
 # ==============================================================================
-connection_string == " write string here"
+connection_string = " write string here"
 container_name = "chatbot-articles"
-blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-container_client = blob_service_client.get_container_client(container_name)
+
+
+def create_container_client():
+    """Create the blob container client (called on the first blob request)."""
+    from azure.storage.blob import BlobServiceClient  # Deferred: importing the Azure SDK is slow
+    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    return blob_service_client.get_container_client(container_name)
+
+
+container_client = LazyObject(create_container_client)
 
 # ==============================================================================
 # Part 4: Utility Functions
@@ -43,35 +62,19 @@ container_client = blob_service_client.get_container_client(container_name)
 
 def download_pdf(blob_name):
     """Download a PDF from Azure Blob Storage and extract its text."""
-    blob_client = container_client.get_blob_client(blob_name)
-    pdf_content = blob_client.download_blob().readall()
-
-    pdf_path = f'downloaded_{blob_name}'
-    with open(pdf_path, 'wb') as pdf_file:
-        pdf_file.write(pdf_content)
-
-    return extract_text_from_pdf(pdf_path)
-
-
-def extract_text_from_pdf(pdf_path):
-    """Extract text from a downloaded PDF file."""
-    text = ""
-    with fitz.open(pdf_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
+    return ingest_articles(container_client, [blob_name])[blob_name]
 
 
 def process_articles(selected_articles):
-    """Download and extract text from the selected articles."""
-    return {name: download_pdf(name) for name in selected_articles}
+    """Download and extract text from the selected articles concurrently, in memory."""
+    return ingest_articles(container_client, selected_articles)
 
 
 # ==============================================================================
 # Part 5: Data Processing and Analysis
 # ==============================================================================
-def analyze_sentiments_for_articles(articles):
-    """Analyze the sentiment of articles and return combined sentiment and summary."""
+def sentiment_messages(articles):
+    """Build the chat messages for the sentiment analysis request."""
     combined_text = "\n\n".join([f"{name}: {text}" for name, text in articles.items()])
     categorization_rules = (
         "Categorization Rules for predicting stock price movement over the next 3 trading days "
@@ -87,34 +90,66 @@ def analyze_sentiments_for_articles(articles):
         f"Analyze the sentiment strength, direction, and relevance of these articles that came out today on the event date. "
         f"Evaluate how the sentiment is likely to influence investor decisions and company's stock price movement over the next 3 trading days. "
         f"Classify the sentiment using the rules below and provide both classification and a brief summary of key points driving your classification:\n\n"
-        f"{categorization_rules}\n{combined_text}"
+        f"{categorization_rules}{CLASSIFICATION_FORMAT}\n{combined_text}"
     )
+    return [
+        {"role": "system",
+          "content": "You are an expert at analyzing the implications of sentiment strength, direction, and relevance of financial news on stock prices, with a focus on predicting short-term movements for Norwegian stocks."},
+        {"role": "user", "content": prompt}
+    ]
+
 
+@traced()
+def analyze_sentiments_for_articles(articles, on_token=None, sentiment_mode=None):
+    """
+    Analyze the sentiment of articles and return combined sentiment and summary.
+    With `on_token`, each article's response is streamed to the callback as it is generated
+    (after a note on the skipped near duplicates), followed by the aggregate that is returned.
+    `sentiment_mode` ('gpt', 'lexicon' or 'gate') defaults to sentiment_lexicon.SENTIMENT_MODE.
+    """
     try:
-        response = client.chat.completions.create(
-            model="GPT4o-API",
-            messages=[
-                {"role": "system",
-                  "content": "You are an expert at analyzing the implications of sentiment strength, direction, and relevance of financial news on stock prices, with a focus on predicting short-term movements for Norwegian stocks."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.3
+        # Republished copies of the same story are sent only once
+        articles, duplicates, tokens_saved = remove_near_duplicates(articles)
+        if duplicates and on_token is not None:
+            on_token(describe_duplicates(duplicates, tokens_saved) + "\n\n")
+
+        # Clear-cut cases are answered by the finance lexicon without a GPT call
+        response = prescore_sentiment(articles, sentiment_mode)
+        if response is not None:
+            if on_token is not None:
+                on_token(response)
+            return response
+
+        # Each article is classified once and cached; the selection is aggregated from the stored results.
+        # The callback gets every article's response, the prompt only the short aggregate.
+        responses = score_articles(
+            client, articles, sentiment_messages, model="GPT4o-API", max_tokens=1000, temperature=0.3,
+            on_token=on_token
         )
-        return response.choices[0].message.content.strip()
+        response = aggregate_sentiments(responses)
+        if on_token is not None:
+            on_token(response)
+        return response
     except Exception as e:
         return f"Error: Exception occurred during prediction: {str(e)}"
 
 
+
+@traced()
 def calculate_post_event_metrics(symbol, event_date):
     """
     Fetch stock data and calculate post-event metrics.
     """
     try:
-        # Fetch only relevant stock data: event day + at least 3 trading days after
-        stock_data = yf.Ticker(symbol).history(
+        # Reject holidays and weekends before downloading anything
+        if not is_trading_day(event_date):
+            raise ValueError(f"The event date {event_date} is not a valid trading day.")
+
+        # Fetch only relevant stock data: event day up to and including the 3rd trading day after
+        stock_data = get_history(
+            symbol,
             start=event_date.strftime("%Y-%m-%d"),
-            end=(event_date + timedelta(days=7)).strftime("%Y-%m-%d")  # Buffer for non-trading days
+            end=(next_trading_day(event_date, 3) + timedelta(days=1)).strftime("%Y-%m-%d")
         )
 
         # Validate if data is empty
@@ -160,12 +195,10 @@ def calculate_post_event_metrics(symbol, event_date):
 # ==============================================================================
 # Part 6: Display Functions
 # ==============================================================================
-def display_sentiment_analysis(chat_display, sentiment_response):
-    """Display the sentiment analysis results in the chat display."""
-    chat_display.insert(
-        tk.END,
-        f"### Sentiment Analysis ###\n{sentiment_response}\n\n"
-    )
+def start_streamed_section(chat_display, heading):
+    """Insert a section heading and return a callback that appends streamed text below it."""
+    chat_display.insert(tk.END, f"### {heading} ###\n")
+    return lambda token: chat_display.insert(tk.END, token)
 
 
 def display_post_event_data(chat_display, post_event_metrics):
@@ -193,6 +226,7 @@ class ChatbotGUI:
         master.resizable(True, True)
 
         self.create_widgets()
+        self.worker = AnalysisWorker(master, self.chat_display, self.status_var)
         self.load_blob_names()
 
     # -------------------------------------------------------------------------
@@ -203,9 +237,20 @@ class ChatbotGUI:
         ttk.Label(self.master, text="Select articles for sentiment analysis (hold Ctrl to select multiple):").pack(
             pady=5)
 
+        # Search field that filters the articles by name as the user types
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(self.master, textvariable=self.search_var, width=50)
+        search_entry.pack(pady=5)
+        search_entry.bind("<KeyRelease>", lambda event: self.schedule_filter())
+
         # Drop-down menu for selecting multiple articles
         self.article_listbox = tk.Listbox(self.master, selectmode=tk.MULTIPLE, width=50)
         self.article_listbox.pack(pady=5)
+        self.article_listbox.bind("<<ListboxSelect>>", lambda event: self.update_selection())
+
+        # Number of matching articles and listing progress
+        self.article_count_var = tk.StringVar()
+        ttk.Label(self.master, textvariable=self.article_count_var).pack()
 
         # Input field for stock ticker symbol
         ttk.Label(self.master, text="Enter stock symbol (e.g., DNB.OL):").pack(pady=5)
@@ -217,18 +262,77 @@ class ChatbotGUI:
         self.event_date_entry = ttk.Entry(self.master, width=50)
         self.event_date_entry.pack(pady=5)
 
-        # Button to submit the query
-        ttk.Button(self.master, text="Analyze", command=self.analyze).pack(pady=10)
+        # Sentiment scoring: GPT, the finance lexicon alone, or the lexicon with GPT for uncertain cases
+        ttk.Label(self.master, text="Sentiment scoring (gpt, lexicon or gate):").pack(pady=5)
+        self.sentiment_mode_var = tk.StringVar(value=SENTIMENT_MODE)
+        ttk.Combobox(self.master, textvariable=self.sentiment_mode_var, values=SENTIMENT_MODES,
+                     state="readonly", width=47).pack(pady=5)
+
+        # Buttons to submit the query or cancel the running analysis
+        button_frame = ttk.Frame(self.master)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Suggest articles", command=self.suggest_articles).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Analyze", command=self.analyze).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Cancel", command=self.cancel).pack(side=tk.LEFT, padx=5)
+
+        # Status line showing the current stage and the number of queued analyses
+        self.status_var = tk.StringVar(value="Ready.")
+        ttk.Label(self.master, textvariable=self.status_var).pack()
 
         # Scrollable text box for displaying the result
         self.chat_display = scrolledtext.ScrolledText(self.master, wrap=tk.WORD, width=80, height=20)
         self.chat_display.pack(padx=10, pady=10, expand=True, fill=tk.BOTH)
 
     def load_blob_names(self):
-        """Load available reports from the blob container."""
-        available_blobs = container_client.list_blobs()
-        for blob in available_blobs:
-            self.article_listbox.insert(tk.END, blob.name)  # Add article names to the listbox
+        """
+        Show the article names cached by the previous run right away and refresh
+        them from the blob container page by page in the background.
+        """
+        self.blob_index = BlobNameIndex(container_client, container_name=container_name)
+        self.selected_articles = []  # Kept across filtering
+        self._filter_job = None
+        self.filter_articles()
+        self.blob_index.refresh()
+        self.master.after(200, self.poll_blob_names)
+
+    def poll_blob_names(self):
+        """Add newly listed article names to the listbox until the listing is done."""
+        if self.blob_index.poll() or not self.blob_index.loading:
+            self.filter_articles()
+        if self.blob_index.loading:
+            self.master.after(200, self.poll_blob_names)
+
+    def schedule_filter(self):
+        """Filter the articles shortly after the user stops typing."""
+        if self._filter_job is not None:
+            self.master.after_cancel(self._filter_job)
+        self._filter_job = self.master.after(150, self.filter_articles)
+
+    def filter_articles(self):
+        """Show the articles matching the search field, keeping earlier selections."""
+        self._filter_job = None
+        names = self.blob_index.search(self.search_var.get())
+        self.article_listbox.delete(0, tk.END)
+        if names:
+            self.article_listbox.insert(tk.END, *names)
+        for index, name in enumerate(names):
+            if name in self.selected_articles:
+                self.article_listbox.selection_set(index)
+
+        status = f"Showing {len(names)} of {len(self.blob_index.names):,} articles"
+        if self.blob_index.loading:
+            status += " (loading...)"
+        if self.blob_index.error:
+            status += f" (listing failed: {self.blob_index.error})"
+        self.article_count_var.set(status)
+
+    def update_selection(self):
+        """Remember the selected articles, including those hidden by the current filter."""
+        visible = set(self.article_listbox.get(0, tk.END))
+        selected = [self.article_listbox.get(i) for i in self.article_listbox.curselection()]
+        self.selected_articles = [
+            name for name in self.selected_articles if name not in visible
+        ] + selected
 
     # -------------------------------------------------------------------------
     # Helper Functions
@@ -254,48 +358,90 @@ class ChatbotGUI:
         return event_date, symbol
 
     def get_selected_articles(self):
-        """Retrieve selected articles from the UI listbox."""
-        selected_indices = self.article_listbox.curselection()
-        return [self.article_listbox.get(i) for i in selected_indices]
+        """Retrieve selected articles from the UI listbox (including those hidden by the filter)."""
+        return list(self.selected_articles)
+
+    def suggest_articles(self):
+        """Queue a search for the indexed articles most relevant to the symbol in the days up to the event date."""
+        event_date, symbol = self.validate_inputs()
+        if not event_date or not symbol:
+            return  # Exit if validation fails
+
+        self.worker.submit(f"Article suggestions for {symbol}", self.run_suggestion, symbol, event_date)
+
+    def run_suggestion(self, job, symbol, event_date):
+        """Search the article index (runs on the worker thread, as updating the index reads the article cache)."""
+        job.progress("Searching articles")
+        names = relevant_articles(symbol, event_date, company_name(symbol))
+        if not names:
+            job.insert(
+                tk.END, f"No indexed articles about {symbol} in the {MAX_ARTICLE_AGE_DAYS} days up to the event date.\n\n"
+            )
+            return
+        job.call(self.select_articles, names)
+        job.insert(tk.END, f"Selected {len(names)} articles about {symbol}: {', '.join(names)}\n\n")
+
+    def select_articles(self, names):
+        """Select the given articles in the article list (main thread)."""
+        self.selected_articles = names
+        self.search_var.set("")
+        self.filter_articles()
 
     # -------------------------------------------------------------------------
     # Main Analyze Function
     # -------------------------------------------------------------------------
     def analyze(self):
-        """Handle the user's query and fetch the appropriate data for analysis."""
+        """Validate the user's query and queue the analysis on the background worker."""
         # Validate inputs
         event_date, symbol = self.validate_inputs()
         if not event_date or not symbol:
             return  # Exit if validation fails
 
-        # Retrieve and process selected articles
+        # Retrieve selected articles
         selected_articles = self.get_selected_articles()
         if not selected_articles:
             self.chat_display.insert(tk.END, "No articles selected. Please choose at least one article.\n\n")
             return
 
+        self.worker.submit(
+            f"{symbol} on {event_date:%Y-%m-%d}", self.run_analysis,
+            event_date, symbol, selected_articles, self.sentiment_mode_var.get()
+        )
+
+    def cancel(self):
+        """Cancel the analysis that is currently running."""
+        self.worker.cancel()
+
+    def run_analysis(self, job, event_date, symbol, selected_articles, sentiment_mode=None):
+        """Fetch the data for one analysis (runs on the worker thread and writes to the job)."""
         try:
+            job.progress("Downloading articles")
             articles = process_articles(selected_articles)
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error processing articles: {str(e)}\n\n")
+            job.insert(tk.END, f"Error processing articles: {str(e)}\n\n")
             return
 
         # Analyze sentiment for the articles
         try:
-            sentiment_response = analyze_sentiments_for_articles(articles)
-            display_sentiment_analysis(self.chat_display, sentiment_response)
+            job.progress("Analyzing sentiment")
+            on_token = start_streamed_section(job, "Sentiment Analysis")
+            sentiment_response = analyze_sentiments_for_articles(articles, on_token, sentiment_mode)
+            if sentiment_response.startswith("Error"):
+                job.insert(tk.END, sentiment_response)
+            job.insert(tk.END, "\n\n")
         except Exception as e:
-            self.chat_display.insert(tk.END, f"Error analyzing sentiment: {str(e)}\n\n")
+            job.insert(tk.END, f"Error analyzing sentiment: {str(e)}\n\n")
             return
 
         # Calculate and display post-event metrics
         try:
+            job.progress("Calculating post-event metrics")
             post_event_metrics = calculate_post_event_metrics(symbol, event_date)
-            display_post_event_data(self.chat_display, post_event_metrics)
+            display_post_event_data(job, post_event_metrics)
         except ValueError as e:
-            self.chat_display.insert(tk.END, f"{str(e)}\n\n")
+            job.insert(tk.END, f"{str(e)}\n\n")
         except Exception as e:
-            self.chat_display.insert(tk.END, f"An unexpected error occurred: {str(e)}\n\n")
+            job.insert(tk.END, f"An unexpected error occurred: {str(e)}\n\n")
 
 
 # ==============================================================================
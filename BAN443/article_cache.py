@@ -0,0 +1,138 @@
+# ==============================================================================
+# ETag-aware local cache of extracted article text
+# ==============================================================================
+#
+# Stores the text extracted from each article PDF in a local SQLite database,
+# keyed on the blob name together with its ETag and last-modified time. Before
+# an article is downloaded, a metadata-only request (get_blob_properties)
+# checks whether the blob changed; if it did not, the cached text is returned
+# without downloading or parsing the PDF again. The MinHash signature used for
+# near-duplicate detection (article_dedup.py) is stored next to the text and
+# cleared whenever the text is replaced. The database is opened on first use,
+# so importing this module does not touch the disk.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import os  # For file and directory management
+import sqlite3  # For the on-disk article store
+import threading  # For creating the database once across threads
+import time  # For recording when an article was cached
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+CACHE_DIR = os.getenv("BAN443_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+MAX_QUERY_NAMES = 900  # Blob names per query (SQLite limits the number of parameters per statement)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    blob_name TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    text TEXT NOT NULL,
+    cached_at REAL NOT NULL,
+    minhash BLOB
+);
+"""
+
+# ==============================================================================
+# Part 3: Article cache
+# ==============================================================================
+
+def blob_version(properties):
+    """Return the (etag, last_modified) pair that identifies a blob version."""
+    last_modified = getattr(properties, "last_modified", None)
+    return getattr(properties, "etag", None), last_modified.isoformat() if last_modified else None
+
+
+class ArticleCache:
+    """SQLite-backed cache of extracted article text keyed on blob name and version."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, "articles.sqlite")
+        self.hits = 0
+        self.misses = 0
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _create(self):
+        """Create the database and its table (and add columns missing from an older cache)."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with sqlite3.connect(self.path, timeout=30) as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(articles)")}
+            if "minhash" not in columns:  # Cache created before signatures were stored
+                conn.execute("ALTER TABLE articles ADD COLUMN minhash BLOB")
+
+    def _connect(self):
+        """Open a new connection (one per call keeps the cache process/thread safe), creating the database on first use."""
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self._create()
+                    self._ready = True
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, blob_name, etag, last_modified=None):
+        """Return the cached text if it was extracted from this blob version, else None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT etag, last_modified, text FROM articles WHERE blob_name = ?", (blob_name,)
+            ).fetchone()
+
+        fresh = row is not None and (row[0] == etag if etag else row[1] == last_modified)
+        if not fresh:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[2]
+
+    def put(self, blob_name, etag, last_modified, text):
+        """Store the extracted text for a blob version."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO articles (blob_name, etag, last_modified, text, cached_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (blob_name, etag, last_modified, text, time.time()),
+            )
+
+    def signatures(self, blob_names):
+        """Return {blob_name: stored MinHash signature bytes} for the given blobs that have one."""
+        blob_names = list(blob_names)
+        found = {}
+        with self._connect() as conn:
+            for start in range(0, len(blob_names), MAX_QUERY_NAMES):
+                batch = blob_names[start:start + MAX_QUERY_NAMES]
+                found.update(conn.execute(
+                    "SELECT blob_name, minhash FROM articles WHERE minhash IS NOT NULL "
+                    f"AND blob_name IN ({', '.join('?' * len(batch))})", batch,
+                ))
+        return found
+
+    def put_signatures(self, signatures):
+        """Store MinHash signatures {blob_name: bytes} for articles already in the cache."""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE articles SET minhash = ? WHERE blob_name = ?",
+                [(signature, blob_name) for blob_name, signature in signatures.items()],
+            )
+
+    def entries(self, since=0.0):
+        """Return (blob_name, etag, last_modified, text, cached_at) for every article cached after `since`."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT blob_name, etag, last_modified, text, cached_at FROM articles "
+                "WHERE cached_at > ? ORDER BY cached_at", (since,),
+            ).fetchall()
+
+    def stats(self):
+        """Return the hit and miss counters."""
+        return {"hits": self.hits, "misses": self.misses}
+
+
+# Shared cache used by the chatbots
+article_cache = ArticleCache()
@@ -0,0 +1,151 @@
+# ==============================================================================
+# Near-duplicate article detection with MinHash signatures
+# ==============================================================================
+#
+# Newswire stories are often republished almost word for word under another
+# blob name. Before the articles go into the sentiment prompt, every article
+# is reduced to its set of 5-word shingles and a 128-value MinHash signature
+# that estimates the Jaccard similarity of two such sets. Locality-sensitive
+# hashing (32 bands of 4 values) finds the candidate pairs without comparing
+# every pair, and articles whose estimated similarity reaches the threshold
+# are collapsed into the first of them.
+#
+# Signatures are stored in the article cache next to the extracted text
+# (article_cache.py), so an article is only shingled once. Storing new text
+# for a blob clears its signature.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import re  # For splitting the text into words
+import zlib  # For hashing words
+
+# Third-party libraries
+import numpy as np  # For computing the signatures
+
+# Local modules
+from article_cache import article_cache  # Local cache of extracted article text (and signatures)
+from article_summarizer import count_tokens  # Token counts for the savings report
+from tracing import span  # Per-stage latency spans
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+SHINGLE_WORDS = 5  # Words per shingle
+NUM_PERMUTATIONS = 128  # Values per MinHash signature
+BANDS = 32  # LSH bands (NUM_PERMUTATIONS / BANDS values per band)
+SIMILARITY_THRESHOLD = 0.8  # Estimated Jaccard similarity from which two articles are duplicates
+
+_PRIME = (1 << 61) - 1  # Modulus of the permutation hashes
+_rng = np.random.default_rng(443)  # Fixed seed: stored signatures stay comparable between runs
+_A = _rng.integers(1, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# ==============================================================================
+# Part 3: Signatures
+# ==============================================================================
+
+def shingle_hashes(text, words=SHINGLE_WORDS):
+    """Return the distinct 32-bit hashes of the text's `words`-word shingles."""
+    tokens = WORD_PATTERN.findall(text.lower())
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    hashes = np.array([zlib.crc32(token.encode("utf-8")) for token in tokens], dtype=np.uint64)
+    if len(hashes) < words:
+        words = len(hashes)
+    # Combine the word hashes of each window (wrapping uint64 arithmetic), then fold to 32 bits
+    shingles = np.zeros(len(hashes) - words + 1, dtype=np.uint64)
+    for offset in range(words):
+        shingles = shingles * np.uint64(1000003) + hashes[offset:len(hashes) - words + 1 + offset]
+    return np.unique((shingles ^ (shingles >> np.uint64(32))) & np.uint64(0xFFFFFFFF))
+
+
+def minhash_signature(text):
+    """Return the MinHash signature (NUM_PERMUTATIONS uint64 values) of a text."""
+    shingles = shingle_hashes(text)
+    if not len(shingles):
+        return np.full(NUM_PERMUTATIONS, _PRIME, dtype=np.uint64)
+    # (a * x + b) mod p for every permutation and shingle; a, x, b < 2**32 cannot overflow uint64
+    return ((_A[:, None] * shingles[None, :] + _B[:, None]) % np.uint64(_PRIME)).min(axis=1)
+
+
+def estimated_similarity(signature, other):
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    return float(np.mean(signature == other))
+
+
+def signatures(articles, cache=None):
+    """Return {name: signature} for {name: text}, reusing and storing the signatures in the article cache."""
+    cache = cache or article_cache
+    stored = cache.signatures(list(articles))
+    result, new = {}, {}
+    for name, text in articles.items():
+        if name in stored:
+            result[name] = np.frombuffer(stored[name], dtype=np.uint64)
+        else:
+            result[name] = new[name] = minhash_signature(text)
+    if new:
+        cache.put_signatures({name: signature.tobytes() for name, signature in new.items()})
+    return result
+
+
+# ==============================================================================
+# Part 4: Collapsing duplicates
+# ==============================================================================
+
+def find_duplicates(signatures_by_name, threshold=SIMILARITY_THRESHOLD):
+    """
+    Return {duplicate name: kept name} for the articles whose signature is at
+    least `threshold` similar to an earlier article's (in the given order).
+    """
+    names = list(signatures_by_name)
+    rows = NUM_PERMUTATIONS // BANDS
+    buckets = {}
+    duplicates = {}
+    for position, name in enumerate(names):
+        signature = signatures_by_name[name]
+        if signature[0] == _PRIME:
+            continue  # No words: nothing to compare
+        candidates = set()
+        for band in range(BANDS):
+            key = (band, signature[band * rows:(band + 1) * rows].tobytes())
+            candidates.update(buckets.setdefault(key, []))
+            buckets[key].append(position)
+
+        for earlier in sorted(candidates):
+            kept = names[earlier]
+            if kept in duplicates:
+                continue  # Compare with the article that is kept, not with its duplicates
+            if estimated_similarity(signature, signatures_by_name[kept]) >= threshold:
+                duplicates[name] = kept
+                break
+    return duplicates
+
+
+def remove_near_duplicates(articles, threshold=SIMILARITY_THRESHOLD, cache=None):
+    """
+    Collapse near-duplicate articles of {name: text} into the first of each group.
+
+    Returns (kept articles, {duplicate name: kept name}, tokens saved).
+    """
+    if len(articles) < 2:
+        return dict(articles), {}, 0
+    with span("remove_near_duplicates", articles=len(articles)) as stage:
+        duplicates = find_duplicates(signatures(articles, cache), threshold)
+        tokens_saved = sum(count_tokens(articles[name]) for name in duplicates)
+        stage.set(duplicates=len(duplicates), tokens_saved=tokens_saved)
+    kept = {name: text for name, text in articles.items() if name not in duplicates}
+    return kept, duplicates, tokens_saved
+
+
+def describe_duplicates(duplicates, tokens_saved):
+    """Return a one-line report of the collapsed duplicates for the chat display ('' if there are none)."""
+    if not duplicates:
+        return ""
+    pairs = ", ".join(f"{name} (same as {kept})" for name, kept in duplicates.items())
+    return f"Skipped {len(duplicates)} near-duplicate article(s), saving ~{tokens_saved:,} tokens: {pairs}"
@@ -0,0 +1,351 @@
+# ==============================================================================
+# Local BM25 retrieval index over the extracted article text
+# ==============================================================================
+#
+# Finds the articles relevant to a symbol and event date without picking them
+# by hand. The index is an inverted index of term counts (a sparse
+# article x term matrix in compressed-column form) scored with Okapi BM25,
+# and it only admits articles dated in the days up to the event, so a
+# backtest never reads news published after the event day.
+#
+# Articles enter the index from the article cache (article_cache.py): every
+# article that was ever downloaded and extracted is indexed, and
+# `update_from_cache()` only reads the entries cached since the last update.
+# `update(container_client, names)` downloads and indexes blobs that were
+# never extracted. An article's date is taken from its blob name
+# (YYYY-MM-DD or YYYYMMDD) when it has one, else from the blob's last-modified
+# time.
+#
+# Usage:
+#   python article_index.py update                 # index everything in the article cache
+#   python article_index.py update --container     # also download and index new blobs
+#   python article_index.py search EQNR.OL 2024-03-04 --company Equinor --top 5
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import argparse  # For the command-line interface
+import json  # For the index metadata
+import math  # For the BM25 inverse document frequency
+import os  # For file and directory management
+import re  # For tokenizing text and reading dates from blob names
+import tempfile  # For writing the index atomically
+from array import array  # For the growing posting arrays
+from collections import Counter  # For term counts
+from datetime import datetime  # For article dates
+
+# Third-party libraries
+import numpy as np  # For scoring
+
+# Local modules
+from article_cache import article_cache  # Local cache of extracted article text
+from lazy import lazy_import  # Deferred imports
+from tracing import span  # Per-stage latency spans
+
+sparse = lazy_import("scipy.sparse")  # For converting the postings to compressed-column form
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+CACHE_DIR = os.getenv("BAN443_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+
+K1 = 1.2  # BM25 term-frequency saturation
+B = 0.75  # BM25 document-length normalization
+DEFAULT_TOP_K = 5  # Articles returned per event
+MAX_ARTICLE_AGE_DAYS = 7  # Articles dated up to this many days before the event are considered
+INGEST_BATCH = 50  # Blobs downloaded per ingest_articles() call in update()
+
+TOKEN_PATTERN = re.compile(r"[0-9a-zæøåäöü]+")
+DATE_PATTERN = re.compile(r"(?<!\d)(\d{4})-?(\d{2})-?(\d{2})(?!\d)")
+
+# Words left out of the index (frequent English and Norwegian function words)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the to was were will with "
+    "av da de den det en er et for fra har i med og om på som til var ved".split()
+)
+# Words of company names that do not identify the company
+COMPANY_STOPWORDS = frozenset("asa as ab plc ltd inc group holding holdings".split())
+
+# ==============================================================================
+# Part 3: Helper functions
+# ==============================================================================
+
+def tokenize(text):
+    """Return the lower-case word tokens of a text, without stopwords and single characters."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def symbol_query(symbol, company_name=None):
+    """Return the query for a symbol: its ticker without the exchange suffix plus the company name."""
+    words = [symbol.split(".")[0]]
+    if company_name:
+        words += [word for word in tokenize(company_name) if word not in COMPANY_STOPWORDS]
+    return " ".join(words)
+
+
+def _to_date(value):
+    """Convert a 'YYYY-MM-DD' string, datetime or date to a date."""
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def article_date(blob_name, last_modified=None):
+    """Return the article's date as 'YYYY-MM-DD': from the blob name if it has one, else the last-modified time."""
+    for match in DATE_PATTERN.finditer(blob_name):
+        try:
+            return datetime(*map(int, match.groups())).strftime("%Y-%m-%d")
+        except ValueError:
+            continue  # Digits that are not a date
+    return last_modified[:10] if last_modified else None
+
+
+# ==============================================================================
+# Part 4: Article index
+# ==============================================================================
+
+class ArticleIndex:
+    """Incrementally updated BM25 index of article texts, stored in `directory`."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(CACHE_DIR, "article_index")
+        self.names, self.etags, self.dates, self.lengths, self.active = [], [], [], [], []
+        self.terms = []
+        self.synced_at = 0.0  # cached_at of the last article cache entry indexed
+        self._indptr, self._indices, self._counts = array("q", [0]), array("i"), array("i")
+        self._load()
+        self._rows = {name: row for row, name in enumerate(self.names) if self.active[row]}
+        self._vocabulary = {term: column for column, term in enumerate(self.terms)}
+        self._columns = None  # Compressed-column postings, rebuilt after changes
+
+    def __contains__(self, blob_name):
+        return blob_name in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    # -------------------------------------------------------------------------
+    # Storage
+    # -------------------------------------------------------------------------
+    def _load(self):
+        """Read the saved index, if there is one."""
+        try:
+            with open(os.path.join(self.directory, "index.json"), encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+            postings = np.load(os.path.join(self.directory, meta["postings"]))
+        except (OSError, ValueError, KeyError):
+            return
+        for key in ("names", "etags", "dates", "lengths", "active", "terms", "synced_at"):
+            setattr(self, key, meta[key])
+        self._indptr = array("q", postings["indptr"].tolist())
+        self._indices = array("i", postings["indices"].tolist())
+        self._counts = array("i", postings["counts"].tolist())
+
+    def save(self):
+        """Write the index to its directory (postings first, then the metadata that points to them)."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, postings_path = tempfile.mkstemp(dir=self.directory, prefix="postings_", suffix=".npz")
+        with os.fdopen(fd, "wb") as postings_file:
+            np.savez(postings_file, indptr=np.frombuffer(self._indptr, dtype=np.int64),
+                     indices=np.frombuffer(self._indices, dtype=np.int32),
+                     counts=np.frombuffer(self._counts, dtype=np.int32))
+
+        meta = {key: getattr(self, key) for key in ("names", "etags", "dates", "lengths", "active", "terms",
+                                                    "synced_at")}
+        meta["postings"] = os.path.basename(postings_path)
+        meta_path = os.path.join(self.directory, "index.json")
+        previous = None
+        try:
+            with open(meta_path, encoding="utf-8") as meta_file:
+                previous = json.load(meta_file).get("postings")
+        except (OSError, ValueError):
+            pass
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(temp_path, meta_path)
+        if previous and previous != meta["postings"]:
+            try:
+                os.remove(os.path.join(self.directory, previous))
+            except OSError:
+                pass
+
+    # -------------------------------------------------------------------------
+    # Updates
+    # -------------------------------------------------------------------------
+    def add(self, blob_name, text, etag=None, last_modified=None):
+        """Index an article; a new version of an indexed blob replaces the old one."""
+        counts = Counter(tokenize(text))
+        if blob_name in self._rows:
+            self.active[self._rows[blob_name]] = False
+        for term, count in counts.items():
+            column = self._vocabulary.get(term)
+            if column is None:
+                column = self._vocabulary[term] = len(self.terms)
+                self.terms.append(term)
+            self._indices.append(column)
+            self._counts.append(count)
+        self._indptr.append(len(self._indices))
+
+        self._rows[blob_name] = len(self.names)
+        self.names.append(blob_name)
+        self.etags.append(etag)
+        self.dates.append(article_date(blob_name, last_modified))
+        self.lengths.append(sum(counts.values()))
+        self.active.append(True)
+        self._columns = None
+
+    def update_from_cache(self, cache=None):
+        """Index the articles extracted since the last update. Returns the number of articles added."""
+        added = 0
+        for blob_name, etag, last_modified, text, cached_at in (cache or article_cache).entries(self.synced_at):
+            row = self._rows.get(blob_name)
+            if row is None or self.etags[row] != etag:
+                self.add(blob_name, text, etag, last_modified)
+                added += 1
+            self.synced_at = max(self.synced_at, cached_at)
+        return added
+
+    def update(self, container_client, blob_names, cache=None):
+        """Download, extract and index the blobs that are not indexed yet. Returns the number added."""
+        from article_ingest import ingest_articles  # Imported here: only needed when blobs are downloaded
+
+        added = self.update_from_cache(cache)
+        missing = [name for name in blob_names if name not in self._rows]
+        for start in range(0, len(missing), INGEST_BATCH):
+            texts = ingest_articles(container_client, missing[start:start + INGEST_BATCH])
+            added += self.update_from_cache(cache)
+            for blob_name, text in texts.items():
+                if blob_name not in self._rows:
+                    self.add(blob_name, text)
+                    added += 1
+        return added
+
+    # -------------------------------------------------------------------------
+    # Search
+    # -------------------------------------------------------------------------
+    def _postings(self):
+        """Return the compressed-column postings and the per-article arrays used for scoring."""
+        if self._columns is None:
+            matrix = sparse.csr_matrix(
+                (np.frombuffer(self._counts, dtype=np.int32).astype(np.float64),
+                 np.frombuffer(self._indices, dtype=np.int32),
+                 np.frombuffer(self._indptr, dtype=np.int64)),
+                shape=(len(self.names), len(self.terms)),
+            ).tocsc()
+            self._columns = (
+                matrix.indptr, matrix.indices, matrix.data,
+                np.array(self.lengths, dtype=np.float64),
+                np.array(self.active, dtype=bool),
+                np.array([date or "NaT" for date in self.dates], dtype="datetime64[D]"),
+            )
+        return self._columns
+
+    def search(self, query, top_k=DEFAULT_TOP_K, end_date=None, max_age_days=MAX_ARTICLE_AGE_DAYS):
+        """
+        Return the `top_k` (blob_name, score) pairs ranked by BM25 for a query.
+        With `end_date`, only articles dated from `max_age_days` before it up to
+        and including it are considered (undated articles are left out).
+        """
+        with span("article_search", articles=len(self)) as stage:
+            indptr, indices, counts, lengths, candidates, dates = self._postings()
+            if end_date is not None:
+                end = np.datetime64(_to_date(end_date), "D")
+                candidates = candidates & (dates <= end)
+                if max_age_days is not None:
+                    candidates &= dates >= end - np.timedelta64(max_age_days, "D")
+            total = int(candidates.sum())
+            if total == 0:
+                return []
+            average_length = lengths[candidates].mean() or 1.0
+
+            scores = np.zeros(len(self.names))
+            for term in dict.fromkeys(tokenize(query)):
+                column = self._vocabulary.get(term)
+                if column is None:
+                    continue
+                rows = indices[indptr[column]:indptr[column + 1]]
+                term_counts = counts[indptr[column]:indptr[column + 1]]
+                keep = candidates[rows]
+                rows, term_counts = rows[keep], term_counts[keep]
+                if not len(rows):
+                    continue
+                idf = math.log(1 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = K1 * (1 - B + B * lengths[rows] / average_length)
+                scores[rows] += idf * term_counts * (K1 + 1) / (term_counts + norm)
+
+            hits = np.flatnonzero(scores > 0)
+            top = hits[np.argsort(-scores[hits], kind="stable")[:top_k]]
+            stage.set(candidates=total, hits=len(hits))
+            return [(self.names[row], float(scores[row])) for row in top]
+
+    def relevant_articles(self, symbol, event_date=None, company_name=None, top_k=DEFAULT_TOP_K):
+        """Return the names of the `top_k` articles about a symbol in the days up to the event date."""
+        query = symbol_query(symbol, company_name)
+        return [name for name, _ in self.search(query, top_k, end_date=event_date)]
+
+
+# ==============================================================================
+# Part 5: Module-level shortcuts
+# ==============================================================================
+
+_default_index = None
+
+
+def _shared_index():
+    """Return the shared index, updated with the articles cached since the last call."""
+    global _default_index
+    if _default_index is None:
+        _default_index = ArticleIndex()
+    if _default_index.update_from_cache():
+        _default_index.save()
+    return _default_index
+
+
+def relevant_articles(symbol, event_date=None, company_name=None, top_k=DEFAULT_TOP_K):
+    """Return the names of the `top_k` indexed articles about a symbol in the days up to the event date."""
+    return _shared_index().relevant_articles(symbol, event_date, company_name, top_k)
+
+
+# ==============================================================================
+# Part 6: Command-line interface
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the local article index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update_parser = commands.add_parser("update", help="Index the cached articles (and new blobs)")
+    update_parser.add_argument("--container", action="store_true",
+                               help="Also download and index every blob of the container that is not indexed")
+    search_parser = commands.add_parser("search", help="Show the most relevant articles for an event")
+    search_parser.add_argument("symbol", help="Stock symbol (e.g. EQNR.OL)")
+    search_parser.add_argument("date", nargs="?", help="Event date (YYYY-MM-DD); omit to search all dates")
+    search_parser.add_argument("--company", help="Company name added to the query")
+    search_parser.add_argument("--top", type=int, default=DEFAULT_TOP_K, help="Number of articles")
+    args = parser.parse_args()
+
+    index = ArticleIndex()
+    if args.command == "update":
+        added = index.update_from_cache()
+        if args.container:
+            from Chatbot_sentiment import container_client  # Azure client configured by the chatbots
+
+            names = [blob.name for blob in container_client.list_blobs()]
+            added += index.update(container_client, names)
+        index.save()
+        print(f"Added {added} articles; {len(index)} articles indexed.")
+    else:
+        index.update_from_cache()
+        query = symbol_query(args.symbol, args.company)
+        for name, score in index.search(query, args.top, end_date=args.date):
+            print(f"{score:8.3f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# ==============================================================================
+# Parallel, in-memory article ingestion
+# ==============================================================================
+#
+# Downloads the selected article PDFs from Azure Blob Storage concurrently in
+# a bounded thread pool and streams each blob into memory. PyMuPDF opens the
+# bytes directly (no temporary files), and text extraction runs in worker
+# processes while the remaining downloads are still in flight. The extraction
+# pool lives for one ingest_articles() call; inside a worker process (e.g. a
+# batch_backtest.py worker) the text is extracted in that process instead, as
+# the batch already runs one event per process. Articles whose blob is
+# unchanged are served from the article cache (see article_cache.py).
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import contextlib  # For ingesting without an extraction pool
+import multiprocessing  # For detecting worker processes
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed  # For parallel ingestion
+
+# Local modules
+from article_cache import article_cache, blob_version  # Local cache of extracted article text
+from lazy import lazy_import  # Deferred imports
+from tracing import bind, span  # Per-stage latency spans
+
+# Third-party libraries (imported on first use)
+fitz = lazy_import("fitz")  # PyMuPDF for extracting text from PDFs
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+MAX_DOWNLOAD_WORKERS = 8  # Concurrent blob downloads
+MAX_EXTRACT_WORKERS = 4  # Worker processes for PDF text extraction
+
+# ==============================================================================
+# Part 3: Download and extraction
+# ==============================================================================
+
+def extract_text_from_pdf_bytes(pdf_content):
+    """Extract text from a PDF held in memory."""
+    with span("extract_text_from_pdf", bytes=len(pdf_content)) as stage:
+        with fitz.open(stream=pdf_content, filetype="pdf") as doc:
+            text = "".join(page.get_text() for page in doc)
+            stage.set(pages=doc.page_count, chars=len(text))
+    return text
+
+
+def _fetch_blob(container_client, blob_name):
+    """
+    Check the article cache with a metadata-only request and download the
+    blob into memory if it changed. Returns (text, None, None) on a cache hit
+    and (None, pdf bytes, blob version) on a miss.
+    """
+    with span("download_pdf", blob=blob_name) as stage:
+        blob_client = container_client.get_blob_client(blob_name)
+        text = article_cache.get(blob_name, *blob_version(blob_client.get_blob_properties()))
+        if text is not None:
+            stage.set(cached=True)
+            return text, None, None
+
+        downloader = blob_client.download_blob(max_concurrency=2)
+        pdf_content = downloader.readall()
+        stage.set(cached=False, bytes=len(pdf_content))
+        return None, pdf_content, blob_version(downloader.properties)
+
+
+def _extract_pool(article_count):
+    """
+    Return a process pool for extracting `article_count` articles, or a null context
+    (extract here) for a single article or when this already is a worker process.
+    """
+    if article_count <= 1 or multiprocessing.parent_process() is not None:
+        return contextlib.nullcontext()
+    return ProcessPoolExecutor(max_workers=min(MAX_EXTRACT_WORKERS, article_count))
+
+
+def ingest_articles(container_client, blob_names):
+    """
+    Download and extract the text of the given blobs concurrently.
+    Returns a dictionary {blob_name: text} in the order of `blob_names`.
+    """
+    blob_names = list(dict.fromkeys(blob_names))
+    with span("ingest_articles", articles=len(blob_names)):
+        texts = {}
+        extractions = {}
+
+        # The extraction pool is shut down with the call, so no worker processes outlive it
+        with _extract_pool(len(blob_names)) as extract_pool, \
+                ThreadPoolExecutor(max_workers=min(MAX_DOWNLOAD_WORKERS, max(1, len(blob_names)))) as downloads:
+            futures = {downloads.submit(bind(_fetch_blob), container_client, name): name for name in blob_names}
+            for future in as_completed(futures):
+                name = futures[future]
+                text, pdf_content, version = future.result()
+                if text is not None:
+                    texts[name] = text
+                elif extract_pool is None:
+                    # A single article (or a worker process) parses here instead of shipping the bytes off
+                    texts[name] = extract_text_from_pdf_bytes(pdf_content)
+                    article_cache.put(name, *version, texts[name])
+                else:
+                    future = extract_pool.submit(extract_text_from_pdf_bytes, pdf_content)
+                    extractions[name] = (future, version)
+
+            for name, (future, version) in extractions.items():
+                texts[name] = future.result()
+                article_cache.put(name, *version, texts[name])
+
+        return {name: texts[name] for name in blob_names}
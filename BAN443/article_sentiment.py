@@ -0,0 +1,295 @@
+# ==============================================================================
+# Per-article sentiment cache with aggregation over the selected articles
+# ==============================================================================
+#
+# Instead of classifying the selected articles as one combined text, every
+# article is classified on its own and the response is stored in a local
+# SQLite database, keyed on the SHA-256 hash of the article text and the
+# prompt version. The prompt version is the hash of the chatbot's sentiment
+# prompt with an empty article (together with the model, output cap and
+# temperature) and of the summarizer's prompt and budgets, so changing either
+# invalidates the stored results automatically. Responses must start with a
+# "Classification: <class>" line; responses without one are not stored.
+#
+# A selection is then classified by aggregating the stored per-article
+# results locally, without another GPT request: selecting {A, B} and then
+# {A, C} only pays for C. The aggregate holds the class counts and at most
+# SUMMARY_EXCERPTS short excerpts, so the prediction prompt it goes into does
+# not grow with the number of articles. The full per-article responses are
+# only streamed to the display, in the order of the selection.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import hashlib  # For hashing the article text
+import json  # For hashing the prompt version
+import os  # For file and directory management
+import re  # For reading the class from a response
+import sqlite3  # For the on-disk result store
+import threading  # For creating the database once and ordering streamed responses
+import time  # For recording when a result was stored
+from concurrent.futures import ThreadPoolExecutor  # For classifying articles in parallel
+
+# Local modules
+from article_summarizer import (  # Token-budgeted map-reduce article summaries
+    ARTICLE_TOKEN_BUDGET, CHUNK_TOKENS, MAX_REDUCE_PASSES, MIN_SUMMARY_TOKENS, SUMMARY_TOKENS, chunk_messages,
+    condense_articles, truncate_tokens,
+)
+from completion_cache import completion_cache, request_key  # On-disk cache for GPT completions
+from tracing import bind, span  # Per-stage latency spans
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+CACHE_DIR = os.getenv("BAN443_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+MAX_WORKERS = 4  # Articles classified at the same time
+CLASS_SCORES = {"bullish": 1, "neutral": 0, "bearish": -1}
+AGGREGATE_THRESHOLD = 1 / 3  # Mean article score from which the selection is Bullish (or, negated, Bearish)
+SUMMARY_EXCERPTS = 3  # Article summaries quoted in the aggregate
+EXCERPT_TOKENS = 60  # Longest quoted summary
+CLASS_PATTERN = re.compile(r"^\W*classification\W*(bullish|neutral|bearish)\b", re.IGNORECASE | re.MULTILINE)
+
+# Appended to the chatbots' sentiment instructions so that the class can be read from a fixed line
+CLASSIFICATION_FORMAT = (
+    "Start your answer with the line 'Classification: Bullish', 'Classification: Neutral' or "
+    "'Classification: Bearish', followed by the summary.\n"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS article_sentiment (
+    content_hash TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, prompt_version)
+);
+"""
+
+# ==============================================================================
+# Part 3: Result store
+# ==============================================================================
+
+def content_hash(text):
+    """Return the SHA-256 hash of an article text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def prompt_version(messages_for, model, max_tokens, temperature):
+    """
+    Return the version of a sentiment prompt: the hash of the request key of the prompt
+    without article text and of the summarizer's prompt and budgets.
+    """
+    payload = json.dumps({
+        "sentiment": request_key(model, messages_for({"": ""}), max_tokens, temperature),
+        "summary": chunk_messages("", "", SUMMARY_TOKENS),
+        "budgets": [ARTICLE_TOKEN_BUDGET, CHUNK_TOKENS, SUMMARY_TOKENS, MIN_SUMMARY_TOKENS, MAX_REDUCE_PASSES],
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class ArticleSentimentCache:
+    """SQLite-backed store of per-article sentiment responses keyed on content hash and prompt version."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, "article_sentiment.sqlite")
+        self.hits = 0
+        self.misses = 0
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Open a new connection (one per call keeps the store process/thread safe), creating the database on first use."""
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    with sqlite3.connect(self.path, timeout=30) as conn:
+                        conn.executescript(SCHEMA)
+                    self._ready = True
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_many(self, content_hashes, version):
+        """Return {content hash: response} for the stored results among `content_hashes`."""
+        content_hashes = list(set(content_hashes))
+        found = {}
+        with self._connect() as conn:
+            # SQLite limits the number of parameters per statement
+            for start in range(0, len(content_hashes), 500):
+                batch = content_hashes[start:start + 500]
+                found.update(conn.execute(
+                    "SELECT content_hash, response FROM article_sentiment "
+                    f"WHERE prompt_version = ? AND content_hash IN ({', '.join('?' * len(batch))})",
+                    (version, *batch),
+                ))
+        self.hits += len(found)
+        self.misses += len(content_hashes) - len(found)
+        return found
+
+    def put(self, content_hash, version, response):
+        """Store the response for an article text and prompt version."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO article_sentiment (content_hash, prompt_version, response, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (content_hash, version, response, time.time()),
+            )
+
+    def stats(self):
+        """Return the hit and miss counters."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0}
+
+
+# Shared store used by the chatbots (the database is opened on first use)
+article_sentiment_cache = ArticleSentimentCache()
+
+# ==============================================================================
+# Part 4: Per-article classification
+# ==============================================================================
+
+def _missing(articles, version, cache):
+    """Return ({name: content hash}, {content hash: stored response}, [names still to classify])."""
+    hashes = {name: content_hash(text) for name, text in articles.items()}
+    stored = cache.get_many(hashes.values(), version)
+    missing, seen = [], set()
+    for name, key in hashes.items():
+        if key not in stored and key not in seen:  # Identical texts are classified once
+            missing.append(name)
+            seen.add(key)
+    return hashes, stored, missing
+
+
+class _OrderedStream:
+    """
+    Passes the responses of articles classified in parallel to `on_token` one article
+    at a time: the first unfinished article streams live, the others are buffered
+    until it is done.
+    """
+
+    def __init__(self, names, on_token):
+        self.names = list(names)
+        self.on_token = on_token
+        self.position = 0
+        self.buffers = {name: [] for name in self.names}
+        self.finished = set()
+        self._lock = threading.Lock()
+        if self.names:
+            self.on_token(f"[{self.names[0]}]\n")
+
+    def token(self, name, text):
+        """Pass on (or buffer) a piece of the response of `name`."""
+        with self._lock:
+            if name == self.names[self.position]:
+                self.on_token(text)
+            else:
+                self.buffers[name].append(text)
+
+    def finish(self, name):
+        """Mark the response of `name` as complete and move on to the next article."""
+        with self._lock:
+            self.finished.add(name)
+            while self.position < len(self.names) and self.names[self.position] in self.finished:
+                self.on_token("\n\n")
+                self.position += 1
+                if self.position < len(self.names):
+                    following = self.names[self.position]
+                    self.on_token(f"[{following}]\n" + "".join(self.buffers.pop(following)))
+
+
+def score_articles(client, articles, messages_for, model="GPT4o-API", max_tokens=1000, temperature=0.3, cache=None,
+                   on_token=None):
+    """
+    Return {name: sentiment response} for {name: text}, classifying only the
+    articles without a stored result. `messages_for({name: text})` builds the
+    chatbot's sentiment request. With `on_token`, each article's response is
+    passed to the callback under its name: stored responses in one piece first,
+    then the new ones as they are generated, one article after the other.
+    """
+    cache = cache or article_sentiment_cache
+    version = prompt_version(messages_for, model, max_tokens, temperature)
+    hashes, stored, missing = _missing(articles, version, cache)
+
+    stream = None
+    if on_token is not None:
+        for name in articles:
+            if hashes[name] in stored:
+                on_token(f"[{name}]\n{stored[hashes[name]].strip()}\n\n")
+        stream = _OrderedStream(missing, on_token)
+
+    def classify(name):
+        # Long articles are condensed chunk by chunk to stay within the token budget
+        condensed = condense_articles({name: articles[name]}, client)
+        response = completion_cache.complete(
+            client, model=model, messages=messages_for(condensed), max_tokens=max_tokens, temperature=temperature,
+            on_token=(lambda text: stream.token(name, text)) if stream is not None else None,
+            validate=article_class,
+        )
+        if stream is not None:
+            stream.finish(name)
+        if article_class(response):  # A response without a class is not kept, so a rerun asks again
+            cache.put(hashes[name], version, response)
+        return response
+
+    with span("score_articles", articles=len(articles), cached=len(articles) - len(missing)):
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            stored.update(zip((hashes[name] for name in missing), pool.map(bind(classify), missing)))
+    return {name: stored[hashes[name]] for name in articles}
+
+
+# ==============================================================================
+# Part 5: Aggregation
+# ==============================================================================
+
+def article_class(response):
+    """Return the class named on the response's "Classification:" line ('' if there is none)."""
+    match = CLASS_PATTERN.search(response)
+    return match.group(1).capitalize() if match else ""
+
+
+def article_summary(response):
+    """Return a response without its "Classification:" line, cut to EXCERPT_TOKENS tokens."""
+    summary = " ".join(CLASS_PATTERN.sub("", response, count=1).split()).lstrip(".:*- ")
+    summary = re.sub(r"^summary\W*", "", summary, flags=re.IGNORECASE)
+    excerpt = truncate_tokens(summary, EXCERPT_TOKENS)
+    return excerpt if excerpt == summary else excerpt.rstrip() + " ..."
+
+
+def aggregate_sentiments(responses):
+    """
+    Combine {name: sentiment response} into one short response for the selection.
+
+    Each classified article scores +1 (Bullish), 0 (Neutral) or -1 (Bearish);
+    the selection takes the class of the mean score. The class counts and the
+    summaries of at most SUMMARY_EXCERPTS articles (those agreeing with the
+    selection's class first), each cut to EXCERPT_TOKENS tokens, follow.
+    """
+    classes = {name: article_class(response) for name, response in responses.items()}
+    scores = [CLASS_SCORES[predicted.lower()] for predicted in classes.values() if predicted]
+    if not scores:
+        raise ValueError("None of the article responses named a sentiment class.")
+
+    mean_score = sum(scores) / len(scores)
+    if mean_score >= AGGREGATE_THRESHOLD:
+        predicted_class = "Bullish"
+    elif mean_score <= -AGGREGATE_THRESHOLD:
+        predicted_class = "Bearish"
+    else:
+        predicted_class = "Neutral"
+
+    counts = ", ".join(
+        f"{sum(1 for predicted in classes.values() if predicted == label)} {label}"
+        for label in ("Bullish", "Neutral", "Bearish")
+    )
+    lines = [
+        f"Classification: {predicted_class}",
+        f"Summary: {len(responses)} article(s) classified individually ({counts}; mean score {mean_score:+.2f}).",
+    ]
+    # Articles that agree with the selection's class are quoted first
+    quoted = sorted((name for name in responses if classes[name]), key=lambda name: classes[name] != predicted_class)
+    for name in quoted[:SUMMARY_EXCERPTS]:
+        lines.append(f"- {name} ({classes[name]}): {article_summary(responses[name])}")
+    return "\n".join(lines)
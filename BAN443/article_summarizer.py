@@ -0,0 +1,144 @@
+# ==============================================================================
+# Token-budgeted map-reduce condensation of articles for sentiment analysis
+# ==============================================================================
+#
+# When the selected articles fit in the token budget they are passed through
+# unchanged. Otherwise every article is split into chunks, the chunks are
+# summarized in parallel with a small output cap (map), and the summaries of
+# each article are joined and handed to the final Bullish/Neutral/Bearish
+# classification (reduce). The output cap shrinks as the number of chunks
+# grows. While the joined summaries still exceed the budget (the cap has a
+# floor), they are summarized again; after MAX_REDUCE_PASSES passes every
+# article is cut to an equal share of the budget. The classification prompt
+# therefore stays within the budget no matter how many articles are selected.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import functools  # For loading the tokenizer once, on first use
+from concurrent.futures import ThreadPoolExecutor  # For summarizing chunks in parallel
+
+# Local modules
+from completion_cache import completion_cache  # On-disk cache for GPT completions
+from tracing import bind, span  # Per-stage latency spans
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+ARTICLE_TOKEN_BUDGET = 8000  # Max tokens of article text in the classification prompt
+CHUNK_TOKENS = 1500  # Size of the chunks that are summarized
+SUMMARY_TOKENS = 150  # Output cap for each chunk summary
+MIN_SUMMARY_TOKENS = 40  # Lower bound on the cap when there are many chunks
+MAX_REDUCE_PASSES = 3  # Summary passes before the summaries are cut to the budget
+MAX_WORKERS = 8  # Chunk summaries running at the same time
+
+# ==============================================================================
+# Part 3: Helper functions
+# ==============================================================================
+
+@functools.lru_cache(maxsize=None)
+def _encoding():
+    """Return the GPT-4o tokenizer, or None if tiktoken is missing (loaded on first use)."""
+    try:
+        import tiktoken  # For exact token counts
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # Fall back to the ~4 characters per token estimate
+        return None
+
+
+def count_tokens(text):
+    """Return the number of tokens in a text (estimated if tiktoken is missing)."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def truncate_tokens(text, max_tokens):
+    """Return the first `max_tokens` tokens of a text (estimated if tiktoken is missing)."""
+    encoding = _encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[:max_tokens]) if len(tokens) > max_tokens else text
+    return text[:max(0, max_tokens - 1) * 4]
+
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS):
+    """Split a text into chunks of at most ~max_tokens, breaking at paragraph boundaries."""
+    max_chars = max_tokens * 4
+    pieces = []
+    for paragraph in text.split("\n\n"):
+        # Very long paragraphs (common in PDF extracts) are cut into fixed-size pieces
+        pieces.extend(paragraph[start:start + max_chars] for start in range(0, len(paragraph), max_chars))
+
+    chunks, current, current_tokens = [], [], 0
+    for piece in pieces:
+        piece_tokens = count_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def chunk_messages(name, chunk, max_tokens):
+    """Build the chat messages for summarizing one chunk of an article."""
+    return [
+        {"role": "system",
+         "content": "You condense financial news for an analyst who predicts short-term stock price movements "
+                    "for Norwegian stocks. Keep facts, figures, guidance and the tone of the text; drop boilerplate."},
+        {"role": "user",
+         "content": f"Summarize this excerpt from the article '{name}' in at most {int(max_tokens * 0.75)} words, "
+                    f"keeping everything that matters for investor sentiment:\n\n{chunk}"},
+    ]
+
+
+# ==============================================================================
+# Part 4: Map-reduce condensation
+# ==============================================================================
+
+def _summarize_chunks(articles, client, budget_tokens, model):
+    """Summarize every chunk of the articles once (map) and return {name: joined chunk summaries}."""
+    chunks = [(name, chunk) for name, text in articles.items() for chunk in chunk_text(text)]
+    summary_tokens = max(MIN_SUMMARY_TOKENS, min(SUMMARY_TOKENS, budget_tokens // max(1, len(chunks))))
+
+    def summarize(item):
+        name, chunk = item
+        return completion_cache.complete(
+            client, model=model, messages=chunk_messages(name, chunk, summary_tokens),
+            max_tokens=summary_tokens, temperature=0.3,
+        )
+
+    with span("condense_articles", articles=len(articles), chunks=len(chunks)):
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            summaries = list(pool.map(bind(summarize), chunks))
+
+    condensed = {name: [] for name in articles}
+    for (name, _), summary in zip(chunks, summaries):
+        condensed[name].append(summary)
+    return {name: "\n".join(parts) for name, parts in condensed.items()}
+
+
+def condense_articles(articles, client, budget_tokens=ARTICLE_TOKEN_BUDGET, model="GPT4o-API"):
+    """
+    Return {name: text} with each article's text replaced by the summaries of
+    its chunks when the articles together exceed `budget_tokens`. The result
+    always fits in `budget_tokens`.
+    """
+    condensed = dict(articles)
+    for _ in range(MAX_REDUCE_PASSES):
+        if sum(count_tokens(text) for text in condensed.values()) <= budget_tokens:
+            return condensed
+        condensed = _summarize_chunks(condensed, client, budget_tokens, model)
+
+    if sum(count_tokens(text) for text in condensed.values()) <= budget_tokens:
+        return condensed
+    # Too many chunks for the smallest summaries: every article keeps an equal share of the budget
+    share = budget_tokens // max(1, len(condensed))
+    return {name: truncate_tokens(text, share) for name, text in condensed.items()}
@@ -0,0 +1,213 @@
+# ==============================================================================
+# Asyncio Azure OpenAI client with concurrency and rate limiting
+# ==============================================================================
+#
+# Runs many chat completions at once against an Azure OpenAI deployment while
+# staying inside its requests-per-minute (RPM) and tokens-per-minute (TPM)
+# budgets. Both budgets are enforced with token buckets; a semaphore caps the
+# number of requests in flight. HTTP 429 responses are retried with backoff
+# (honouring Retry-After when the service sends it) and temporarily lower the
+# request rate, which then recovers gradually on successful calls.
+#
+# Example:
+#   limiter = AsyncChatClient(max_concurrency=16, requests_per_minute=300, tokens_per_minute=150_000)
+#   texts = asyncio.run(limiter.complete_many([messages_1, messages_2], max_tokens=1000))
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import asyncio  # For running completions concurrently
+import os  # For environment variable management
+import random  # For backoff jitter
+import time  # For measuring elapsed time in the token buckets
+
+# ==============================================================================
+# Part 2: Token bucket
+# ==============================================================================
+
+class TokenBucket:
+    """Token bucket that refills continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0  # Units per second
+        self.scale = 1.0  # Lowered after rate-limit responses
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        """Add the tokens earned since the last update."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate * self.scale)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        """Wait until `amount` tokens are available and take them (first come, first served)."""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / (self.rate * self.scale))
+
+    def adjust(self, amount):
+        """Charge (or refund, if negative) tokens after the real usage is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+# ==============================================================================
+# Part 3: Helper functions
+# ==============================================================================
+
+def estimate_tokens(messages, max_tokens):
+    """Rough token estimate for a request: ~4 characters per prompt token plus the output cap."""
+    prompt_chars = sum(len(message["content"]) for message in messages)
+    return prompt_chars // 4 + len(messages) * 4 + max_tokens
+
+
+def _retry_after(error):
+    """Return the Retry-After delay (seconds) sent with an error, or None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def _is_retryable(error):
+    """Rate limits (429) and server errors (5xx) are retried."""
+    status = getattr(error, "status_code", None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+# ==============================================================================
+# Part 4: Async chat client
+# ==============================================================================
+
+class AsyncChatClient:
+    """
+    Concurrency- and rate-limited wrapper around AsyncAzureOpenAI.
+
+    `stats()` reports the queue depth (requests waiting for a slot or budget),
+    the number of requests in flight and counters for completed, failed,
+    retried and rate-limited calls.
+    """
+
+    def __init__(self, client=None, model="GPT4o-API", max_concurrency=8,
+                 requests_per_minute=60, tokens_per_minute=60_000, max_retries=6):
+        if client is None:
+            from openai import AsyncAzureOpenAI  # Deferred: importing openai is slow
+            client = AsyncAzureOpenAI(
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"), api_version="2024-08-01-preview",
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            )
+        self.client = client
+        self.model = model
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def stats(self):
+        """Return the current queue depth, in-flight count and counters."""
+        return {
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "rate_scale": self.request_bucket.scale,
+        }
+
+    def _slow_down(self):
+        """Halve the request rate after a 429 response."""
+        for bucket in (self.request_bucket, self.token_bucket):
+            bucket.scale = max(0.1, bucket.scale * 0.5)
+
+    def _speed_up(self):
+        """Recover the request rate gradually after successful calls."""
+        for bucket in (self.request_bucket, self.token_bucket):
+            bucket.scale = min(1.0, bucket.scale + 0.05)
+
+    async def create(self, messages, max_tokens=1000, temperature=0.3, **kwargs):
+        """Send one chat completion request and return the full response object."""
+        estimate = estimate_tokens(messages, max_tokens)
+        self.queued += 1
+        started = False
+        try:
+            async with self.semaphore:
+                for attempt in range(self.max_retries + 1):
+                    await self.request_bucket.acquire(1)
+                    await self.token_bucket.acquire(estimate)
+                    if not started:
+                        started = True
+                        self.queued -= 1
+
+                    self.in_flight += 1
+                    try:
+                        response = await self.client.chat.completions.create(
+                            model=self.model, messages=messages, max_tokens=max_tokens,
+                            temperature=temperature, **kwargs,
+                        )
+                    except Exception as e:
+                        if not _is_retryable(e) or attempt == self.max_retries:
+                            raise
+                        if getattr(e, "status_code", None) == 429:
+                            self.rate_limited += 1
+                            self._slow_down()
+                        self.retries += 1
+                        delay = _retry_after(e) or min(60.0, 2 ** attempt) * (0.5 + random.random())
+                        await asyncio.sleep(delay)
+                        continue
+                    finally:
+                        self.in_flight -= 1
+
+                    usage = getattr(response, "usage", None)
+                    if usage is not None and getattr(usage, "total_tokens", None):
+                        self.token_bucket.adjust(usage.total_tokens - estimate)
+                    self._speed_up()
+                    self.completed += 1
+                    return response
+        except BaseException:
+            self.failed += 1
+            if not started:
+                self.queued -= 1
+            raise
+
+    async def complete(self, messages, max_tokens=1000, temperature=0.3, **kwargs):
+        """Send one chat completion request and return the stripped message text."""
+        response = await self.create(messages, max_tokens=max_tokens, temperature=temperature, **kwargs)
+        return response.choices[0].message.content.strip()
+
+    async def complete_many(self, message_lists, max_tokens=1000, temperature=0.3, **kwargs):
+        """
+        Run many chat completions concurrently and return their texts in order.
+        A failed request returns "Error: ..." in its slot, like gpt_prediction.
+        """
+        async def run(messages):
+            try:
+                return await self.complete(messages, max_tokens=max_tokens, temperature=temperature, **kwargs)
+            except Exception as e:
+                return f"Error: Exception occurred during prediction: {str(e)}"
+
+        return await asyncio.gather(*(run(messages) for messages in message_lists))
@@ -0,0 +1,436 @@
+# ==============================================================================
+# Headless batch backtest runner for the BAN443 chatbots
+# ==============================================================================
+#
+# Runs the metrics -> prompt -> GPT prediction pipeline of one of the chatbots
+# over a file of events and writes one row per event with the predicted class
+# next to the realized 3-day price change.
+#
+# Usage:
+#   python batch_backtest.py events.csv results.csv --mode hybrid --workers 8
+#   python batch_backtest.py events.csv results.csv --trace trace.jsonl  # with p50/p95/p99 per stage
+#   python batch_backtest.py events.csv results.csv --panel panel        # bars from a price panel
+#   python batch_backtest.py events.csv results.csv --sentiment gate     # GPT only for uncertain articles
+#   python batch_backtest.py events.csv results.csv --prediction-format json  # validated JSON predictions
+#   python batch_backtest.py events.csv results.csv --token-budget 2000000 --time-budget 3600
+#   python batch_backtest.py events.csv results.csv --concurrency 16 --rpm 300 --tpm 150000
+#
+# The events file (CSV or Parquet) needs the columns `symbol` and `date`
+# (YYYY-MM-DD). The sentiment and hybrid modes also need an `articles` column
+# with the blob names separated by ";". With --auto-articles K, events without
+# articles get the K most relevant indexed articles (article_index.py) of the
+# days up to the event; an optional `company` column is added to the query.
+# An optional `event_id` column is used as the key for resuming; otherwise the
+# key is built from the other columns.
+#
+# Results are appended to the output CSV as soon as each event finishes, so a
+# rerun with the same output file skips every event that is already done.
+#
+# The worker processes compute the metrics (and the sentiment) and build the
+# prediction prompt; the predictions of the financial and hybrid modes are then
+# requested from this process through async_gpt.AsyncChatClient, many at once
+# within the --rpm/--tpm budgets of the deployment.
+#
+# Events are run sorted by symbol, and each worker loads a symbol's price
+# history and indicators once for all of its events (event_study.py) instead
+# of once per event. With --panel, the workers memory-map a price panel
+# (price_panel.py) and read the bars from it; symbols or dates the panel does
+# not cover are loaded from the price cache as before.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import argparse  # For the command-line interface
+import asyncio  # For requesting the predictions concurrently
+import csv  # For appending results row by row
+import importlib  # For loading the chatbot module inside worker processes
+import os  # For file management
+import re  # For extracting the predicted class from free text
+import time  # For timing each event
+from concurrent.futures import ProcessPoolExecutor  # For the worker pool
+
+# Third-party libraries
+import pandas as pd  # For reading the events file
+
+# Local modules
+import tracing  # Per-stage latency spans
+from async_gpt import AsyncChatClient  # Concurrent, rate-limited chat completions
+from completion_cache import token_usage  # Prompt, cached and completion tokens of the API calls
+from event_study import EventStudy, history_range  # One history load and indicator pass per symbol
+from price_panel import PricePanel  # Memory-mapped OHLCV panel shared by the workers
+from sentiment_lexicon import SENTIMENT_MODE, SENTIMENT_MODES  # Lexicon sentiment modes
+from structured_prediction import PREDICTION_FORMAT, PREDICTION_FORMATS, prediction_class  # JSON predictions
+from article_index import relevant_articles  # BM25 search over the extracted articles
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+MODULES = {
+    "financial": "Chatbot_financial_metrics",
+    "hybrid": "Chatbot_hybrid",
+    "sentiment": "Chatbot_sentiment",
+}
+
+# Name of the realized 3-day change in each chatbot's post-event metrics
+REALIZED_CHANGE = {
+    "financial": "post_reference_change_3d",
+    "hybrid": "post_event_change_3d",
+    "sentiment": "post_event_change_3d",
+}
+
+TOKEN_COLUMNS = ("prompt_tokens", "cached_tokens", "completion_tokens")
+
+CLASS_PATTERN = re.compile(r"\b(bullish|neutral|bearish)\b", re.IGNORECASE)
+
+# ==============================================================================
+# Part 3: Helper functions
+# ==============================================================================
+
+def event_key(event):
+    """Return the key that identifies an event in the results file."""
+    if event.get("event_id"):
+        return str(event["event_id"])
+    return f"{event['symbol']}|{event['date']}|{event.get('articles', '')}"
+
+
+def extract_prediction_class(text):
+    """Return the class of a structured prediction, else the first Bullish/Neutral/Bearish label in the text, or ''."""
+    structured = prediction_class(text)
+    if structured:
+        return structured
+    match = CLASS_PATTERN.search(text or "")
+    return match.group(1).capitalize() if match else ""
+
+
+def realized_class(change_3d):
+    """Classify a realized 3-day price change with the rules used in the prompts."""
+    if change_3d in ("N/A", None, ""):
+        return ""
+    change_3d = float(change_3d)
+    return "Bullish" if change_3d > 2 else "Bearish" if change_3d < -2 else "Neutral"
+
+
+def load_events(path):
+    """Read the events file (CSV or Parquet) as a list of dictionaries."""
+    if path.endswith(".parquet"):
+        events = pd.read_parquet(path)
+    else:
+        events = pd.read_csv(path, dtype=str, keep_default_na=False)
+    events = events.fillna("").astype(str)
+    events["symbol"] = events["symbol"].str.strip().str.upper()
+    events["date"] = events["date"].str.slice(0, 10)
+    return events.to_dict("records")
+
+
+def load_finished_keys(path):
+    """Return the keys of the events already written to the results file."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    return set(pd.read_csv(path, dtype=str, keep_default_na=False)["key"])
+
+
+# ==============================================================================
+# Part 4: Pipeline (runs inside the worker processes)
+# ==============================================================================
+
+_chatbot = None
+_date_ranges = {}  # {symbol: (first event date, last event date)} of the whole batch
+_studies = {}  # EventStudy per symbol, loaded on the first event of the symbol
+_panel = None  # PricePanel, if the batch runs on one
+_auto_articles = 0  # Articles selected from the index for events without articles
+_sentiment_mode = None  # gpt, lexicon or gate
+MAX_STUDIES = 64  # Symbols kept in memory per worker
+
+
+def _load_chatbot(mode, date_ranges=None, panel_path=None, auto_articles=0, sentiment_mode=None):
+    """Import the chatbot module (and map the price panel) once per worker process."""
+    global _chatbot, _date_ranges, _panel, _auto_articles, _sentiment_mode
+    _chatbot = importlib.import_module(MODULES[mode])
+    _date_ranges = date_ranges or {}
+    _panel = PricePanel(panel_path) if panel_path else None
+    _auto_articles = auto_articles
+    _sentiment_mode = sentiment_mode
+
+
+def _event_articles(event):
+    """Return the event's article names, or the most relevant indexed articles if it lists none."""
+    names = [name for name in event.get("articles", "").split(";") if name]
+    if not names and _auto_articles:
+        names = relevant_articles(event["symbol"], event["date"], event.get("company"), _auto_articles)
+        if not names:
+            raise ValueError(f"No indexed articles about {event['symbol']} up to {event['date']}.")
+    return names
+
+
+def _event_study(event):
+    """Return the EventStudy covering all events of the event's symbol."""
+    symbol = event["symbol"]
+    if symbol not in _studies:
+        if len(_studies) >= MAX_STUDIES:
+            _studies.pop(next(iter(_studies)))  # Drop the oldest symbol
+        first, last = _date_ranges.get(symbol, (event["date"], event["date"]))
+        if _panel is not None and symbol in _panel and _panel.covers(*history_range(first, last)):
+            _studies[symbol] = EventStudy.from_panel(_panel, symbol)
+        else:
+            _studies[symbol] = EventStudy.load(symbol, first, last)
+    return _studies[symbol]
+
+
+def _run_financial(event):
+    """Reference-day metrics -> prompt (Chatbot_financial_metrics)."""
+    study = _event_study(event)
+    reference_metrics = study.event_day_metrics(event["date"], label="reference")
+    pre_reference_metrics = study.pre_event_metrics(event["date"], label="reference")
+    sector, market_cap = _chatbot.fetch_company_info(event["symbol"], reference_metrics)
+    post_reference_metrics = study.post_event_metrics(event["date"], label="reference")
+    final_prompt = _chatbot.prepare_final_prompt(
+        event["symbol"], reference_metrics, pre_reference_metrics, sector, market_cap
+    )
+    return {"final_prompt": final_prompt, **post_reference_metrics}
+
+
+def _run_hybrid(event):
+    """Articles -> sentiment -> event metrics -> prompt (Chatbot_hybrid)."""
+    articles = _chatbot.process_articles(_event_articles(event))
+    sentiment_response = _chatbot.analyze_sentiments_for_articles(articles, sentiment_mode=_sentiment_mode)
+    if sentiment_response.startswith("Error"):
+        raise ValueError(sentiment_response)
+    study = _event_study(event)
+    event_metrics = study.event_day_metrics(event["date"])
+    pre_event_metrics = study.pre_event_metrics(event["date"])
+    sector, market_cap = _chatbot.fetch_company_info(event["symbol"], event_metrics)
+    post_event_metrics = study.post_event_metrics(event["date"])
+    final_prompt = _chatbot.prepare_final_prompt(
+        event["symbol"], event_metrics, pre_event_metrics, sector, market_cap, sentiment_response
+    )
+    return {"final_prompt": final_prompt, "sentiment": sentiment_response, **post_event_metrics}
+
+
+def _run_sentiment(event):
+    """Articles -> sentiment classification (Chatbot_sentiment)."""
+    articles = _chatbot.process_articles(_event_articles(event))
+    sentiment_response = _chatbot.analyze_sentiments_for_articles(articles, sentiment_mode=_sentiment_mode)
+    post_event_metrics = _event_study(event).post_event_metrics(event["date"])
+    return {"prediction": sentiment_response, **post_event_metrics}
+
+
+PIPELINES = {
+    "financial": _run_financial,
+    "hybrid": _run_hybrid,
+    "sentiment": _run_sentiment,
+}
+
+
+def prepare_event(mode, event):
+    """
+    Run the pipeline for one event up to the prediction and return its result row.
+    For the financial and hybrid modes the row carries the prompt as "final_prompt";
+    the prediction itself is requested by predict_event().
+    """
+    started = time.perf_counter()
+    tokens_before = token_usage.totals()
+    row = {
+        "key": event_key(event),
+        "symbol": event["symbol"],
+        "date": event["date"],
+        "predicted_class": "",
+        REALIZED_CHANGE[mode]: "",
+        "realized_class": "",
+        "prediction": "",
+        "error": "",
+    }
+    try:
+        with tracing.span("event", mode=mode, symbol=event["symbol"], date=event["date"]):
+            result = PIPELINES[mode](event)
+        row[REALIZED_CHANGE[mode]] = result[REALIZED_CHANGE[mode]]
+        row["realized_class"] = realized_class(result[REALIZED_CHANGE[mode]])
+        if "final_prompt" in result:
+            row["final_prompt"] = result["final_prompt"]
+        else:
+            record_prediction(row, result["prediction"])
+    except Exception as e:
+        row["error"] = str(e) or type(e).__name__
+    row["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    tokens_after = token_usage.totals()
+    for counter in TOKEN_COLUMNS:
+        row[counter] = tokens_after[counter] - tokens_before[counter]
+    return row
+
+
+def record_prediction(row, prediction):
+    """Store a prediction and its class in a result row (an "Error: ..." prediction becomes the error)."""
+    if prediction.startswith("Error"):
+        row["error"] = prediction
+        return
+    row["prediction"] = prediction
+    row["predicted_class"] = extract_prediction_class(prediction)
+
+
+async def predict_event(chatbot, chat_client, row, prediction_format=None):
+    """Request the prediction for a row from prepare_event() and add it, its time and its tokens to the row."""
+    final_prompt = row.pop("final_prompt", None)
+    if final_prompt is None:
+        return row
+    started = time.perf_counter()
+    with tracing.span("prediction", symbol=row["symbol"], date=row["date"]), token_usage.track() as used:
+        prediction = await chatbot.gpt_prediction_async(final_prompt, chat_client, prediction_format)
+    record_prediction(row, prediction)
+    row["elapsed_seconds"] = round(row["elapsed_seconds"] + time.perf_counter() - started, 3)
+    for counter in TOKEN_COLUMNS:
+        row[counter] += used[counter]
+    return row
+
+
+# ==============================================================================
+# Part 5: Batch driver
+# ==============================================================================
+
+async def _run_pending(pending, mode, pool, chat_client, writer, output_file, workers, log_every=25,
+                       prediction_format=None, token_budget=None, time_budget=None):
+    """
+    Prepare the events in the worker pool and request their predictions concurrently,
+    writing each row as soon as it is complete. Returns (events finished, tokens used, stop reason).
+    """
+    loop = asyncio.get_running_loop()
+    chatbot = importlib.import_module(MODULES[mode])
+
+    async def run(event):
+        row = await loop.run_in_executor(pool, prepare_event, mode, event)
+        return await predict_event(chatbot, chat_client, row, prediction_format)
+
+    started = time.perf_counter()
+    used = dict.fromkeys(TOKEN_COLUMNS, 0)
+    stop_reason = None
+    completed = 0
+
+    # Keep a bounded number of events in flight so memory stays flat for large files;
+    # events waiting for their prediction do not hold a worker
+    limit = workers * 2 + chat_client.max_concurrency
+    queue = iter(pending)
+    in_flight = set()
+    while True:
+        if stop_reason is None:
+            if token_budget and used["prompt_tokens"] + used["completion_tokens"] >= token_budget:
+                stop_reason = f"token budget of {token_budget:,} reached"
+            elif time_budget and time.perf_counter() - started >= time_budget:
+                stop_reason = f"time budget of {time_budget:,} s reached"
+        while stop_reason is None and len(in_flight) < limit:
+            event = next(queue, None)
+            if event is None:
+                break
+            in_flight.add(asyncio.ensure_future(run(event)))
+        if not in_flight:
+            break
+
+        done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            row = task.result()
+            writer.writerow(row)
+            completed += 1
+            for counter in TOKEN_COLUMNS:
+                used[counter] += row[counter]
+        output_file.flush()  # Every finished event survives a crash
+        if completed % log_every < len(done):
+            print(f"{completed}/{len(pending)} events finished")
+    return completed, used, stop_reason
+
+
+def run_batch(events_path, output_path, mode="hybrid", workers=4, retry_errors=False, log_every=25,
+              panel_path=None, auto_articles=0, sentiment_mode=None, prediction_format=None,
+              token_budget=None, time_budget=None, chat_client=None):
+    """
+    Run the chatbot pipeline over every unfinished event in `events_path` and
+    append the results to `output_path`. Returns the number of events run.
+
+    The predictions are requested through `chat_client` (an async_gpt.AsyncChatClient,
+    created with its default limits if not given). No new events are started once
+    the run has used `token_budget` prompt and completion tokens or `time_budget`
+    seconds; the rest are left for a resumed run.
+    """
+    if retry_errors and os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        # Drop the failed rows so every event keeps exactly one row after the retry
+        results = pd.read_csv(output_path, dtype=str, keep_default_na=False)
+        results[results["error"] == ""].to_csv(output_path, index=False)
+
+    finished = load_finished_keys(output_path)
+    pending = [event for event in load_events(events_path) if event_key(event) not in finished]
+    print(f"{len(finished)} events already done, {len(pending)} to run with {workers} workers.")
+    if not pending:
+        return 0
+
+    # Each worker loads a symbol's history once for the whole range of its events
+    date_ranges = {}
+    for event in pending:
+        first, last = date_ranges.get(event["symbol"], (event["date"], event["date"]))
+        date_ranges[event["symbol"]] = (min(first, event["date"]), max(last, event["date"]))
+    pending.sort(key=lambda event: (event["symbol"], event["date"]))
+
+    fieldnames = ["key", "symbol", "date", "predicted_class", REALIZED_CHANGE[mode], "realized_class",
+                  "prediction", "error", "elapsed_seconds", *TOKEN_COLUMNS]
+    new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+    if not new_file:
+        # Keep appending in the layout of the existing file (which may predate the token columns)
+        with open(output_path, newline="", encoding="utf-8") as results_file:
+            fieldnames = next(csv.reader(results_file))
+
+    with open(output_path, "a", newline="", encoding="utf-8") as output_file, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_load_chatbot,
+                                initargs=(mode, date_ranges, panel_path, auto_articles, sentiment_mode)) as pool:
+        writer = csv.DictWriter(output_file, fieldnames=fieldnames, extrasaction="ignore")
+        if new_file:
+            writer.writeheader()
+
+        completed, used, stop_reason = asyncio.run(_run_pending(
+            pending, mode, pool, chat_client or AsyncChatClient(), writer, output_file, workers, log_every,
+            prediction_format, token_budget, time_budget
+        ))
+
+    if stop_reason is not None and completed < len(pending):
+        print(f"Stopped early ({stop_reason}); {len(pending) - completed} events left for the next run.")
+    cached_share = used["cached_tokens"] / used["prompt_tokens"] if used["prompt_tokens"] else 0.0
+    print(f"Tokens: {used['prompt_tokens']:,} prompt ({used['cached_tokens']:,} cached, {cached_share:.0%}), "
+          f"{used['completion_tokens']:,} completion")
+    return completed
+
+
+def main():
+    """Parse the command-line arguments and run the batch."""
+    parser = argparse.ArgumentParser(description="Run a BAN443 chatbot pipeline over a file of events.")
+    parser.add_argument("events", help="CSV or Parquet file with symbol, date and (optionally) articles columns")
+    parser.add_argument("output", help="CSV file the results are appended to (also used to resume)")
+    parser.add_argument("--mode", choices=sorted(MODULES), default="hybrid", help="Chatbot pipeline to run")
+    parser.add_argument("--workers", type=int, default=4, help="Number of worker processes")
+    parser.add_argument("--retry-errors", action="store_true", help="Run failed events again")
+    parser.add_argument("--trace", help="Append per-stage spans to this JSON-lines file and summarize them")
+    parser.add_argument("--panel", help="Price panel directory (price_panel.py) to read the bars from")
+    parser.add_argument("--auto-articles", type=int, default=0, metavar="K",
+                        help="Give events without articles the K most relevant indexed articles")
+    parser.add_argument("--sentiment", choices=SENTIMENT_MODES, default=SENTIMENT_MODE,
+                        help="Sentiment scoring: GPT, the finance lexicon, or the lexicon with GPT for uncertain cases")
+    parser.add_argument("--prediction-format", choices=PREDICTION_FORMATS, default=PREDICTION_FORMAT,
+                        help="Prose prediction with the full rationale, or validated JSON with a short one")
+    parser.add_argument("--concurrency", type=int, default=8, help="Prediction requests in flight at the same time")
+    parser.add_argument("--rpm", type=int, default=60, help="Requests-per-minute budget of the deployment")
+    parser.add_argument("--tpm", type=int, default=60_000, help="Tokens-per-minute budget of the deployment")
+    parser.add_argument("--token-budget", type=int, help="Start no new events after this many prompt + completion tokens")
+    parser.add_argument("--time-budget", type=float, help="Start no new events after this many seconds")
+    args = parser.parse_args()
+
+    if args.trace:
+        tracing.enable(args.trace)  # Before the pool starts, so the workers trace too
+    completed = run_batch(args.events, args.output, args.mode, args.workers, args.retry_errors,
+                          panel_path=args.panel, auto_articles=args.auto_articles, sentiment_mode=args.sentiment,
+                          prediction_format=args.prediction_format, token_budget=args.token_budget,
+                          time_budget=args.time_budget,
+                          chat_client=AsyncChatClient(max_concurrency=args.concurrency, requests_per_minute=args.rpm,
+                                                      tokens_per_minute=args.tpm))
+    print(f"Finished {completed} events. Results written to {args.output}")
+    if args.trace and os.path.exists(args.trace):
+        print(tracing.format_summary(tracing.summarize(args.trace)))
+
+
+if __name__ == "__main__":
+    main()
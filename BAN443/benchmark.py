@@ -0,0 +1,267 @@
+# ==============================================================================
+# Offline benchmark of the BAN443 analysis pipelines
+# ==============================================================================
+#
+# Times every stage of the chatbots' analyze pipeline (ChatbotGUI.run_analysis,
+# the part that analyze() queues on the worker thread) end to end with the
+# local stand-ins from benchmark_fakes.py, so the numbers can be reproduced on
+# a laptop without Azure or Yahoo access. Each scenario (mode x articles per
+# event x events) starts with empty caches; with --warm it is run a second
+# time on the filled caches.
+#
+# Usage:
+#   python benchmark.py                                   # all modes, default sizes
+#   python benchmark.py --modes hybrid --articles 1 5 20 --events 1 10
+#   python benchmark.py --latency 0.2 --json results.json
+#   python benchmark.py --compare results.json            # show change against earlier results
+#   python benchmark.py --trace trace.jsonl               # also record spans, p50/p95/p99 per stage
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import argparse  # For the command-line interface
+import importlib  # For loading the chatbot modules
+import json  # For saving and comparing results
+import os  # For file and directory management
+import statistics  # For summarizing stage timings
+import tempfile  # For the generated data and the per-scenario caches
+import time  # For timing the stages
+from datetime import datetime, timedelta  # For generating event dates
+from zoneinfo import ZoneInfo  # For timezone support
+
+# Local modules
+import tracing  # Per-stage latency spans
+from trading_calendar import is_trading_day, next_trading_day  # Oslo Børs trading days
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+MODULES = {
+    "financial": "Chatbot_financial_metrics",
+    "hybrid": "Chatbot_hybrid",
+    "sentiment": "Chatbot_sentiment",
+}
+
+SYMBOLS = ("EQNR.OL", "DNB.OL", "MOWI.OL", "NHY.OL", "TEL.OL", "ORK.OL", "YAR.OL", "AKRBP.OL")
+FIRST_EVENT = datetime(2024, 3, 4)
+
+# ==============================================================================
+# Part 3: Timing
+# ==============================================================================
+
+class TimingJob:
+    """AnalysisJob stand-in that records how long each reported stage takes."""
+
+    def __init__(self):
+        self.stages = {}
+        self.output = []
+        self._stage = None
+        self._started = time.perf_counter()
+
+    def check(self):
+        pass
+
+    def progress(self, stage):
+        self._close_stage()
+        self._stage = (stage, time.perf_counter())
+
+    def insert(self, index, text):
+        self.output.append(text)
+
+    def _close_stage(self):
+        if self._stage is not None:
+            stage, started = self._stage
+            self.stages[stage] = self.stages.get(stage, 0.0) + time.perf_counter() - started
+            self._stage = None
+
+    def finish(self):
+        """Close the last stage and return the total time."""
+        self._close_stage()
+        return time.perf_counter() - self._started
+
+    def errors(self):
+        """Return the error messages the pipeline wrote to the display."""
+        return [text.strip() for text in self.output if text.startswith(("Error", "Unexpected error"))]
+
+
+def make_events(count, articles_per_event, article_names):
+    """Return `count` events, each with its own slice of the articles."""
+    events = []
+    for number in range(count):
+        date = FIRST_EVENT + timedelta(weeks=number % 26, days=number // 26)
+        if not is_trading_day(date):
+            date = next_trading_day(date)
+        events.append({
+            "symbol": SYMBOLS[number % len(SYMBOLS)],
+            "date": date.strftime("%Y-%m-%d"),
+            "articles": article_names[number * articles_per_event:(number + 1) * articles_per_event],
+        })
+    return events
+
+
+def run_event(module, mode, event):
+    """Run one analysis and return (stage seconds, total seconds, errors)."""
+    date = datetime.strptime(event["date"], "%Y-%m-%d").replace(tzinfo=ZoneInfo("Europe/Oslo"))
+    job = TimingJob()
+    with tracing.span("analysis", mode=mode, symbol=event["symbol"], date=event["date"]):
+        if mode == "financial":
+            module.ChatbotGUI.run_analysis(None, job, event["date"], date, event["symbol"])
+        elif mode == "sentiment":
+            module.ChatbotGUI.run_analysis(None, job, date, event["symbol"], event["articles"])
+        else:
+            module.ChatbotGUI.run_analysis(None, job, event["date"], date, event["symbol"], event["articles"])
+    total = job.finish()
+    return job.stages, total, job.errors()
+
+
+# ==============================================================================
+# Part 4: Scenarios
+# ==============================================================================
+
+def install_fakes(module, chat_client, container_client, price_source):
+    """Point a chatbot module and the shared data modules at the local stand-ins."""
+    import price_cache
+
+    module.client = chat_client
+    if hasattr(module, "container_client"):
+        module.container_client = container_client
+    if hasattr(module, "yf"):
+        module.yf = price_source
+    price_cache.yf = price_source
+
+
+def reset_caches(module, directory):
+    """Give the chatbot module empty caches in `directory`."""
+    import article_dedup
+    import article_ingest
+    import article_sentiment
+    import article_summarizer
+    import price_cache
+    import structured_prediction
+    from article_cache import ArticleCache
+    from completion_cache import CompletionCache
+
+    completions = CompletionCache(os.path.join(directory, "completions"), enabled=True)
+    module.completion_cache = completions
+    article_summarizer.completion_cache = completions
+    article_sentiment.completion_cache = completions
+    structured_prediction.completion_cache = completions
+    article_sentiment.article_sentiment_cache = article_sentiment.ArticleSentimentCache(
+        os.path.join(directory, "article_sentiment.sqlite")
+    )
+    article_ingest.article_cache = article_dedup.article_cache = ArticleCache(os.path.join(directory, "articles.sqlite"))
+    price_cache._default_store = price_cache.PriceStore(os.path.join(directory, "prices.sqlite"))
+
+
+def run_scenario(module, mode, events, passes):
+    """Run the events once per pass and return one result per pass."""
+    results = []
+    for pass_name in passes:
+        stage_times, totals, errors = {}, [], []
+        for event in events:
+            stages, total, event_errors = run_event(module, mode, event)
+            totals.append(total)
+            errors.extend(event_errors)
+            for stage, seconds in stages.items():
+                stage_times.setdefault(stage, []).append(seconds)
+        results.append({
+            "pass": pass_name,
+            "total_seconds": sum(totals),
+            "event_mean": statistics.mean(totals),
+            "event_max": max(totals),
+            "stages": {stage: statistics.mean(seconds) for stage, seconds in stage_times.items()},
+            "errors": errors,
+        })
+    return results
+
+
+def print_result(scenario, result, baseline=None):
+    """Print one scenario result as a small table."""
+    line = (f"{scenario} [{result['pass']}]: total {result['total_seconds']:.2f} s, "
+            f"per event mean {result['event_mean']:.3f} s, max {result['event_max']:.3f} s")
+    if baseline is not None:
+        change = (result["event_mean"] / baseline["event_mean"] - 1) * 100 if baseline["event_mean"] else 0.0
+        line += f" ({change:+.1f}% vs baseline)"
+    print(line)
+    for stage, seconds in result["stages"].items():
+        print(f"    {stage:34} {seconds * 1000:9.1f} ms")
+    for error in result["errors"][:3]:
+        print(f"    ! {error}")
+
+
+# ==============================================================================
+# Part 5: Command-line interface
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the BAN443 pipelines with local stand-ins.")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODULES), default=sorted(MODULES))
+    parser.add_argument("--articles", nargs="+", type=int, default=[1, 5, 20], help="Articles per event")
+    parser.add_argument("--events", nargs="+", type=int, default=[1, 5], help="Events per scenario")
+    parser.add_argument("--words", type=int, default=800, help="Words per generated article")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds until the first GPT token")
+    parser.add_argument("--tokens-per-second", type=float, default=80, help="Simulated GPT output speed")
+    parser.add_argument("--storage-latency", type=float, default=0.02, help="Seconds per blob/price request")
+    parser.add_argument("--warm", action="store_true", help="Run every scenario again on the filled caches")
+    parser.add_argument("--data-dir", help="Where to generate articles and prices (default: temporary)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results file from an earlier run to compare against")
+    parser.add_argument("--trace", help="Record per-stage spans to this JSON-lines file and summarize them")
+    args = parser.parse_args()
+
+    # Keep the benchmark's caches out of the real cache directory
+    work_dir = tempfile.mkdtemp(prefix="ban443_benchmark_")
+    os.environ.setdefault("BAN443_CACHE_DIR", os.path.join(work_dir, "default_cache"))
+
+    from benchmark_fakes import (  # Imported after BAN443_CACHE_DIR is set
+        CsvPriceSource, FakeChatClient, FakeContainerClient, write_articles, write_prices,
+    )
+
+    if args.trace:
+        tracing.enable(args.trace)
+
+    data_dir = args.data_dir or os.path.join(work_dir, "data")
+    article_dir = os.path.join(data_dir, "articles")
+    price_dir = os.path.join(data_dir, "prices")
+    article_names = []
+    if set(args.modes) != {"financial"}:
+        article_names = write_articles(article_dir, max(args.articles) * max(args.events), args.words)
+    for symbol in SYMBOLS:
+        write_prices(price_dir, symbol)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = {(row["scenario"], row["pass"]): row for row in json.load(baseline_file)}
+
+    passes = ("cold", "warm") if args.warm else ("cold",)
+    rows = []
+    for mode in args.modes:
+        module = importlib.import_module(MODULES[mode])
+        chat_client = FakeChatClient(args.latency, args.tokens_per_second)
+        install_fakes(
+            module, chat_client,
+            FakeContainerClient(article_dir, args.storage_latency),
+            CsvPriceSource(price_dir, args.storage_latency),
+        )
+        for articles in [0] if mode == "financial" else args.articles:
+            for event_count in args.events:
+                scenario = f"{mode} articles={articles} events={event_count}"
+                reset_caches(module, tempfile.mkdtemp(dir=work_dir))
+                events = make_events(event_count, articles, article_names)
+                for result in run_scenario(module, mode, events, passes):
+                    print_result(scenario, result, baseline.get((scenario, result["pass"])))
+                    rows.append({"scenario": scenario, **result})
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as results_file:
+            json.dump(rows, results_file, indent=2)
+    if args.trace:
+        print(tracing.format_summary(tracing.summarize(args.trace)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+# ==============================================================================
+# Local stand-ins for Azure Blob Storage, Azure OpenAI and yfinance
+# ==============================================================================
+#
+# Used by benchmark.py to run the chatbot pipelines without network access.
+# Everything is deterministic: article PDFs and price series are generated
+# from a seed, and the fake chat client derives its answer from a hash of the
+# request. Latency is simulated with sleeps so that the timings keep the
+# shape of the real services.
+#
+#   FakeContainerClient  - directory of PDFs behaving like a ContainerClient
+#   FakeChatClient       - chat.completions.create() with configurable latency
+#   CsvPriceSource       - drop-in for the yfinance module (Ticker().history)
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import hashlib  # For deterministic fake answers
+import json  # For structured (JSON schema) answers
+import os  # For file and directory management
+import random  # For generating articles and prices from a seed
+import time  # For simulated latency
+from datetime import datetime, timezone  # For blob modification times
+from types import SimpleNamespace  # For response objects shaped like the SDKs'
+
+# Third-party libraries
+import numpy as np  # For generating price series
+import pandas as pd  # For reading and writing the price CSV files
+
+# Local modules
+from trading_calendar import trading_days  # Oslo Børs trading days
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+MARKET_TIMEZONE = "Europe/Oslo"
+
+WORDS = (
+    "revenue earnings guidance dividend margin growth outlook quarter production contract order "
+    "backlog demand cost decline increase strong weak profit loss investment shipping salmon oil "
+    "gas energy bank loan interest rate capacity market share analyst upgrade downgrade target "
+    "buyback acquisition merger restructuring volume price export customer supply chain expected "
+    "record result board management strategy risk impairment cash flow debt"
+).split()
+
+SECTORS = ("Energy", "Financial Services", "Consumer Defensive", "Industrials", "Basic Materials")
+
+# ==============================================================================
+# Part 3: Blob Storage stand-in
+# ==============================================================================
+
+def write_articles(directory, count, words_per_article=800, seed=0):
+    """Write `count` deterministic article PDFs to a directory and return their names."""
+    import fitz  # PyMuPDF for writing the PDFs
+
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for number in range(count):
+        name = f"article_{number:05d}.pdf"
+        names.append(name)
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            continue
+        rng = random.Random(f"{seed}-{number}")
+        words = [rng.choice(WORDS) for _ in range(words_per_article)]
+        lines = [" ".join(words[start:start + 12]) for start in range(0, len(words), 12)]
+        with fitz.open() as doc:
+            for start in range(0, len(lines), 60):
+                page = doc.new_page()
+                page.insert_text((50, 72), "\n".join(lines[start:start + 60]), fontsize=9)
+            doc.save(path)
+    return names
+
+
+class FakeBlobClient:
+    """BlobClient stand-in serving one file, with a fixed latency per request."""
+
+    def __init__(self, path, name, latency=0.0):
+        self.path = path
+        self.name = name
+        self.latency = latency
+
+    def get_blob_properties(self):
+        time.sleep(self.latency)
+        stat = os.stat(self.path)
+        return SimpleNamespace(
+            name=self.name, size=stat.st_size, etag=f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            last_modified=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+        )
+
+    def download_blob(self, max_concurrency=1):
+        properties = self.get_blob_properties()
+        with open(self.path, "rb") as blob_file:
+            content = blob_file.read()
+        return SimpleNamespace(properties=properties, readall=lambda: content)
+
+
+class FakeBlobPages:
+    """ItemPaged stand-in: iterate over blobs, or over pages with by_page()."""
+
+    def __init__(self, names, page_size):
+        self.names = names
+        self.page_size = page_size or 5000
+
+    def __iter__(self):
+        return (SimpleNamespace(name=name) for name in self.names)
+
+    def by_page(self):
+        for start in range(0, len(self.names), self.page_size):
+            yield [SimpleNamespace(name=name) for name in self.names[start:start + self.page_size]]
+
+
+class FakeContainerClient:
+    """ContainerClient stand-in backed by a local directory."""
+
+    def __init__(self, directory, latency=0.0, container_name="chatbot-articles"):
+        self.directory = directory
+        self.latency = latency
+        self.container_name = container_name
+
+    def list_blobs(self, results_per_page=None):
+        return FakeBlobPages(sorted(os.listdir(self.directory)), results_per_page)
+
+    def get_blob_client(self, blob):
+        return FakeBlobClient(os.path.join(self.directory, blob), blob, self.latency)
+
+
+# ==============================================================================
+# Part 4: Azure OpenAI stand-in
+# ==============================================================================
+
+class FakeChatClient:
+    """
+    AzureOpenAI stand-in. A response takes `latency` seconds until the first
+    token plus one `1 / tokens_per_second` step per token, with or without
+    streaming. The answer is derived from the request, so it is reproducible.
+
+    Responses carry a usage record. Like the provider's prompt cache, prompt
+    prefixes of at least 1024 tokens that were sent before count as cached,
+    in blocks of 128 tokens.
+    """
+
+    PREFIX_BLOCK_TOKENS = 128
+    MIN_CACHED_TOKENS = 1024
+
+    def __init__(self, latency=0.5, tokens_per_second=80, response_tokens=200):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.requests = 0
+        self._prefixes = set()  # Hashes of the prompt prefixes sent so far
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def answer(self, messages, max_tokens, response_format=None):
+        """Return the deterministic answer tokens for a request (a JSON object for structured outputs)."""
+        digest = hashlib.sha256(repr(messages).encode("utf-8")).hexdigest()
+        rng = random.Random(digest)
+        label = ("Bullish", "Neutral", "Bearish")[int(digest, 16) % 3]
+        count = max(1, min(max_tokens, self.response_tokens) - 2)
+        if response_format is not None:
+            words = " ".join(rng.choice(WORDS) for _ in range(min(count, 40)))
+            text = json.dumps({"class": label, "confidence": round(rng.random(), 2), "rationale": words})
+            return [text[start:start + 4] for start in range(0, len(text), 4)]  # ~4 characters per token
+        # Sentiment requests ask for a leading "Classification: <class>" line
+        prefix = "Classification" if "'Classification: " in messages[-1]["content"] else "Prediction"
+        return [f"{prefix}: {label}."] + [f" {rng.choice(WORDS)}" for _ in range(count)]
+
+    def usage(self, messages, tokens):
+        """Return the usage record of a request, counting previously sent prompt prefixes as cached."""
+        prompt = "".join(message["content"] for message in messages)
+        block_chars = self.PREFIX_BLOCK_TOKENS * 4
+        digest = hashlib.sha256()
+        cached_blocks, matching = 0, True
+        for block, start in enumerate(range(0, len(prompt) - block_chars + 1, block_chars), start=1):
+            digest.update(prompt[start:start + block_chars].encode("utf-8"))
+            prefix = digest.hexdigest()
+            if matching and prefix in self._prefixes:
+                cached_blocks = block
+            else:
+                matching = False
+                self._prefixes.add(prefix)
+        cached = cached_blocks * self.PREFIX_BLOCK_TOKENS
+        return SimpleNamespace(
+            prompt_tokens=len(prompt) // 4 + 1, completion_tokens=len(tokens),
+            prompt_tokens_details=SimpleNamespace(cached_tokens=cached if cached >= self.MIN_CACHED_TOKENS else 0),
+        )
+
+    def create(self, model, messages, max_tokens=None, temperature=None, stream=False, response_format=None,
+               stream_options=None):
+        self.requests += 1
+        tokens = self.answer(messages, max_tokens or self.response_tokens, response_format)
+        usage = self.usage(messages, tokens)
+        time.sleep(self.latency)
+        if stream:
+            return self._stream(tokens, usage if (stream_options or {}).get("include_usage") else None)
+        time.sleep(len(tokens) / self.tokens_per_second)
+        message = SimpleNamespace(content="".join(tokens))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    def _stream(self, tokens, usage=None):
+        for token in tokens:
+            time.sleep(1 / self.tokens_per_second)
+            delta = SimpleNamespace(content=token)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        if usage is not None:
+            yield SimpleNamespace(choices=[], usage=usage)  # Final chunk with stream_options include_usage
+
+
+# ==============================================================================
+# Part 5: yfinance stand-in
+# ==============================================================================
+
+def write_prices(directory, symbol, start="2022-01-03", end="2025-06-30", seed=0):
+    """Write a deterministic random-walk price history (Oslo Børs trading days) for a symbol to `<symbol>.csv`."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{symbol}.csv")
+    if os.path.exists(path):
+        return path
+
+    dates = pd.DatetimeIndex(trading_days(start, end))
+    rng = np.random.default_rng(int(hashlib.sha256(f"{seed}-{symbol}".encode()).hexdigest()[:8], 16))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, len(dates))))
+    open_ = close * (1 + rng.normal(0, 0.005, len(dates)))
+    spread = np.abs(rng.normal(0, 0.01, len(dates))) * close
+    pd.DataFrame({
+        "Date": dates.strftime("%Y-%m-%d"),
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread,
+        "Low": np.minimum(open_, close) - spread,
+        "Close": close,
+        "Volume": rng.integers(100_000, 5_000_000, len(dates)),
+        "Dividends": 0.0,
+        "Stock Splits": 0.0,
+    }).to_csv(path, index=False)
+    return path
+
+
+class CsvTicker:
+    """yfinance Ticker stand-in reading `<symbol>.csv`."""
+
+    def __init__(self, source, symbol):
+        self.source = source
+        self.symbol = symbol
+
+    def history(self, start=None, end=None, **kwargs):
+        time.sleep(self.source.latency)
+        data = self.source.load(self.symbol)
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start, tz=MARKET_TIMEZONE)]
+        if end is not None:
+            data = data[data.index < pd.Timestamp(end, tz=MARKET_TIMEZONE)]
+        return data.copy()
+
+    @property
+    def info(self):
+        time.sleep(self.source.latency)
+        seed = int(hashlib.sha256(self.symbol.encode()).hexdigest()[:8], 16)
+        return {"longName": f"{self.symbol.split('.')[0].title()} ASA", "sector": SECTORS[seed % len(SECTORS)],
+                "sharesOutstanding": 50_000_000 + seed % 10 ** 9}
+
+
+class CsvPriceSource:
+    """Drop-in for the yfinance module: `source.Ticker(symbol).history(start, end)`."""
+
+    def __init__(self, directory, latency=0.0):
+        self.directory = directory
+        self.latency = latency
+        self._frames = {}
+
+    def load(self, symbol):
+        """Return the full price history of a symbol."""
+        if symbol not in self._frames:
+            data = pd.read_csv(os.path.join(self.directory, f"{symbol}.csv"), parse_dates=["Date"])
+            self._frames[symbol] = data.set_index(
+                pd.DatetimeIndex(data.pop("Date")).tz_localize(MARKET_TIMEZONE).rename("Date")
+            )
+        return self._frames[symbol]
+
+    def Ticker(self, symbol):
+        return CsvTicker(self, symbol)
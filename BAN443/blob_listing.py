@@ -0,0 +1,129 @@
+# ==============================================================================
+# Paginated, cached blob name listing with search
+# ==============================================================================
+#
+# Keeps the list of article names available to the GUI without blocking it.
+# The names from the previous run are loaded from a local cache file right
+# away; a background thread then lists the container page by page and hands
+# each page to the GUI, which picks them up with `poll()` from an `after()`
+# callback. When the listing completes, the cache is rewritten (dropping
+# deleted blobs). `search()` filters the names by prefix or substring.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import json  # For the cache file
+import os  # For file and directory management
+import queue  # For passing pages from the listing thread to the GUI
+import tempfile  # For atomic writes
+import threading  # For listing in the background
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+CACHE_DIR = os.getenv("BAN443_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+PAGE_SIZE = 1000  # Blob names per listing page
+MAX_RESULTS = 500  # Names shown in the listbox at a time
+
+# ==============================================================================
+# Part 3: Blob name index
+# ==============================================================================
+
+class BlobNameIndex:
+    """Sorted, searchable list of blob names that is refreshed in the background."""
+
+    def __init__(self, container_client, container_name=None, cache_path=None, page_size=PAGE_SIZE):
+        self.container_client = container_client
+        # Passing the name avoids touching a lazily constructed client on the GUI thread
+        container_name = container_name or getattr(container_client, "container_name", "container")
+        self.cache_path = cache_path or os.path.join(CACHE_DIR, f"blob_names_{container_name}.json")
+        self.page_size = page_size
+        self.names = self._load_cache()
+        self.loading = False
+        self.error = None
+        self._known = set(self.names)
+        self._pages = queue.Queue()
+
+    def _load_cache(self):
+        """Return the names saved by the previous run (empty if there is no cache)."""
+        try:
+            with open(self.cache_path, encoding="utf-8") as cache_file:
+                return sorted(json.load(cache_file))
+        except (OSError, ValueError):
+            return []
+
+    def _save_cache(self, names):
+        """Write the complete list of names to the cache file."""
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.cache_path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as cache_file:
+            json.dump(names, cache_file)
+        os.replace(temp_path, self.cache_path)
+
+    def refresh(self):
+        """Start listing the container page by page on a background thread."""
+        if self.loading:
+            return
+        self.loading = True
+        self.error = None
+        threading.Thread(target=self._list_pages, daemon=True).start()
+
+    def _list_pages(self):
+        """Listing thread: send every page of names to the queue, then the full list."""
+        listed = []
+        try:
+            pages = self.container_client.list_blobs(results_per_page=self.page_size).by_page()
+            for page in pages:
+                names = [blob.name for blob in page]
+                listed.extend(names)
+                self._pages.put(("page", names))
+            self._save_cache(listed)
+            self._pages.put(("done", listed))
+        except Exception as e:
+            self._pages.put(("error", str(e)))
+
+    def poll(self):
+        """Merge the pages listed so far into `names`. Returns True if the names changed."""
+        changed = False
+        try:
+            while True:
+                kind, payload = self._pages.get_nowait()
+                if kind == "page":
+                    new_names = [name for name in payload if name not in self._known]
+                    self._known.update(new_names)
+                    changed = changed or bool(new_names)
+                elif kind == "done":
+                    # The complete listing replaces the cached names, dropping deleted blobs
+                    changed = changed or len(payload) != len(self._known)
+                    self._known = set(payload)
+                    self.loading = False
+                else:
+                    self.error = payload
+                    self.loading = False
+        except queue.Empty:
+            pass
+        if changed:
+            self.names = sorted(self._known)
+        return changed
+
+    def search(self, query, limit=MAX_RESULTS):
+        """
+        Return up to `limit` names matching the query (case-insensitive):
+        prefix matches first, then names that contain the query elsewhere.
+        """
+        query = query.strip().lower()
+        if not query:
+            return self.names[:limit]
+        prefix, contains = [], []
+        for name in self.names:
+            lower = name.lower()
+            if lower.startswith(query):
+                prefix.append(name)
+            elif query in lower:
+                contains.append(name)
+            if len(prefix) >= limit:
+                break
+        return (prefix + contains)[:limit]
@@ -0,0 +1,277 @@
+# ==============================================================================
+# Content-addressed on-disk cache for GPT completions
+# ==============================================================================
+#
+# Completions are stored as small JSON files named after the SHA-256 hash of
+# the request (deployment, messages, max_tokens, temperature and, for
+# structured outputs, the response format), so the same prompt is only paid
+# for once. Entries older than `max_age_days` are ignored and removed, and the
+# oldest entries are evicted once the cache grows past `max_megabytes`. Set
+# BAN443_COMPLETION_CACHE=off (or `cache.enabled = False`) to bypass the
+# cache, e.g. when sampling several answers for the same prompt.
+#
+# Every API call also adds its prompt, cached-prompt and completion token
+# counts (from response.usage, estimated if the API reports none) to the
+# process-wide `token_usage`, which batch runs use for per-event token columns
+# and token budgets. Inside `with token_usage.track() as counts:` the calls of
+# the current thread or asyncio task are also added to `counts`, so events that
+# run concurrently are still counted separately.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import contextlib  # For the token tracking context manager
+import contextvars  # For counting tokens per thread and asyncio task
+import hashlib  # For hashing the request into a cache key
+import json  # For storing cache entries
+import os  # For file and directory management
+import tempfile  # For atomic writes
+import threading  # For counting tokens from several threads
+import time  # For entry ages
+
+# Local modules
+from tracing import span  # Per-stage latency spans
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+CACHE_DIR = os.getenv("BAN443_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+ENABLED = os.getenv("BAN443_COMPLETION_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+# ==============================================================================
+# Part 3: Completion cache
+# ==============================================================================
+
+def stream_completion(client, model, messages, max_tokens, temperature, on_token, **kwargs):
+    """
+    Stream a chat completion, passing each text delta to `on_token`, and
+    return (full text, usage); the usage arrives in the final chunk.
+    """
+    stream = client.chat.completions.create(
+        model=model, messages=messages, max_tokens=max_tokens, temperature=temperature, stream=True,
+        stream_options={"include_usage": True}, **kwargs
+    )
+    parts, usage = [], None
+    for chunk in stream:
+        usage = getattr(chunk, "usage", None) or usage
+        # Azure sends chunks without choices (e.g. content filter results) before the text
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        token = chunk.choices[0].delta.content
+        if not parts:
+            token = token.lstrip()
+        parts.append(token)
+        on_token(token)
+    return "".join(parts).strip(), usage
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for tracing when the API reports no usage."""
+    return len(text) // 4 + 1
+
+
+_tracked = contextvars.ContextVar("ban443_tokens", default=None)
+
+
+class TokenUsage:
+    """Thread-safe running totals of API requests and prompt, cached and completion tokens."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, usage, messages, text):
+        """Add one response's token counts and return them as a dict."""
+        details = getattr(usage, "prompt_tokens_details", None)
+        counts = {
+            "prompt_tokens": getattr(usage, "prompt_tokens", None)
+            or sum(estimate_tokens(message["content"]) for message in messages),
+            "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", None) or estimate_tokens(text),
+        }
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += counts["prompt_tokens"]
+            self.cached_tokens += counts["cached_tokens"]
+            self.completion_tokens += counts["completion_tokens"]
+        tracked = _tracked.get()
+        if tracked is not None:
+            for counter, count in counts.items():
+                tracked[counter] += count
+        return counts
+
+    @contextlib.contextmanager
+    def track(self):
+        """Yield a dict that also receives the token counts of the calls made in this thread or task."""
+        counts = {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        token = _tracked.set(counts)
+        try:
+            yield counts
+        finally:
+            _tracked.reset(token)
+
+    def totals(self):
+        """Return the totals counted so far."""
+        with self._lock:
+            return {"requests": self.requests, "prompt_tokens": self.prompt_tokens,
+                    "cached_tokens": self.cached_tokens, "completion_tokens": self.completion_tokens}
+
+
+# Token counts of all API calls made by this process
+token_usage = TokenUsage()
+
+
+def request_key(model, messages, max_tokens, temperature, response_format=None):
+    """Return the SHA-256 key of a chat completion request."""
+    request = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+    if response_format is not None:  # Only added when set, so the keys of plain requests stay the same
+        request["response_format"] = response_format
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """On-disk completion cache with age- and size-based eviction and hit/miss counters."""
+
+    def __init__(self, directory=None, max_age_days=30, max_megabytes=200, enabled=ENABLED):
+        self.directory = directory or os.path.join(CACHE_DIR, "completions")
+        self.max_age = max_age_days * 24 * 3600
+        self.max_bytes = max_megabytes * 1024 * 1024
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._writes_since_prune = 0
+
+    def _path(self, key):
+        """Return the file that stores an entry (two-level layout keeps directories small)."""
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Return the cached completion text for a key, or None."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, encoding="utf-8") as entry_file:
+                text = json.load(entry_file)["text"]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return text
+
+    def put(self, key, text):
+        """Store a completion text under a key."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so parallel workers never read half an entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as entry_file:
+            json.dump({"text": text, "created": time.time()}, entry_file, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+        self._writes_since_prune += 1
+        if self._writes_since_prune >= 100:
+            self.prune()
+
+    def prune(self):
+        """Remove expired entries and, if still too large, the oldest entries."""
+        self._writes_since_prune = 0
+        now = time.time()
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if now - stat.st_mtime > self.max_age:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:  # Pruned by another worker at the same time
+                        pass
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        """Return the hit and miss counters."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0}
+
+    def complete(self, client, model, messages, max_tokens, temperature, on_token=None, response_format=None,
+                 validate=None):
+        """
+        Return the completion text for a request, calling the API only on a cache miss.
+        With `on_token`, the response is streamed and each piece of text is passed to
+        the callback as it arrives (a cached text is passed in one piece).
+        `response_format` is passed on for structured outputs (JSON schema). With
+        `validate`, a new text is only stored if `validate(text)` is true, so a
+        rejected answer is requested again next time.
+        """
+        extra = {"response_format": response_format} if response_format is not None else {}
+        with span("completion", model=model, max_tokens=max_tokens) as stage:
+            key = request_key(model, messages, max_tokens, temperature, response_format)
+            text = self.get(key)
+            if text is not None:
+                stage.set(cached=True)
+                if on_token is not None:
+                    on_token(text)
+                return text
+
+            usage = None
+            if on_token is None:
+                response = client.chat.completions.create(
+                    model=model, messages=messages, max_tokens=max_tokens, temperature=temperature, **extra
+                )
+                text = response.choices[0].message.content.strip()
+                usage = getattr(response, "usage", None)
+            else:
+                text, usage = stream_completion(client, model, messages, max_tokens, temperature, on_token, **extra)
+            stage.set(cached=False, **token_usage.add(usage, messages, text))
+            if validate is None or validate(text):
+                self.put(key, text)
+            return text
+
+    async def complete_async(self, chat_client, messages, max_tokens, temperature, response_format=None,
+                             validate=None):
+        """Async variant of complete() for an async_gpt.AsyncChatClient."""
+        extra = {"response_format": response_format} if response_format is not None else {}
+        with span("completion", model=chat_client.model, max_tokens=max_tokens) as stage:
+            key = request_key(chat_client.model, messages, max_tokens, temperature, response_format)
+            text = self.get(key)
+            if text is not None:
+                stage.set(cached=True)
+                return text
+            response = await chat_client.create(messages, max_tokens=max_tokens, temperature=temperature, **extra)
+            text = response.choices[0].message.content.strip()
+            stage.set(cached=False, **token_usage.add(getattr(response, "usage", None), messages, text))
+            if validate is None or validate(text):
+                self.put(key, text)
+            return text
+
+
+# Shared cache used by the chatbots
+completion_cache = CompletionCache()
@@ -0,0 +1,214 @@
+# ==============================================================================
+# Event-study engine: many event dates per symbol from one pass over the data
+# ==============================================================================
+#
+# The chatbots download a year of prices and recompute every indicator for
+# each event they analyze. `EventStudy` loads a symbol's history once (for the
+# whole range spanned by its events), computes the indicator arrays once and
+# then answers the event-day, pre-event and post-event metrics for any date
+# with a sorted-index lookup. The dictionaries match the chatbots'
+# calculate_event_day_metrics / calculate_pre_event_data /
+# calculate_post_event_metrics (and the *_reference_* variants with
+# label="reference").
+#
+# In batch runs over many symbols, EventStudy.from_panel() builds the study
+# from the memory-mapped arrays of a PricePanel (price_panel.py) instead.
+#
+# Note: RSI and MACD are smoothed averages that depend on where the series
+# starts. The history starts IndicatorState.warmup_bars(tolerance) trading
+# days before the first event, so every event's values are within the
+# convergence tolerance of a long-history computation, but they can differ
+# slightly from the chatbots' per-event values (which start the same number of
+# trading days before each event).
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+from datetime import datetime, timedelta  # For working with dates and time intervals
+from zoneinfo import ZoneInfo  # For timezone support
+
+# Third-party libraries
+import numpy as np  # For array lookups
+import pandas as pd  # For timestamps
+
+# Local modules
+from indicators import (  # Indicator kernels
+    CONVERGENCE_TOLERANCE, IndicatorState, calculate_indicators, sma, validate_indicators, window_metrics,
+)
+from price_cache import get_history  # Local OHLCV cache with incremental downloads
+from tracing import span  # Per-stage latency spans
+from trading_calendar import is_trading_day, next_trading_day, previous_trading_day  # Oslo Børs trading days
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+MARKET_TIMEZONE = ZoneInfo("Europe/Oslo")
+POST_EVENT_DAYS = 3  # Trading days after an event used for the post-event change
+
+
+def _as_timestamp(date):
+    """Convert a 'YYYY-MM-DD' string, date or datetime to a timestamp at midnight in Oslo."""
+    if isinstance(date, str):
+        date = datetime.strptime(date[:10], "%Y-%m-%d")
+    timestamp = pd.Timestamp(date)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize(MARKET_TIMEZONE)
+    return timestamp.tz_convert(MARKET_TIMEZONE)
+
+
+def history_range(first_date, last_date, tolerance=CONVERGENCE_TOLERANCE):
+    """Return the [start, end) dates of the history needed for events between two dates."""
+    start = previous_trading_day(_as_timestamp(first_date), IndicatorState.warmup_bars(tolerance))
+    end = next_trading_day(_as_timestamp(last_date), POST_EVENT_DAYS) + timedelta(days=1)
+    return start, end
+
+
+# ==============================================================================
+# Part 3: Event study
+# ==============================================================================
+
+class EventStudy:
+    """Event-day, pre-event and post-event metrics for any number of dates of one symbol."""
+
+    def __init__(self, symbol, stock_data):
+        if stock_data.empty:
+            raise ValueError(f"No data found for the symbol '{symbol}'. Please check the ticker symbol and try again.")
+        stock_data = stock_data.tz_convert(MARKET_TIMEZONE) if stock_data.index.tz else stock_data
+        if not stock_data.index.is_monotonic_increasing:
+            stock_data = stock_data.sort_index()
+        self._set_bars(
+            symbol, stock_data.index,
+            *(stock_data[column].to_numpy() for column in ("Open", "High", "Low", "Close", "Volume")),
+        )
+
+    @classmethod
+    def from_panel(cls, panel, symbol):
+        """Build the study from a symbol's row of a PricePanel, without a DataFrame or download."""
+        with span("event_study_load", symbol=symbol, source="panel"):
+            bars = panel.bars(symbol)
+            present = ~np.isnan(bars["close"])  # Days without a bar have a NaN close
+            if not present.any():
+                raise ValueError(f"No data found for the symbol '{symbol}'. Please check the ticker symbol and try again.")
+            study = cls.__new__(cls)
+            index = pd.DatetimeIndex(panel.dates()[present]).tz_localize(MARKET_TIMEZONE)
+            fields = ("open", "high", "low", "close", "volume")
+            study._set_bars(symbol, index, *(bars[field][present] for field in fields))
+            return study
+
+    def _set_bars(self, symbol, index, open_, high, low, close, volume):
+        """Keep the bars as float64 arrays and compute the indicators once."""
+        self.symbol = symbol
+        self.index = index
+        self.open = np.asarray(open_, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume)
+        self.volume_ma5 = sma(self.volume, 5)
+
+        # The indicators skip bars without a close, as calculate_pre_window_metrics does
+        valid = ~np.isnan(self.close)
+        self.valid_index = self.index[valid]
+        self.valid_high, self.valid_low, self.valid_close = self.high[valid], self.low[valid], self.close[valid]
+        self.indicators = calculate_indicators(self.valid_high, self.valid_low, self.valid_close)
+
+    @classmethod
+    def load(cls, symbol, first_date, last_date, tolerance=CONVERGENCE_TOLERANCE):
+        """Load the history covering every event between `first_date` and `last_date`."""
+        start, end = history_range(first_date, last_date, tolerance)
+        with span("event_study_load", symbol=symbol):
+            stock_data = get_history(symbol, start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d"))
+            return cls(symbol, stock_data)
+
+    def _position(self, date, label):
+        """Return the bar position of a trading day, or raise if it is not one."""
+        position = int(self.index.searchsorted(date))
+        if not is_trading_day(date) or position >= len(self.index) or self.index[position] != date:
+            raise ValueError(f"The {label} date {date.to_pydatetime()} is not a valid trading day.")
+        return position
+
+    def event_day_metrics(self, date, label="event"):
+        """Metrics of the event (or reference) day, as calculate_event_day_metrics returns them."""
+        date = _as_timestamp(date)
+        try:
+            position = self._position(date, label)
+            open_price, close_price = self.open[position], self.close[position]
+            metrics = {
+                "closing_price": close_price,
+                "open_price": open_price,
+                "high_price": self.high[position],
+                "low_price": self.low[position],
+                "volume": self.volume[position],
+                "price_change": round(((close_price - open_price) / open_price) * 100, 2),
+                "volatility": self.high[position] - self.low[position],
+            }
+            if position == 0:
+                raise ValueError(f"No data before the {label} date.")
+            avg_volume_5d = self.volume_ma5[position - 1]
+            metrics["volume_spike"] = round(((metrics["volume"] - avg_volume_5d) / avg_volume_5d) * 100, 2)
+            return metrics
+        except Exception as e:
+            raise ValueError(f"Error in {label} day calculations: {str(e)}")
+
+    def pre_event_metrics(self, date, label="event"):
+        """Indicator metrics from the bars before the date, as calculate_pre_event_data returns them."""
+        date = _as_timestamp(date)
+        try:
+            validate_indicators(self.indicators, len(self.valid_close))
+            end = int(self.valid_index.searchsorted(date, side="left"))
+            return window_metrics(self.valid_high, self.valid_low, self.valid_close, self.indicators, end, label)
+        except Exception as e:
+            raise ValueError(f"Error in pre-{label} data calculations: {str(e)}")
+
+    def post_event_metrics(self, date, label="event"):
+        """
+        3-day price change after the date, as calculate_post_event_metrics returns it.
+        Only bars up to the 3rd trading day of the exchange calendar count.
+        """
+        date = _as_timestamp(date)
+        try:
+            position = self._position(date, label)
+            window_end = int(self.index.searchsorted(
+                _as_timestamp(next_trading_day(date, POST_EVENT_DAYS)), side="right"
+            ))
+            if window_end - (position + 1) < POST_EVENT_DAYS:
+                return {f"post_{label}_change_3d": "N/A", f"post_{label}_3rd_day_close": "N/A"}
+
+            day_close, third_close = self.close[position], self.close[position + POST_EVENT_DAYS]
+            return {
+                f"post_{label}_change_3d": round(((third_close - day_close) / day_close) * 100, 2),
+                f"post_{label}_3rd_day_close": third_close,
+            }
+        except Exception as e:
+            raise ValueError(f"Error calculating post-{label} metrics: {str(e)}")
+
+
+# ==============================================================================
+# Part 4: Batch helper
+# ==============================================================================
+
+def analyze_events(symbol, dates, label="event"):
+    """
+    Return {date: {"event_day": ..., "pre": ..., "post": ...}} for every date of
+    one symbol, loading the history and computing the indicators only once.
+    A date whose metrics cannot be calculated maps to {"error": message}.
+    """
+    timestamps = [_as_timestamp(date) for date in dates]
+    if not timestamps:
+        return {}
+    study = EventStudy.load(symbol, min(timestamps), max(timestamps))
+
+    results = {}
+    for date, timestamp in zip(dates, timestamps):
+        try:
+            results[date] = {
+                "event_day": study.event_day_metrics(timestamp, label),
+                "pre": study.pre_event_metrics(timestamp, label),
+                "post": study.post_event_metrics(timestamp, label),
+            }
+        except ValueError as e:
+            results[date] = {"error": str(e)}
+    return results
@@ -0,0 +1,160 @@
+# ==============================================================================
+# Background worker for the chatbot GUIs
+# ==============================================================================
+#
+# Runs the analyze pipelines on a worker thread so the Tk main loop never
+# blocks. Analyses are queued and run one after another. Each job writes its
+# output to a message queue that the GUI polls with `after()`, so every stage
+# shows up in the chat display as soon as it is ready. Cancelling a job stops
+# it at the next stage boundary and discards the rest of its output; a network
+# call that is already running finishes in the background first.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import itertools  # For numbering jobs
+import queue  # For passing jobs and messages between threads
+import threading  # For the worker thread and cancellation flags
+
+# GUI libraries
+import tkinter as tk  # For GUI constants
+
+# Local modules
+from tracing import span  # Per-stage latency spans
+
+# ==============================================================================
+# Part 2: Analysis job
+# ==============================================================================
+
+class AnalysisCancelled(BaseException):
+    """
+    Raised inside a pipeline when its job has been cancelled. Derives from
+    BaseException so the pipelines' `except Exception` handlers let it through.
+    """
+
+
+class AnalysisJob:
+    """
+    Handle passed to a pipeline running on the worker thread.
+
+    `insert(index, text)` mirrors the Text widget's insert method, so the
+    display functions can write to a job exactly like to the chat display.
+    `call(function, *args)` runs a function on the main thread, for updating
+    other widgets.
+    """
+
+    def __init__(self, job_id, label, messages):
+        self.job_id = job_id
+        self.label = label
+        self.cancelled = threading.Event()
+        self._messages = messages
+
+    def check(self):
+        """Raise AnalysisCancelled if the job has been cancelled."""
+        if self.cancelled.is_set():
+            raise AnalysisCancelled()
+
+    def insert(self, index, text):
+        """Send text to the chat display."""
+        self.check()
+        self._messages.put(("text", self, text))
+
+    def call(self, function, *args):
+        """Run `function(*args)` on the main thread."""
+        self.check()
+        self._messages.put(("call", self, (function, args)))
+
+    def progress(self, stage):
+        """Report the stage the pipeline is working on."""
+        self.check()
+        self._messages.put(("progress", self, stage))
+
+    def cancel(self):
+        """Ask the pipeline to stop at the next stage."""
+        self.cancelled.set()
+
+
+# ==============================================================================
+# Part 3: Analysis worker
+# ==============================================================================
+
+class AnalysisWorker:
+    """Runs queued analyses on a background thread and relays their output to the GUI."""
+
+    def __init__(self, master, chat_display, status_var=None, poll_ms=100):
+        self.master = master
+        self.chat_display = chat_display
+        self.status_var = status_var
+        self.poll_ms = poll_ms
+
+        self.jobs = queue.Queue()
+        self.messages = queue.Queue()
+        self.current = None
+        self._ids = itertools.count(1)
+
+        threading.Thread(target=self._run, daemon=True).start()
+        self.master.after(self.poll_ms, self._poll)
+
+    def submit(self, label, pipeline, *args):
+        """Queue `pipeline(job, *args)` and return its job."""
+        job = AnalysisJob(next(self._ids), label, self.messages)
+        busy = self.current is not None or not self.jobs.empty()
+        self.jobs.put((job, pipeline, args))
+        if busy:
+            self.messages.put(("text", job, f"Queued analysis {job.job_id}: {label}\n\n"))
+        return job
+
+    def cancel(self):
+        """Cancel the analysis that is currently running."""
+        job = self.current
+        if job is not None:
+            job.cancel()
+            self.messages.put(("status", job, f"Cancelling analysis {job.job_id}..."))
+
+    def pending(self):
+        """Return the number of analyses waiting in the queue."""
+        return self.jobs.qsize()
+
+    def _run(self):
+        """Worker thread: run the queued jobs one at a time."""
+        while True:
+            job, pipeline, args = self.jobs.get()
+            if job.cancelled.is_set():
+                continue
+            self.current = job
+            self.messages.put(("text", job, f"### Analysis {job.job_id}: {job.label} ###\n"))
+            try:
+                with span("analysis", job=job.job_id, label=job.label):
+                    pipeline(job, *args)
+                self.messages.put(("status", job, f"Analysis {job.job_id} finished."))
+            except AnalysisCancelled:
+                self.messages.put(("cancelled", job, f"Analysis {job.job_id} cancelled.\n\n"))
+            except Exception as e:
+                self.messages.put(("text", job, f"Unexpected error: {str(e)}\n\n"))
+            finally:
+                self.current = None
+
+    def _poll(self):
+        """Main thread: move queued messages into the GUI."""
+        try:
+            while True:
+                kind, job, text = self.messages.get_nowait()
+                if kind == "call":
+                    if not job.cancelled.is_set():
+                        function, args = text
+                        function(*args)
+                    continue
+                if kind == "text" and job.cancelled.is_set():
+                    continue  # Drop output that arrives after a cancel
+                if kind in ("text", "cancelled"):
+                    self.chat_display.insert(tk.END, text)
+                    self.chat_display.see(tk.END)
+                if kind != "text" and self.status_var is not None:
+                    queued = self.pending()
+                    status = f"Analysis {job.job_id}: {text}" if kind == "progress" else text.strip()
+                    self.status_var.set(status + (f" ({queued} queued)" if queued else ""))
+        except queue.Empty:
+            pass
+        self.master.after(self.poll_ms, self._poll)
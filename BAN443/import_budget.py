@@ -0,0 +1,120 @@
+# ==============================================================================
+# Import-time budget for the BAN443 modules
+# ==============================================================================
+#
+# Imports each module in a fresh interpreter, measures how long the import
+# takes and checks that the heavy dependencies (openai, the Azure SDK,
+# yfinance, PyMuPDF, TA-Lib, tiktoken) are not loaded until they are used.
+# Exits with status 1 if a module goes over its budget or loads one of them.
+#
+# Usage:
+#   python import_budget.py                         # all modules in BUDGETS_MS
+#   python import_budget.py indicators --repeat 10  # one module, best of 10 runs
+#   python import_budget.py Chatbot_hybrid --slowest 15
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import argparse  # For the command-line interface
+import json  # For reading the measurements from the child process
+import os  # For locating the BAN443 directory
+import subprocess  # For importing each module in a fresh interpreter
+import sys  # For the interpreter path and exit status
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Maximum import time per module in milliseconds (numpy and pandas make up most of it)
+BUDGETS_MS = {
+    "indicators": 150,
+    "price_cache": 600,
+    "batch_backtest": 600,
+    "Chatbot_financial_metrics": 700,
+    "Chatbot_hybrid": 700,
+    "Chatbot_sentiment": 700,
+}
+
+# Dependencies that must only be imported on first use
+DEFERRED = ("openai", "azure.storage.blob", "yfinance", "fitz", "talib", "tiktoken")
+
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": [name for name in {deferred!r} if name in sys.modules]}}))
+"""
+
+# ==============================================================================
+# Part 3: Measurements
+# ==============================================================================
+
+def measure_import(module, repeat=5):
+    """Return (best import time in ms, deferred modules that were loaded) over `repeat` fresh imports."""
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", MEASURE.format(module=module, deferred=DEFERRED)],
+            cwd=MODULE_DIR, capture_output=True, text=True, check=True,
+        )
+        measurement = json.loads(result.stdout.strip().splitlines()[-1])
+        best = min(best, measurement["ms"])
+        loaded = measurement["loaded"]
+    return best, loaded
+
+
+def slowest_imports(module, top=10):
+    """Return the `top` slowest imports (cumulative ms, name) reported by `python -X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=MODULE_DIR, capture_output=True, text=True, check=True,
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings.append((int(cumulative) / 1000, name.rstrip()))
+    return sorted(timings, reverse=True)[:top]
+
+
+# ==============================================================================
+# Part 4: Command-line interface
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the BAN443 modules.")
+    parser.add_argument("modules", nargs="*", help="Modules to check (default: all modules with a budget)")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh imports per module; the best run counts")
+    parser.add_argument("--slowest", type=int, default=0, help="Also list the N slowest nested imports")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules or BUDGETS_MS:
+        elapsed, loaded = measure_import(module, args.repeat)
+        budget = BUDGETS_MS.get(module)
+        over = budget is not None and elapsed > budget
+        status = "FAIL" if over or loaded else "ok"
+        failed = failed or status == "FAIL"
+
+        line = f"{status:4}  {module:28} {elapsed:7.1f} ms"
+        if budget is not None:
+            line += f" (budget {budget} ms)"
+        if loaded:
+            line += f"  loaded eagerly: {', '.join(loaded)}"
+        print(line)
+
+        for cumulative, name in slowest_imports(module, args.slowest) if args.slowest else []:
+            print(f"      {cumulative:8.1f} ms  {name}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,665 @@
+# ==============================================================================
+# Technical indicator engine shared by the BAN443 chatbots
+# ==============================================================================
+#
+# Vectorized NumPy kernels for the indicators used in the pre-event /
+# pre-reference analysis: True Range / ATR, simple moving averages, price
+# momentum, RSI and MACD. RSI and MACD are delegated to TA-Lib when it is
+# installed; otherwise a pure-NumPy implementation of the same algorithms
+# (Wilder smoothing for RSI, SMA-seeded EMAs for MACD) is used.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+import functools  # For importing TA-Lib once, on first use
+import math  # For the warm-up lengths
+from collections import deque  # For the rolling windows of the streaming indicators
+
+import numpy as np  # For vectorized array computations
+
+from tracing import traced  # Per-stage latency spans
+
+
+@functools.lru_cache(maxsize=None)
+def _talib():
+    """Return the TA-Lib module, or None to use the NumPy kernels below (imported on first use)."""
+    try:
+        import talib  # For technical analysis of stock data (RSI, MACD, etc.)
+    except ImportError:
+        return None
+    return talib
+
+# ==============================================================================
+# Part 2: Array helpers
+# ==============================================================================
+
+_BLOCK_SIZE = 64  # Block length used when solving first-order recurrences
+CONVERGENCE_TOLERANCE = 1e-3  # Share of the starting error allowed to remain in RSI/MACD after the warm-up
+WINDOW_BARS = 20  # Bars before the anchor used directly by window_metrics() (20-day change and MA)
+
+
+def _as_float_array(values):
+    """Return the values as a contiguous float64 NumPy array."""
+    return np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+
+
+def _linear_recurrence(x, decay, gain, y0):
+    """
+    Solve y[t] = decay * y[t-1] + gain * x[t] for all t, starting from y0.
+
+    The recurrence is evaluated block by block with a lower-triangular weight
+    matrix, so every weight is a power of `decay` (<= 1) and the result stays
+    numerically stable for arbitrarily long series.
+    """
+    n = len(x)
+    out = np.empty(n, dtype=np.float64)
+    if n == 0:
+        return out
+
+    steps = np.arange(_BLOCK_SIZE)
+    lags = steps[:, None] - steps[None, :]
+    weights = np.where(lags >= 0, decay ** np.maximum(lags, 0), 0.0) * gain
+    carry = decay ** (steps + 1)
+
+    previous = y0
+    for start in range(0, n, _BLOCK_SIZE):
+        block = x[start:start + _BLOCK_SIZE]
+        size = len(block)
+        values = weights[:size, :size] @ block + carry[:size] * previous
+        out[start:start + size] = values
+        previous = values[-1]
+    return out
+
+
+def _decay_bars(decay, tolerance):
+    """Number of steps after which `decay ** steps` is at most `tolerance`."""
+    return math.ceil(math.log(tolerance) / math.log(decay))
+
+
+def _ema(values, period, start):
+    """
+    Exponential moving average seeded with the simple average of
+    values[start - period + 1 : start + 1], as done by TA-Lib.
+    """
+    out = np.full(len(values), np.nan)
+    if start >= len(values) or start < period - 1:
+        return out
+    k = 2.0 / (period + 1)
+    seed = values[start - period + 1:start + 1].mean()
+    out[start] = seed
+    out[start + 1:] = _linear_recurrence(values[start + 1:], 1.0 - k, k, seed)
+    return out
+
+
+# ==============================================================================
+# Part 3: Indicator kernels
+# ==============================================================================
+
+def true_range(high, low, close):
+    """
+    True Range: the largest of High - Low, |High - Previous Close| and
+    |Low - Previous Close|. The first bar has no previous close and uses
+    High - Low only.
+    """
+    high, low, close = _as_float_array(high), _as_float_array(low), _as_float_array(close)
+    previous_close = np.empty_like(close)
+    previous_close[:1] = np.nan
+    previous_close[1:] = close[:-1]
+
+    high_low = high - low
+    high_close = np.abs(high - previous_close)
+    low_close = np.abs(low - previous_close)
+
+    # Comparisons against NaN are False, so a missing previous close keeps High - Low
+    tr = np.where(high_close > high_low, high_close, high_low)
+    return np.where(low_close > tr, low_close, tr)
+
+
+def sma(values, period):
+    """Simple moving average over `period` bars (NaN until the window is full)."""
+    values = _as_float_array(values)
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(values, period)
+        out[period - 1:] = windows.mean(axis=1)
+    return out
+
+
+def atr(high, low, close, period):
+    """Average True Range as the simple moving average of the True Range."""
+    return sma(true_range(high, low, close), period)
+
+
+def momentum(close, period):
+    """Percentage price change over `period` bars."""
+    close = _as_float_array(close)
+    out = np.full(len(close), np.nan)
+    if len(close) > period:
+        out[period:] = (close[period:] - close[:-period]) / close[:-period] * 100
+    return out
+
+
+def rsi(close, period):
+    """Relative Strength Index with Wilder smoothing (TA-Lib compatible)."""
+    close = _as_float_array(close)
+    talib = _talib()
+    if talib is not None:
+        return talib.RSI(close, timeperiod=period)
+
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+
+    diff = np.diff(close)
+    gains = np.where(diff > 0, diff, 0.0)
+    losses = np.where(diff < 0, -diff, 0.0)
+
+    decay, gain = (period - 1) / period, 1.0 / period
+    avg_gain = np.empty(len(diff))
+    avg_loss = np.empty(len(diff))
+    avg_gain[period - 1] = gains[:period].sum() / period
+    avg_loss[period - 1] = losses[:period].sum() / period
+    avg_gain[period:] = _linear_recurrence(gains[period:], decay, gain, avg_gain[period - 1])
+    avg_loss[period:] = _linear_recurrence(losses[period:], decay, gain, avg_loss[period - 1])
+
+    total = avg_gain[period - 1:] + avg_loss[period - 1:]
+    is_zero = np.abs(total) < 1e-8
+    out[period:] = np.where(is_zero, 0.0, 100 * avg_gain[period - 1:] / np.where(is_zero, 1.0, total))
+    return out
+
+
+def macd(close, fastperiod=12, slowperiod=26, signalperiod=9):
+    """
+    Moving Average Convergence/Divergence (TA-Lib compatible).
+
+    Returns the MACD line, the signal line and the histogram. As in TA-Lib,
+    both EMAs are seeded so that they start on the first bar of the slow EMA,
+    and all outputs start once the signal line is available.
+    """
+    close = _as_float_array(close)
+    talib = _talib()
+    if talib is not None:
+        return talib.MACD(close, fastperiod=fastperiod, slowperiod=slowperiod, signalperiod=signalperiod)
+
+    if slowperiod < fastperiod:
+        fastperiod, slowperiod = slowperiod, fastperiod
+
+    n = len(close)
+    first_macd = slowperiod - 1
+    first_output = first_macd + signalperiod - 1
+    macd_line = np.full(n, np.nan)
+    signal_line = np.full(n, np.nan)
+    if n <= first_output:
+        return macd_line, signal_line, np.full(n, np.nan)
+
+    fast = _ema(close, fastperiod, first_macd)
+    slow = _ema(close, slowperiod, first_macd)
+    raw = fast - slow
+
+    signal = np.full(n, np.nan)
+    signal[first_macd:] = _ema(raw[first_macd:], signalperiod, signalperiod - 1)
+
+    macd_line[first_output:] = raw[first_output:]
+    signal_line[first_output:] = signal[first_output:]
+    return macd_line, signal_line, macd_line - signal_line
+
+
+# ==============================================================================
+# Part 4: Pre-window metrics
+# ==============================================================================
+
+def _rsi_status(value):
+    """Classify an RSI value as Overbought, Oversold or Neutral."""
+    return "Overbought" if value > 70 else "Oversold" if value < 30 else "Neutral"
+
+
+def _nanmean(values):
+    """Mean that skips NaN values (as pandas does), NaN if nothing is left."""
+    values = values[~np.isnan(values)]
+    return values.mean() if len(values) else np.nan
+
+
+def _change(close, days):
+    """Percentage change from the first to the last of the final `days` closes."""
+    window = close[-days:]
+    return round(((window[-1] - window[0]) / window[0]) * 100, 2)
+
+
+def calculate_indicators(high, low, close):
+    """
+    Compute every indicator used in the prompts over the full OHLC arrays.
+
+    Returns a dictionary of arrays aligned with the input bars.
+    """
+    close = _as_float_array(close)
+    indicators = {
+        "RSI_5": rsi(close, 5),
+        "RSI_20": rsi(close, 20),
+    }
+    indicators["MACD"], indicators["MACD_signal"], _ = macd(close, 12, 26, 9)
+    indicators["ATR_3"] = atr(high, low, close, 3)
+    indicators["3_day_MA"] = sma(close, 3)
+    indicators["20_day_MA"] = sma(close, 20)
+    indicators["5_day_momentum"] = momentum(close, 5)
+    return indicators
+
+
+def validate_indicators(indicators, n_rows):
+    """Raise a ValueError if an indicator could not be calculated at all."""
+    if n_rows < 5:
+        raise ValueError("RSI_5 could not be calculated. Ensure sufficient data is available.")
+    if np.isnan(indicators["MACD"]).all() or np.isnan(indicators["MACD_signal"]).all():
+        raise ValueError("MACD could not be calculated. Ensure sufficient data is available.")
+    for name in ("ATR_3", "3_day_MA", "20_day_MA", "5_day_momentum"):
+        if np.isnan(indicators[name]).all():
+            raise ValueError(f"{name} could not be calculated. Ensure sufficient data is available.")
+
+
+def window_metrics(high, low, close, indicators, end, label="event"):
+    """
+    Build the pre-window metrics dictionary from the bars before position `end`.
+
+    `label` names the anchor day ("event" or "reference") and is used for the
+    metric keys and error messages, matching the names used in the prompts.
+    """
+    if end < 20:
+        raise ValueError(f"Not enough data for 20-day pre-{label} analysis.")
+
+    high, low, close = _as_float_array(high), _as_float_array(low), _as_float_array(close)
+    high, low, close = high[:end], low[:end], close[:end]
+    prefix = f"pre_{label}"
+    last = end - 1
+
+    metrics = {
+        # Volatility metrics
+        f"{prefix}_volatility_5d": _nanmean(high[-5:] - low[-5:]),
+        f"{prefix}_volatility_10d": _nanmean(high[-10:] - low[-10:]),
+        # Price change percentages
+        f"{prefix}_change_5d": _change(close, 5),
+        f"{prefix}_change_10d": _change(close, 10),
+        f"{prefix}_change_20d": _change(close, 20),
+        # Latest RSI, MACD, and Moving Averages values
+        "rsi_5_value": indicators["RSI_5"][last],
+        "rsi_20_value": indicators["RSI_20"][last],
+        "macd_value": indicators["MACD"][last],
+        "macd_signal_value": indicators["MACD_signal"][last],
+        "atr_three_day": indicators["ATR_3"][last],
+        "three_day_ma": indicators["3_day_MA"][last],
+        "twenty_day_ma": indicators["20_day_MA"][last],
+        "five_day_momentum": indicators["5_day_momentum"][last],
+    }
+
+    # Determine RSI and MACD statuses
+    metrics["rsi_5_status"] = _rsi_status(metrics["rsi_5_value"])
+    metrics["rsi_20_status"] = _rsi_status(metrics["rsi_20_value"])
+    metrics["macd_status"] = (
+        "Bullish Crossover" if metrics["macd_value"] > metrics["macd_signal_value"]
+        else "Bearish Crossover"
+    )
+    return metrics
+
+
+@traced("indicators")
+def calculate_pre_window_metrics(stock_data, anchor_date, label="event"):
+    """
+    Calculate the pre-event (or pre-reference) metrics for a stock history
+    DataFrame and an anchor date, without adding columns to the DataFrame.
+    """
+    stock_data = stock_data.dropna(subset=["Close"])
+    if not stock_data.index.is_monotonic_increasing:
+        stock_data = stock_data.sort_index()
+    high = stock_data["High"].to_numpy(dtype=np.float64)
+    low = stock_data["Low"].to_numpy(dtype=np.float64)
+    close = stock_data["Close"].to_numpy(dtype=np.float64)
+
+    indicators = calculate_indicators(high, low, close)
+    validate_indicators(indicators, len(close))
+
+    end = int(stock_data.index.searchsorted(anchor_date, side="left"))
+    return window_metrics(high, low, close, indicators, end, label)
+
+
+# ==============================================================================
+# Part 5: Streaming indicators
+# ==============================================================================
+#
+# Stateful versions of the kernels above. They are seeded by feeding them the
+# history once and then updated one bar at a time in O(1), giving the same
+# values as the vectorized kernels on the same bars. `to_dict()`/`from_dict()`
+# turn their state into plain JSON-compatible values so it can be stored next
+# to the cached prices (see price_cache.PriceStore.indicator_state).
+
+class _StreamingIndicator:
+    """Base class handling (de)serialization of the indicator state."""
+
+    def to_dict(self):
+        """Return the state as JSON-compatible values."""
+        return {name: list(value) if isinstance(value, deque) else value for name, value in vars(self).items()}
+
+    @classmethod
+    def from_dict(cls, state):
+        """Rebuild an indicator from `to_dict()` output."""
+        indicator = cls.__new__(cls)
+        for name, value in state.items():
+            setattr(indicator, name, value)
+        indicator._restore_windows()
+        return indicator
+
+    def _restore_windows(self):
+        """Turn the stored lists back into bounded deques."""
+
+
+class StreamingSMA(_StreamingIndicator):
+    """Simple moving average over `period` values."""
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.value = np.nan
+
+    @staticmethod
+    def warmup_bars(period, tolerance=CONVERGENCE_TOLERANCE):
+        """Bars needed for the exact value."""
+        return period
+
+    def _restore_windows(self):
+        self.window = deque(self.window, maxlen=self.period)
+
+    def update(self, value):
+        self.window.append(value)
+        if len(self.window) == self.period:
+            self.value = float(np.mean(self.window))
+        return self.value
+
+
+class StreamingATR(_StreamingIndicator):
+    """Average True Range as the simple moving average of the True Range."""
+
+    def __init__(self, period):
+        self.previous_close = None
+        self.sma = StreamingSMA(period)
+        self.value = np.nan
+
+    @staticmethod
+    def warmup_bars(period, tolerance=CONVERGENCE_TOLERANCE):
+        """Bars needed for the exact value (every True Range with a previous close)."""
+        return period + 1
+
+    def to_dict(self):
+        return {"previous_close": self.previous_close, "sma": self.sma.to_dict(), "value": self.value}
+
+    def _restore_windows(self):
+        self.sma = StreamingSMA.from_dict(self.sma)
+
+    def update(self, high, low, close):
+        # Same comparisons as true_range(): a NaN candidate never wins
+        tr = high - low
+        if self.previous_close is not None:
+            if abs(high - self.previous_close) > tr:
+                tr = abs(high - self.previous_close)
+            if abs(low - self.previous_close) > tr:
+                tr = abs(low - self.previous_close)
+        self.previous_close = close
+        self.value = self.sma.update(tr)
+        return self.value
+
+
+class StreamingMomentum(_StreamingIndicator):
+    """Percentage price change over `period` bars."""
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque(maxlen=period + 1)
+        self.value = np.nan
+
+    @staticmethod
+    def warmup_bars(period, tolerance=CONVERGENCE_TOLERANCE):
+        """Bars needed for the exact value."""
+        return period + 1
+
+    def _restore_windows(self):
+        self.window = deque(self.window, maxlen=self.period + 1)
+
+    def update(self, close):
+        self.window.append(close)
+        if len(self.window) == self.period + 1:
+            self.value = (close - self.window[0]) / self.window[0] * 100
+        return self.value
+
+
+class StreamingRSI(_StreamingIndicator):
+    """Relative Strength Index with Wilder smoothing (same algorithm as rsi())."""
+
+    def __init__(self, period):
+        self.period = period
+        self.previous_close = None
+        self.changes = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.value = np.nan
+
+    @staticmethod
+    def warmup_bars(period, tolerance=CONVERGENCE_TOLERANCE):
+        """Bars after which the seed's influence on the averages is at most `tolerance`."""
+        return period + 1 + _decay_bars((period - 1) / period, tolerance)
+
+    def update(self, close):
+        if self.previous_close is None:
+            self.previous_close = close
+            return self.value
+        diff = close - self.previous_close
+        self.previous_close = close
+        gain, loss = (diff if diff > 0 else 0.0), (-diff if diff < 0 else 0.0)
+        self.changes += 1
+
+        if self.changes <= self.period:
+            # Seed phase: sum the first `period` changes, their mean is the first average
+            self.avg_gain += gain
+            self.avg_loss += loss
+            if self.changes < self.period:
+                return self.value
+            self.avg_gain /= self.period
+            self.avg_loss /= self.period
+        else:
+            decay, weight = (self.period - 1) / self.period, 1.0 / self.period
+            self.avg_gain = decay * self.avg_gain + weight * gain
+            self.avg_loss = decay * self.avg_loss + weight * loss
+
+        total = self.avg_gain + self.avg_loss
+        self.value = 0.0 if abs(total) < 1e-8 else 100 * self.avg_gain / total
+        return self.value
+
+
+class StreamingMACD(_StreamingIndicator):
+    """
+    MACD line and signal line (same seeding as macd()): both EMAs start on the
+    `slowperiod`-th bar from simple averages, and the signal line starts once
+    `signalperiod` MACD values are available.
+    """
+
+    def __init__(self, fastperiod=12, slowperiod=26, signalperiod=9):
+        if slowperiod < fastperiod:
+            fastperiod, slowperiod = slowperiod, fastperiod
+        self.fastperiod = fastperiod
+        self.slowperiod = slowperiod
+        self.signalperiod = signalperiod
+        self.seed_closes = []  # Only used until the EMAs are seeded
+        self.seed_macd = []
+        self.fast = None
+        self.slow = None
+        self.signal = None
+        self.value = np.nan
+        self.signal_value = np.nan
+
+    @staticmethod
+    def warmup_bars(fastperiod=12, slowperiod=26, signalperiod=9, tolerance=CONVERGENCE_TOLERANCE):
+        """
+        Bars after which the seeds' influence is at most `tolerance`: the slow
+        EMA converges first (the fast one decays quicker), then the signal line.
+        """
+        slowperiod = max(fastperiod, slowperiod)
+        return (slowperiod + _decay_bars((slowperiod - 1) / (slowperiod + 1), tolerance)
+                + signalperiod + _decay_bars((signalperiod - 1) / (signalperiod + 1), tolerance))
+
+    def update(self, close):
+        if self.fast is None:
+            self.seed_closes.append(close)
+            if len(self.seed_closes) < self.slowperiod:
+                return self.value, self.signal_value
+            self.fast = float(np.mean(self.seed_closes[-self.fastperiod:]))
+            self.slow = float(np.mean(self.seed_closes))
+            self.seed_closes = []
+        else:
+            k_fast, k_slow = 2.0 / (self.fastperiod + 1), 2.0 / (self.slowperiod + 1)
+            self.fast = (1.0 - k_fast) * self.fast + k_fast * close
+            self.slow = (1.0 - k_slow) * self.slow + k_slow * close
+        raw = self.fast - self.slow
+
+        if self.signal is None:
+            self.seed_macd.append(raw)
+            if len(self.seed_macd) < self.signalperiod:
+                return self.value, self.signal_value
+            self.signal = float(np.mean(self.seed_macd))
+            self.seed_macd = []
+        else:
+            k_signal = 2.0 / (self.signalperiod + 1)
+            self.signal = (1.0 - k_signal) * self.signal + k_signal * raw
+
+        self.value, self.signal_value = raw, self.signal
+        return self.value, self.signal_value
+
+
+class IndicatorState:
+    """
+    Every indicator used in the prompts, updated one bar at a time.
+
+    `metrics(label)` returns the same dictionary as calculate_pre_window_metrics()
+    for an anchor date right after the last bar seen, and raises the same
+    ValueErrors when there is not enough data.
+    """
+
+    # Same parameters as calculate_indicators()
+    INDICATORS = {
+        "rsi_5": (StreamingRSI, (5,)),
+        "rsi_20": (StreamingRSI, (20,)),
+        "macd": (StreamingMACD, (12, 26, 9)),
+        "atr_3": (StreamingATR, (3,)),
+        "ma_3": (StreamingSMA, (3,)),
+        "ma_20": (StreamingSMA, (20,)),
+        "momentum_5": (StreamingMomentum, (5,)),
+    }
+
+    def __init__(self):
+        self.indicators = {name: kind(*args) for name, (kind, args) in self.INDICATORS.items()}
+        self.highs = deque(maxlen=10)  # For the 5/10-day volatility
+        self.lows = deque(maxlen=10)
+        self.closes = deque(maxlen=20)  # For the 5/10/20-day price changes
+        self.bars = 0
+        self.last_date = None
+
+    def update(self, high, low, close, date=None):
+        """Add one bar. Bars without a close are skipped, as in the vectorized path."""
+        if close != close:  # NaN
+            return
+        indicators = self.indicators
+        indicators["rsi_5"].update(close)
+        indicators["rsi_20"].update(close)
+        indicators["macd"].update(close)
+        indicators["atr_3"].update(high, low, close)
+        indicators["ma_3"].update(close)
+        indicators["ma_20"].update(close)
+        indicators["momentum_5"].update(close)
+        self.highs.append(high)
+        self.lows.append(low)
+        self.closes.append(close)
+        self.bars += 1
+        if date is not None:
+            self.last_date = date
+
+    @classmethod
+    def warmup_bars(cls, tolerance=CONVERGENCE_TOLERANCE):
+        """Bars before an anchor needed for every indicator to be within `tolerance` of its long-history value."""
+        return max(
+            WINDOW_BARS, *(kind.warmup_bars(*args, tolerance=tolerance) for kind, args in cls.INDICATORS.values())
+        )
+
+    @classmethod
+    def from_history(cls, stock_data):
+        """Seed a state from a yfinance-style DataFrame (High, Low, Close)."""
+        state = cls()
+        state.extend(stock_data)
+        return state
+
+    def extend(self, stock_data):
+        """Add every bar of a yfinance-style DataFrame that is newer than the last bar seen."""
+        if not stock_data.index.is_monotonic_increasing:
+            stock_data = stock_data.sort_index()
+        dates = stock_data.index.strftime("%Y-%m-%d")
+        for date, high, low, close in zip(dates, stock_data["High"], stock_data["Low"], stock_data["Close"]):
+            if self.last_date is None or date > self.last_date:
+                self.update(float(high), float(low), float(close), date)
+
+    def metrics(self, label="event"):
+        """Return the pre-window metrics for an anchor right after the last bar."""
+        values = {name: indicator.value for name, indicator in self.indicators.items()}
+        if self.bars < 5:
+            raise ValueError("RSI_5 could not be calculated. Ensure sufficient data is available.")
+        if np.isnan(values["macd"]) or np.isnan(self.indicators["macd"].signal_value):
+            raise ValueError("MACD could not be calculated. Ensure sufficient data is available.")
+        for name, column in (("atr_3", "ATR_3"), ("ma_3", "3_day_MA"), ("ma_20", "20_day_MA"),
+                             ("momentum_5", "5_day_momentum")):
+            if np.isnan(values[name]):
+                raise ValueError(f"{column} could not be calculated. Ensure sufficient data is available.")
+        if self.bars < 20:
+            raise ValueError(f"Not enough data for 20-day pre-{label} analysis.")
+
+        high, low, close = np.array(self.highs), np.array(self.lows), np.array(self.closes)
+        prefix = f"pre_{label}"
+        metrics = {
+            f"{prefix}_volatility_5d": _nanmean(high[-5:] - low[-5:]),
+            f"{prefix}_volatility_10d": _nanmean(high[-10:] - low[-10:]),
+            f"{prefix}_change_5d": _change(close, 5),
+            f"{prefix}_change_10d": _change(close, 10),
+            f"{prefix}_change_20d": _change(close, 20),
+            "rsi_5_value": values["rsi_5"],
+            "rsi_20_value": values["rsi_20"],
+            "macd_value": values["macd"],
+            "macd_signal_value": self.indicators["macd"].signal_value,
+            "atr_three_day": values["atr_3"],
+            "three_day_ma": values["ma_3"],
+            "twenty_day_ma": values["ma_20"],
+            "five_day_momentum": values["momentum_5"],
+        }
+        metrics["rsi_5_status"] = _rsi_status(metrics["rsi_5_value"])
+        metrics["rsi_20_status"] = _rsi_status(metrics["rsi_20_value"])
+        metrics["macd_status"] = (
+            "Bullish Crossover" if metrics["macd_value"] > metrics["macd_signal_value"]
+            else "Bearish Crossover"
+        )
+        return metrics
+
+    def to_dict(self):
+        """Return the state as JSON-compatible values."""
+        return {
+            "indicators": {name: indicator.to_dict() for name, indicator in self.indicators.items()},
+            "highs": list(self.highs),
+            "lows": list(self.lows),
+            "closes": list(self.closes),
+            "bars": self.bars,
+            "last_date": self.last_date,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Rebuild a state from `to_dict()` output."""
+        restored = cls.__new__(cls)
+        restored.indicators = {
+            name: cls.INDICATORS[name][0].from_dict(indicator) for name, indicator in state["indicators"].items()
+        }
+        restored.highs = deque(state["highs"], maxlen=10)
+        restored.lows = deque(state["lows"], maxlen=10)
+        restored.closes = deque(state["closes"], maxlen=20)
+        restored.bars = state["bars"]
+        restored.last_date = state["last_date"]
+        return restored
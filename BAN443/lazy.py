@@ -0,0 +1,65 @@
+# ==============================================================================
+# Deferred imports and lazily constructed clients
+# ==============================================================================
+#
+# Importing openai, azure.storage.blob, yfinance, PyMuPDF or TA-Lib takes a
+# large part of the chatbots' startup time, and the Azure clients used to be
+# created before the window even opened. `LazyObject` wraps a factory and
+# only calls it on the first attribute access, so `client.chat...` or
+# `yf.Ticker(...)` work unchanged while the import (or client construction)
+# happens the first time it is actually needed, usually on a worker thread.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import importlib  # For importing modules on first use
+import threading  # For building each object only once across threads
+
+# ==============================================================================
+# Part 2: Lazy objects
+# ==============================================================================
+
+class LazyObject:
+    """Proxy that builds its target with `factory()` on first attribute access."""
+
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_target", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def get(self):
+        """Return the target, building it if this is the first use."""
+        target = object.__getattribute__(self, "_target")
+        if target is None:
+            with object.__getattribute__(self, "_lock"):
+                target = object.__getattribute__(self, "_target")
+                if target is None:
+                    target = object.__getattribute__(self, "_factory")()
+                    object.__setattr__(self, "_target", target)
+        return target
+
+    @property
+    def built(self):
+        """Whether the target has been built yet."""
+        return object.__getattribute__(self, "_target") is not None
+
+    def __getattr__(self, name):
+        # Special names are looked up by copy/pickle on half-initialized proxies
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
+
+    def __repr__(self):
+        if self.built:
+            return f"<LazyObject {self.get()!r}>"
+        return f"<LazyObject (not built) {object.__getattribute__(self, '_factory')!r}>"
+
+
+def lazy_import(name):
+    """Return a proxy for module `name` that imports it on first attribute access."""
+    return LazyObject(lambda: importlib.import_module(name))
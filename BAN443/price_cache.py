@@ -0,0 +1,329 @@
+# ==============================================================================
+# Persistent local OHLCV cache for yfinance price history
+# ==============================================================================
+#
+# Daily bars are stored per symbol in a local SQLite database together with
+# the date range that has already been downloaded. A request for any date
+# range is served from disk, and only the missing edges of the range are
+# downloaded from Yahoo Finance. Bars from today onwards are never marked as
+# covered, so an unfinished trading day is fetched again on the next request.
+# For Oslo Børs symbols, a missing range without trading days (a weekend or
+# holiday) is marked as covered without a download.
+#
+# Note: yfinance returns dividend/split adjusted prices. Cached bars keep the
+# adjustment that was current when they were downloaded; call
+# `PriceStore.clear(symbol)` to refresh a symbol after a corporate action.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import json  # For storing the indicator state
+import os  # For file and directory management
+import sqlite3  # For the on-disk price store
+from datetime import datetime, timedelta  # For working with dates
+from zoneinfo import ZoneInfo  # For timezone support
+
+# Third-party libraries
+import pandas as pd  # For returning price history as DataFrames
+
+# Local modules
+from indicators import IndicatorState  # Streaming indicator state stored next to the prices
+from lazy import lazy_import  # Deferred imports
+from tracing import span  # Per-stage latency spans
+from trading_calendar import previous_trading_day, trading_days_between  # Oslo Børs trading days
+
+yf = lazy_import("yfinance")  # For fetching stock data (imported on the first download)
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+CACHE_DIR = os.getenv("BAN443_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+MARKET_TIMEZONE = "Europe/Oslo"
+OSLO_SUFFIX = ".OL"  # Yahoo Finance suffix of the symbols that follow the Oslo Børs calendar
+
+# DataFrame columns returned by yf.Ticker().history() and their database names
+COLUMNS = {
+    "Open": "open",
+    "High": "high",
+    "Low": "low",
+    "Close": "close",
+    "Volume": "volume",
+    "Dividends": "dividends",
+    "Stock Splits": "stock_splits",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    symbol TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL, high REAL, low REAL, close REAL,
+    volume INTEGER, dividends REAL, stock_splits REAL,
+    PRIMARY KEY (symbol, date)
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    symbol TEXT PRIMARY KEY,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    timezone TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS indicator_state (
+    symbol TEXT PRIMARY KEY,
+    last_date TEXT NOT NULL,
+    state TEXT NOT NULL
+);
+"""
+
+# ==============================================================================
+# Part 3: Helper functions
+# ==============================================================================
+
+def _to_date(value):
+    """Convert a 'YYYY-MM-DD' string, datetime or date to a date."""
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _today():
+    """Return today's date on the Oslo exchange."""
+    return datetime.now(ZoneInfo(MARKET_TIMEZONE)).date()
+
+
+def _seed_start(end):
+    """Return the first day of the history used to seed a new indicator state before `end`."""
+    return previous_trading_day(end, IndicatorState.warmup_bars())
+
+
+def download_history(symbol, start, end):
+    """Download daily bars for [start, end) from Yahoo Finance."""
+    with span("yf_history", symbol=symbol, range=f"{start}..{end}") as stage:
+        frame = yf.Ticker(symbol).history(start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d"))
+        stage.set(rows=len(frame))
+    return frame
+
+
+def has_trading_days(symbol, start, end):
+    """Whether [start, end) can contain bars (always True outside Oslo Børs and its calendar)."""
+    if not symbol.endswith(OSLO_SUFFIX):
+        return True
+    try:
+        return trading_days_between(start, end) > 0
+    except ValueError:
+        return True
+
+
+def missing_ranges(coverage, start, end):
+    """
+    Return the [start, end) date ranges that are not yet covered.
+
+    `coverage` is the (start, end) range already stored, or None. Gaps between
+    the request and the stored range are included, so coverage stays one
+    contiguous range.
+    """
+    if start >= end:
+        return []
+    if coverage is None:
+        return [(start, end)]
+
+    covered_start, covered_end = coverage
+    ranges = []
+    if start < covered_start:
+        ranges.append((start, covered_start))
+    if end > covered_end:
+        ranges.append((covered_end, end))
+    return ranges
+
+
+# ==============================================================================
+# Part 4: Price store
+# ==============================================================================
+
+class PriceStore:
+    """SQLite-backed store of daily OHLCV bars that fills gaps from yfinance."""
+
+    def __init__(self, path=None, downloader=download_history):
+        self.path = path or os.path.join(CACHE_DIR, "prices.sqlite")
+        self.downloader = downloader
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        """Open a new connection (one per call keeps the store process/thread safe)."""
+        return sqlite3.connect(self.path, timeout=30)
+
+    def coverage(self, symbol):
+        """Return the stored (start, end, timezone) for a symbol, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT start, end, timezone FROM coverage WHERE symbol = ?", (symbol,)
+            ).fetchone()
+        if row is None:
+            return None
+        return _to_date(row[0]), _to_date(row[1]), row[2]
+
+    def history(self, symbol, start, end):
+        """
+        Return daily bars for [start, end) in the same format as
+        yf.Ticker(symbol).history(start=start, end=end), downloading only the
+        missing parts of the range.
+        """
+        start, end = _to_date(start), _to_date(end)
+        with span("price_history", symbol=symbol) as stage:
+            stored = self.coverage(symbol)
+            coverage = stored[:2] if stored else None
+            timezone = stored[2] if stored else None
+
+            downloads = 0
+            for gap_start, gap_end in missing_ranges(coverage, start, end):
+                if has_trading_days(symbol, gap_start, gap_end):
+                    frame = self.downloader(symbol, gap_start, gap_end)
+                    downloads += 1
+                else:
+                    frame = pd.DataFrame()  # Weekend or holiday only: nothing to download
+                if frame.empty and coverage is None:
+                    continue  # Unknown symbol or no data yet: do not record coverage
+                if not frame.empty:
+                    timezone = str(frame.index.tz or MARKET_TIMEZONE)
+                # Bars from today onwards may still change and are not marked as covered
+                covered_end = min(gap_end, _today())
+                new_start = min(gap_start, coverage[0]) if coverage else gap_start
+                new_end = max(covered_end, coverage[1]) if coverage else covered_end
+                self._store(symbol, frame, new_start, max(new_start, new_end), timezone or MARKET_TIMEZONE)
+                coverage = (new_start, max(new_start, new_end))
+
+            frame = self._load(symbol, start, end, timezone or MARKET_TIMEZONE)
+            stage.set(downloads=downloads, rows=len(frame))
+            return frame
+
+    def _store(self, symbol, frame, start, end, timezone):
+        """Insert the downloaded bars and update the symbol's coverage."""
+        rows = []
+        if not frame.empty:
+            dates = frame.index.strftime("%Y-%m-%d")
+            values = frame.reindex(columns=list(COLUMNS))
+            values = values.fillna({"Volume": 0, "Dividends": 0.0, "Stock Splits": 0.0})
+            for day, bar in zip(dates, values.itertuples(index=False)):
+                rows.append((symbol, day, *[float(v) for v in bar[:4]], int(bar[4]), float(bar[5]), float(bar[6])))
+
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?)",
+                (symbol, start.isoformat(), end.isoformat(), timezone),
+            )
+
+    def _load(self, symbol, start, end, timezone):
+        """Read the stored bars for [start, end) into a DataFrame."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT date, {', '.join(COLUMNS.values())} FROM prices "
+                "WHERE symbol = ? AND date >= ? AND date < ? ORDER BY date",
+                (symbol, start.isoformat(), end.isoformat()),
+            ).fetchall()
+
+        frame = pd.DataFrame([row[1:] for row in rows], columns=list(COLUMNS))
+        frame.index = pd.DatetimeIndex([row[0] for row in rows], name="Date").tz_localize(timezone)
+        return frame.astype({column: "float64" for column in COLUMNS} | {"Volume": "int64"})
+
+    def indicator_state(self, symbol, end=None):
+        """
+        Return the IndicatorState of a symbol with every bar before `end`
+        (default and latest: today, so an unfinished day is never included).
+
+        The state is stored next to the prices, so the next call only feeds it
+        the bars added since. A new state is seeded from the trading days the
+        indicators need to converge (IndicatorState.warmup_bars()); an `end`
+        before the stored state gets a fresh, unsaved state.
+        """
+        end = min(_to_date(end), _today()) if end is not None else _today()
+        with self._connect() as conn:
+            row = conn.execute("SELECT state FROM indicator_state WHERE symbol = ?", (symbol,)).fetchone()
+        state = IndicatorState.from_dict(json.loads(row[0])) if row else None
+
+        if state is not None and state.last_date is not None:
+            if _to_date(state.last_date) >= end:
+                # The stored state is past the anchor and cannot be rolled back; keep it for later calls
+                return IndicatorState.from_history(self.history(symbol, _seed_start(end), end))
+            state.extend(self.history(symbol, _to_date(state.last_date) + timedelta(days=1), end))
+        else:
+            state = IndicatorState.from_history(self.history(symbol, _seed_start(end), end))
+
+        if state.last_date is not None:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO indicator_state VALUES (?, ?, ?)",
+                    (symbol, state.last_date, json.dumps(state.to_dict())),
+                )
+        return state
+
+    def clear(self, symbol=None):
+        """Remove the cached bars (and indicator state) for one symbol, or for all symbols."""
+        with self._connect() as conn:
+            if symbol is None:
+                conn.execute("DELETE FROM prices")
+                conn.execute("DELETE FROM coverage")
+                conn.execute("DELETE FROM indicator_state")
+            else:
+                conn.execute("DELETE FROM prices WHERE symbol = ?", (symbol,))
+                conn.execute("DELETE FROM coverage WHERE symbol = ?", (symbol,))
+                conn.execute("DELETE FROM indicator_state WHERE symbol = ?", (symbol,))
+
+
+# ==============================================================================
+# Part 5: Module-level shortcuts
+# ==============================================================================
+
+_default_store = None
+
+
+def _shared_store():
+    """Return the shared price store."""
+    global _default_store
+    if _default_store is None:
+        _default_store = PriceStore()
+    return _default_store
+
+
+def get_history(symbol, start, end):
+    """Return cached daily bars for [start, end), downloading only what is missing."""
+    return _shared_store().history(symbol, start, end)
+
+
+_company_names = {}  # {symbol: company name} fetched in this process
+
+
+def company_name(symbol):
+    """Return the company name of a symbol from yfinance, or None if it cannot be fetched."""
+    if symbol not in _company_names:
+        try:
+            info = yf.Ticker(symbol).info
+        except Exception:  # Offline or unknown symbol: search by the ticker alone
+            return None
+        name = info.get("longName") or info.get("shortName")
+        if not name:
+            return None
+        _company_names[symbol] = name
+    return _company_names[symbol]
+
+
+def watchlist_metrics(symbols, end=None, label="event"):
+    """
+    Return {symbol: pre-window metrics} for an anchor date `end` (default:
+    today), updating each symbol's stored indicator state with the new bars
+    only. Symbols without enough data map to the error message instead.
+    """
+    results = {}
+    for symbol in symbols:
+        try:
+            results[symbol] = _shared_store().indicator_state(symbol, end).metrics(label)
+        except ValueError as e:
+            results[symbol] = str(e)
+    return results
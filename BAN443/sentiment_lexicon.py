@@ -0,0 +1,282 @@
+# ==============================================================================
+# Finance-lexicon sentiment scorer for a fast mode and a GPT gate
+# ==============================================================================
+#
+# Scores the extracted article text against a finance sentiment lexicon in
+# the style of Loughran and McDonald (2011): every text becomes a sparse row
+# of term counts, and the positive and negative counts are the products of
+# that matrix with the lexicon's weight vectors. As in their word lists, a
+# positive term within three words after a negation ("not", "no", "never",
+# ...) counts as negative.
+#
+# The net tone (positive - negative) / (positive + negative) gives a
+# Bullish / Neutral / Bearish estimate, and the confidence grows with the
+# strength of the tone and the number of sentiment terms behind it. Long
+# texts with hardly any sentiment terms are confidently Neutral.
+#
+# The sentiment mode decides how the chatbots use the estimate:
+#
+#   gpt      every classification goes to GPT (the default)
+#   lexicon  the lexicon answers every classification, without GPT
+#   gate     the lexicon answers when its confidence reaches the gate
+#            threshold; uncertain cases are escalated to GPT
+#
+# The mode is set with the BAN443_SENTIMENT environment variable, in the GUI
+# or with batch_backtest.py --sentiment. The built-in word lists are a compact
+# subset; the full Loughran-McDonald master dictionary (CSV with Word,
+# Positive and Negative columns) is used instead when BAN443_LEXICON points to
+# it.
+#
+# Usage:
+#   python sentiment_lexicon.py article1.txt article2.txt
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import csv  # For reading the Loughran-McDonald master dictionary
+import math  # For the confidence curves
+import os  # For environment variable management
+import re  # For splitting the text into words
+import sys  # For the command-line arguments
+from collections import namedtuple  # For the score records
+
+# Third-party libraries
+import numpy as np  # For the count and weight vectors
+
+# Local modules
+from lazy import lazy_import  # Deferred imports
+from tracing import span  # Per-stage latency spans
+
+sparse = lazy_import("scipy.sparse")  # For the term-count matrix
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+SENTIMENT_MODES = ("gpt", "lexicon", "gate")
+SENTIMENT_MODE = os.getenv("BAN443_SENTIMENT", "gpt").lower()
+LEXICON_PATH = os.getenv("BAN443_LEXICON")  # Optional Loughran-McDonald master dictionary (CSV)
+
+TONE_THRESHOLD = 0.2  # Net tone from which the estimate is Bullish (or, negated, Bearish)
+STRONG_TONE = 0.6  # Net tone at which the direction itself is fully certain
+EVIDENCE_TERMS = 8  # Sentiment terms after which the evidence is ~63% of its maximum
+QUIET_DENSITY = 0.01  # Sentiment terms per word below which a text reads as neutral
+QUIET_WORDS = 200  # Words after which a quiet text's neutrality is ~63% certain
+GATE_CONFIDENCE = 0.7  # Confidence from which the gate answers without GPT
+NEGATION_WINDOW = 3  # Words after a negation in which positive terms count as negative
+
+WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+NEGATIONS = frozenset({
+    "no", "not", "never", "none", "neither", "nor", "nobody", "nothing", "nowhere", "without",
+    "isn't", "aren't", "wasn't", "weren't", "don't", "doesn't", "didn't", "won't", "wouldn't",
+    "can't", "cannot", "couldn't", "shouldn't", "hasn't", "haven't", "hadn't",
+})
+
+POSITIVE_TERMS = frozenset("""
+    achieve achieved achievement achievements achieves achieving advance advanced advances advancing
+    advantage advantageous advantages attractive beneficial benefit benefited benefits benefiting
+    best better boost boosted boosting boosts breakthrough breakthroughs confident delight delighted
+    efficiencies efficiency efficient enable enabled enables enhance enhanced enhancement enhances
+    enhancing excellent exceed exceeded exceeding exceeds exceptional excited exciting favorable
+    favourable gain gained gaining gains good great greater greatest growth highest impressive improve
+    improved improvement improvements improves improving increase increased increases increasing
+    innovative leading outperform outperformed outperforming outperforms positive positively profitable
+    profitability progress progressed progressing rebound rebounded rebounds record recovery rise rises
+    rising robust solid stable strength strengthen strengthened strengthening strengths strong stronger
+    strongest success successes successful successfully surpass surpassed surpasses surpassing upgrade
+    upgraded upgrades upturn win winning wins
+""".split())
+
+NEGATIVE_TERMS = frozenset("""
+    adverse adversely against bankrupt bankruptcy breach breached challenge challenges challenging
+    claim claims closure closures concern concerned concerns cut cuts cutting damage damaged damages
+    decline declined declines declining decrease decreased decreases decreasing default defaulted
+    defaults deficit deficits delay delayed delays deteriorate deteriorated deteriorating
+    deterioration difficult difficulties difficulty disappoint disappointed disappointing
+    disappointment dispute disputes doubt doubts downgrade downgraded downgrades downturn drop dropped
+    dropping drops fail failed failing fails failure failures fall fallen falling falls fined fines
+    fraud impairment impairments investigation investigations lawsuit lawsuits layoff layoffs
+    litigation loss losses lost lower lowest negative negatively penalties penalty plunge plunged
+    plunges poor problem problems recall recalled recession restructuring serious severe
+    shortfall shortfalls slowdown slump slumped suspend suspended suspension termination threat threats
+    unable unfavorable unfavourable warn warned warning warnings weak weaken weakened weakening weaker
+    weakness worse worsen worsened worsening worst writedown writedowns
+""".split())
+
+# ==============================================================================
+# Part 3: The lexicon
+# ==============================================================================
+
+LexiconScore = namedtuple(
+    "LexiconScore", "predicted_class confidence net_tone positive negative words top_terms"
+)
+
+
+class Lexicon:
+    """Positive and negative finance terms as weight vectors over a shared term axis."""
+
+    def __init__(self, positive=POSITIVE_TERMS, negative=NEGATIVE_TERMS):
+        self.terms = sorted(set(positive) | set(negative))
+        self.columns = {term: column for column, term in enumerate(self.terms)}
+        is_positive = np.array([term in positive for term in self.terms], dtype=np.float64)
+        is_negative = np.array([term in negative for term in self.terms], dtype=np.float64)
+
+        # The count matrix has a column per term and one per negated term: a negated
+        # positive term counts as negative, a negated negative term stays negative
+        self.positive_weights = np.concatenate([is_positive, np.zeros(len(self.terms))])
+        self.negative_weights = np.concatenate([is_negative, np.maximum(is_positive, is_negative)])
+
+    def __len__(self):
+        return len(self.terms)
+
+    def term_counts(self, texts):
+        """Return (sparse counts of shape (texts, 2 * terms), words per text) for a list of texts."""
+        rows, columns, words = [], [], np.zeros(len(texts), dtype=np.int64)
+        for row, text in enumerate(texts):
+            tokens = WORD_PATTERN.findall(text.lower().replace("’", "'"))
+            words[row] = len(tokens)
+            if not tokens:
+                continue
+            # Look up each distinct word once and spread the result over its occurrences
+            vocabulary, occurrences = np.unique(np.array(tokens), return_inverse=True)
+            ids = np.array([self.columns.get(word, -1) for word in vocabulary])[occurrences]
+            if not (ids >= 0).any():
+                continue
+
+            # Whether one of the previous NEGATION_WINDOW words is a negation
+            negation = np.array([word in NEGATIONS for word in vocabulary], dtype=np.int64)[occurrences]
+            window = np.cumsum(np.concatenate([[0], negation]))
+            start = np.maximum(np.arange(len(tokens)) - NEGATION_WINDOW, 0)
+            negated = window[np.arange(len(tokens))] - window[start] > 0
+
+            hits = ids >= 0
+            columns.append(ids[hits] + negated[hits] * len(self.terms))
+            rows.append(np.full(hits.sum(), row))
+
+        shape = (len(texts), 2 * len(self.terms))
+        if not rows:
+            return sparse.csr_matrix(shape, dtype=np.float64), words
+        rows, columns = np.concatenate(rows), np.concatenate(columns)
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=shape), words
+
+    def score_texts(self, texts):
+        """Return one LexiconScore per text."""
+        counts, words = self.term_counts(texts)
+        return [
+            _score(positive, negative, words[row], self._top_terms(counts[row]))
+            for row, (positive, negative) in enumerate(zip(counts @ self.positive_weights,
+                                                           counts @ self.negative_weights))
+        ]
+
+    def score_articles(self, articles):
+        """Return the LexiconScore of all articles of {name: text} together."""
+        counts, words = self.term_counts(list(articles.values()))
+        total = sparse.csr_matrix(counts.sum(axis=0))
+        return _score((total @ self.positive_weights)[0], (total @ self.negative_weights)[0],
+                      int(words.sum()), self._top_terms(total))
+
+    def _top_terms(self, counts_row, limit=5):
+        """Return [(term, count)] of the most frequent sentiment terms in one row of counts."""
+        folded = np.asarray(counts_row.todense()).ravel()
+        folded = folded[:len(self.terms)] + folded[len(self.terms):]
+        top = np.argsort(-folded, kind="stable")[:limit]
+        return [(self.terms[column], int(folded[column])) for column in top if folded[column] > 0]
+
+
+def load_lexicon(path):
+    """Read a Loughran-McDonald master dictionary CSV (nonzero Positive/Negative marks a term)."""
+    positive, negative = set(), set()
+    with open(path, newline="", encoding="utf-8") as lexicon_file:
+        for row in csv.DictReader(lexicon_file):
+            word = row["Word"].strip().lower()
+            if float(row.get("Positive") or 0):
+                positive.add(word)
+            if float(row.get("Negative") or 0):
+                negative.add(word)
+    return Lexicon(positive, negative)
+
+
+# ==============================================================================
+# Part 4: Classification
+# ==============================================================================
+
+def _score(positive, negative, words, top_terms):
+    """Turn the positive and negative counts of a text into a LexiconScore."""
+    positive, negative = int(round(positive)), int(round(negative))
+    terms = positive + negative
+    net_tone = (positive - negative) / terms if terms else 0.0
+    evidence = 1 - math.exp(-terms / EVIDENCE_TERMS)
+
+    if abs(net_tone) >= TONE_THRESHOLD:
+        predicted_class = "Bullish" if net_tone > 0 else "Bearish"
+        confidence = evidence * min(1.0, abs(net_tone) / STRONG_TONE)
+    else:
+        predicted_class = "Neutral"
+        balanced = evidence * (1 - abs(net_tone) / TONE_THRESHOLD)
+        density = terms / words if words else 0.0
+        quiet = (1 - density / QUIET_DENSITY) * (1 - math.exp(-words / QUIET_WORDS)) if density < QUIET_DENSITY else 0.0
+        confidence = max(balanced, quiet)
+    return LexiconScore(predicted_class, round(float(confidence), 3), round(net_tone, 3), positive, negative,
+                        int(words), top_terms)
+
+
+def describe_score(score, article_count):
+    """Return the score as a classification and summary in the layout of the GPT responses."""
+    terms = ", ".join(f"{term} ({count})" for term, count in score.top_terms) or "none"
+    return (
+        f"Classification: {score.predicted_class}\n"
+        f"Summary: Lexicon estimate with confidence {score.confidence:.2f}. "
+        f"{score.positive} positive and {score.negative} negative finance terms in {score.words:,} words "
+        f"across {article_count} article(s), net tone {score.net_tone:+.2f}. Most frequent terms: {terms}."
+    )
+
+
+_default_lexicon = None
+
+
+def _shared_lexicon():
+    """Return the lexicon used by the chatbots (the master dictionary if BAN443_LEXICON is set)."""
+    global _default_lexicon
+    if _default_lexicon is None:
+        _default_lexicon = load_lexicon(LEXICON_PATH) if LEXICON_PATH else Lexicon()
+    return _default_lexicon
+
+
+def score_articles(articles):
+    """Return the LexiconScore of all articles of {name: text} together."""
+    return _shared_lexicon().score_articles(articles)
+
+
+def prescore_sentiment(articles, mode=None, min_confidence=GATE_CONFIDENCE):
+    """
+    Return the lexicon's response for {name: text} if the sentiment mode lets
+    it answer, or None if the articles should go to GPT.
+    """
+    mode = (mode or SENTIMENT_MODE).lower()
+    if mode not in SENTIMENT_MODES:
+        raise ValueError(f"Unknown sentiment mode '{mode}' (expected one of {', '.join(SENTIMENT_MODES)}).")
+    if mode == "gpt" or not articles:
+        return None
+
+    with span("lexicon_sentiment", mode=mode, articles=len(articles)) as stage:
+        score = score_articles(articles)
+        answered = mode == "lexicon" or score.confidence >= min_confidence
+        stage.set(predicted_class=score.predicted_class, confidence=score.confidence,
+                  gpt_calls_saved=int(answered))
+    return describe_score(score, len(articles)) if answered else None
+
+
+# ==============================================================================
+# Part 5: Command-line interface
+# ==============================================================================
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python sentiment_lexicon.py article1.txt [article2.txt ...]")
+    texts = {}
+    for path in sys.argv[1:]:
+        with open(path, encoding="utf-8") as article_file:
+            texts[os.path.basename(path)] = article_file.read()
+    print(describe_score(score_articles(texts), len(texts)))
@@ -0,0 +1,133 @@
+# ==============================================================================
+# Structured (JSON schema) predictions with a short, validated rationale
+# ==============================================================================
+#
+# In the structured prediction format, the prediction request uses Azure
+# OpenAI structured outputs: the response must follow a JSON schema with the
+# class, a confidence between 0 and 1 and a rationale of at most
+# RATIONALE_WORDS words, and the output is capped at STRUCTURED_MAX_TOKENS
+# tokens instead of the 1800 of the prose answer. Every response is validated
+# locally, so the batch runs read the class from the JSON instead of searching
+# the text; a response that fails validation is not cached. The prose answer with the full rationale stays available as the
+# "text" format.
+#
+# The format is set with the BAN443_PREDICTION_FORMAT environment variable
+# ("text" or "json"), in the GUIs or with batch_backtest.py --prediction-format.
+# Structured outputs need API version 2024-08-01-preview or later.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import json  # For parsing and storing the predictions
+import math  # For checking the confidence
+import os  # For environment variable management
+
+# Local modules
+from completion_cache import completion_cache  # On-disk cache for GPT completions
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+PREDICTION_FORMATS = ("text", "json")
+PREDICTION_FORMAT = os.getenv("BAN443_PREDICTION_FORMAT", "text").lower()
+PREDICTION_CLASSES = ("Bullish", "Neutral", "Bearish")
+RATIONALE_WORDS = 40  # Longest rationale kept
+STRUCTURED_MAX_TOKENS = 150  # Output cap of a structured prediction
+
+PREDICTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "class": {"type": "string", "enum": list(PREDICTION_CLASSES)},
+        "confidence": {"type": "number", "description": "Probability between 0 and 1 that the class is right"},
+        "rationale": {"type": "string", "description": f"The main drivers, at most {RATIONALE_WORDS} words"},
+    },
+    "required": ["class", "confidence", "rationale"],
+    "additionalProperties": False,
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "stock_prediction", "strict": True, "schema": PREDICTION_SCHEMA},
+}
+
+STRUCTURED_INSTRUCTIONS = (
+    "\n\n### Output Format ###\n"
+    "Answer only with a JSON object with the fields 'class' (Bullish, Neutral or Bearish), "
+    "'confidence' (probability between 0 and 1 that the class is right) and 'rationale' "
+    f"(the main drivers of the prediction in at most {RATIONALE_WORDS} words)."
+)
+
+# ==============================================================================
+# Part 3: Validation
+# ==============================================================================
+
+def parse_prediction(text):
+    """
+    Validate a structured prediction and return {"class", "confidence", "rationale"}.
+
+    Raises ValueError if the text is not a JSON object with a known class and a
+    confidence between 0 and 1. A rationale longer than RATIONALE_WORDS words
+    is cut to that length.
+    """
+    try:
+        prediction = json.loads(text)
+    except (TypeError, ValueError):
+        raise ValueError("The prediction is not valid JSON.") from None
+    if not isinstance(prediction, dict):
+        raise ValueError("The prediction is not a JSON object.")
+
+    predicted_class = str(prediction.get("class", "")).capitalize()
+    if predicted_class not in PREDICTION_CLASSES:
+        raise ValueError(f"Unknown prediction class '{prediction.get('class')}'.")
+    try:
+        confidence = float(prediction.get("confidence"))
+    except (TypeError, ValueError):
+        raise ValueError("The prediction has no numeric confidence.") from None
+    if math.isnan(confidence) or not 0 <= confidence <= 1:
+        raise ValueError(f"The confidence {confidence} is not between 0 and 1.")
+
+    rationale = " ".join(str(prediction.get("rationale", "")).split()[:RATIONALE_WORDS])
+    return {"class": predicted_class, "confidence": round(confidence, 3), "rationale": rationale}
+
+
+def prediction_class(text):
+    """Return the class of a structured prediction, or '' if the text is not one."""
+    try:
+        return parse_prediction(text)["class"]
+    except ValueError:
+        return ""
+
+
+def format_prediction(prediction):
+    """Return a validated prediction as text for the chat display."""
+    return (
+        f"Prediction: {prediction['class']} (confidence {prediction['confidence']:.2f})\n"
+        f"Rationale: {prediction['rationale']}"
+    )
+
+# ==============================================================================
+# Part 4: Requests
+# ==============================================================================
+
+def structured_prediction(client, messages, model="GPT4o-API", temperature=0.3):
+    """
+    Request a structured prediction for the chat messages and return it validated.
+    An answer that fails validation is not cached, so the next request asks again.
+    """
+    text = completion_cache.complete(
+        client, model=model, messages=messages, max_tokens=STRUCTURED_MAX_TOKENS,
+        temperature=temperature, response_format=RESPONSE_FORMAT, validate=prediction_class,
+    )
+    return parse_prediction(text)
+
+
+async def structured_prediction_async(chat_client, messages, temperature=0.3):
+    """Async variant of structured_prediction() for an async_gpt.AsyncChatClient."""
+    text = await completion_cache.complete_async(
+        chat_client, messages, max_tokens=STRUCTURED_MAX_TOKENS, temperature=temperature,
+        response_format=RESPONSE_FORMAT, validate=prediction_class,
+    )
+    return parse_prediction(text)
@@ -0,0 +1,253 @@
+# ==============================================================================
+# Lightweight tracing spans for the analysis pipelines
+# ==============================================================================
+#
+# Wrap a stage in `with span("download_pdf", blob=name) as s:` (or decorate a
+# function with `@traced("fetch_company_info")`) to record how long it takes.
+# Spans nest: a span opened inside another one records it as its parent, and
+# `bind(fn)` carries the current span into thread pool workers. Attributes
+# such as bytes or token counts can be added with `s.set(...)`.
+#
+# Tracing is off unless BAN443_TRACE names a JSON-lines file (or `enable()` is
+# called). When it is off, `span()` returns a shared no-op object, so the
+# instrumentation costs a function call and a branch per stage.
+#
+# Summarize a trace file with p50/p95/p99 per stage:
+#   python tracing.py trace.jsonl
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+import contextvars  # For tracking the current span per thread and task
+import functools  # For the traced() decorator
+import itertools  # For numbering spans
+import json  # For writing spans as JSON lines
+import os  # For the trace file setting and process ids
+import sys  # For the command-line interface
+import threading  # For serializing writes to the trace file
+import time  # For span timestamps and durations
+
+# ==============================================================================
+# Part 2: Trace writer
+# ==============================================================================
+
+class _TraceWriter:
+    """Appends finished spans to a JSON-lines file (safe across threads and forked processes)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._pid = None
+        self._file = None
+        self._lock = None
+
+    def write(self, record):
+        if self._pid != os.getpid():
+            # A forked worker process must not share the parent's file object or lock
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._file = None
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line)
+
+
+_writer = _TraceWriter(os.environ["BAN443_TRACE"]) if os.getenv("BAN443_TRACE") else None
+_current = contextvars.ContextVar("ban443_span", default=None)
+_ids = itertools.count(1)
+
+# A forked worker process starts outside the span that was open when it was created
+os.register_at_fork(after_in_child=lambda: _current.set(None))
+
+
+def enable(path):
+    """Start writing spans to `path` (also in worker processes started afterwards)."""
+    global _writer
+    os.environ["BAN443_TRACE"] = path
+    _writer = _TraceWriter(path)
+
+
+def disable():
+    """Stop recording spans."""
+    global _writer
+    os.environ.pop("BAN443_TRACE", None)
+    _writer = None
+
+
+def is_enabled():
+    """Whether spans are being recorded."""
+    return _writer is not None
+
+
+# ==============================================================================
+# Part 3: Spans
+# ==============================================================================
+
+class Span:
+    """A timed stage. Use as a context manager; the record is written when it exits."""
+
+    __slots__ = ("name", "attrs", "span_id", "parent", "trace_id", "_start", "_wall", "_token")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.parent = _current.get()
+        self.span_id = f"{os.getpid():x}-{next(_ids):x}"
+        self.trace_id = self.parent.trace_id if self.parent is not None else self.span_id
+
+    def set(self, **attrs):
+        """Add attributes (e.g. bytes=..., prompt_tokens=...) to the span."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self._wall = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        _current.reset(self._token)
+        record = dict(self.attrs)
+        record.update({
+            "name": self.name,
+            "trace": self.trace_id,
+            "span": self.span_id,
+            "parent": self.parent.span_id if self.parent is not None else None,
+            "start": self._wall,
+            "ms": round(elapsed * 1000, 3),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+        })
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        writer = _writer
+        if writer is not None:
+            writer.write(record)
+        return False
+
+
+class _NullSpan:
+    """Stand-in returned by span() while tracing is off."""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **attrs):
+    """Return a span for the stage `name` (a no-op while tracing is off)."""
+    if _writer is None:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+
+def traced(name=None):
+    """Decorator that records every call of a function as a span."""
+    def decorate(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _writer is None:
+                return function(*args, **kwargs)
+            with Span(span_name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bind(function):
+    """Return `function` wrapped so that spans it opens on another thread nest under the current span."""
+    parent = _current.get()
+    if parent is None:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+
+# ==============================================================================
+# Part 4: Summaries
+# ==============================================================================
+
+SUMMED_ATTRIBUTES = (
+    "bytes", "prompt_tokens", "cached_tokens", "completion_tokens", "tokens_saved", "gpt_calls_saved",
+)
+
+
+def _percentile(sorted_values, q):
+    """Linearly interpolated percentile of an already sorted list."""
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(path):
+    """Return {stage: {count, errors, p50, p95, p99, total_ms, bytes, ...}} for a trace file."""
+    durations, totals = {}, {}
+    with open(path, encoding="utf-8") as trace_file:
+        for line in trace_file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            durations.setdefault(record["name"], []).append(record["ms"])
+            stage_totals = totals.setdefault(record["name"], {"errors": 0})
+            stage_totals["errors"] += "error" in record
+            for attribute in SUMMED_ATTRIBUTES:
+                if isinstance(record.get(attribute), (int, float)):
+                    stage_totals[attribute] = stage_totals.get(attribute, 0) + record[attribute]
+
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        summary[name] = {
+            "count": len(values),
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "p99": _percentile(values, 99),
+            "total_ms": sum(values),
+            **totals[name],
+        }
+    return summary
+
+
+def format_summary(summary):
+    """Format a summary as a table, slowest stages (by total time) first."""
+    lines = [f"{'stage':34} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'total s':>9}  other"]
+    for name, stats in sorted(summary.items(), key=lambda item: -item[1]["total_ms"]):
+        other = ", ".join(f"{key}={stats[key]:,}" for key in SUMMED_ATTRIBUTES if key in stats)
+        if stats["errors"]:
+            other = f"errors={stats['errors']}" + (f", {other}" if other else "")
+        lines.append(
+            f"{name:34} {stats['count']:6} {stats['p50']:10.1f} {stats['p95']:10.1f} "
+            f"{stats['p99']:10.1f} {stats['total_ms'] / 1000:9.2f}  {other}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python tracing.py trace.jsonl")
+    print(format_summary(summarize(sys.argv[1])))
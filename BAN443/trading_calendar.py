@@ -0,0 +1,164 @@
+# ==============================================================================
+# Oslo Børs trading calendar
+# ==============================================================================
+#
+# Precomputed index of the exchange's trading days, so that event dates can be
+# checked and shifted by whole trading days without downloading prices first.
+# Weekends and the exchange holidays below are closed; the holidays that move
+# with Easter are derived from the Easter date of each year.
+#
+#   is_trading_day("2024-03-28")        -> False (Maundy Thursday)
+#   next_trading_day("2024-03-27", 3)   -> 2024-04-04, the 3rd trading day after
+#   previous_trading_day("2024-04-02")  -> 2024-03-27
+#   trading_days_between(start, end)    -> number of trading days in [start, end)
+#
+# Note: the calendar knows the regular holidays only. An extraordinary closure
+# still shows up as a missing bar in the downloaded data.
+
+# ==============================================================================
+# Part 1 - Import necessary packages
+# ==============================================================================
+
+# Built-in libraries
+from datetime import date, datetime, timedelta  # For working with dates
+from functools import lru_cache  # For building the index once
+
+# Third-party libraries
+import numpy as np  # For the sorted index of trading days
+
+# ==============================================================================
+# Part 2: Settings
+# ==============================================================================
+
+FIRST_YEAR = 1990  # Range covered by the precomputed index
+LAST_YEAR = 2099
+
+# Holidays on a fixed date: (month, day)
+FIXED_HOLIDAYS = (
+    (1, 1),  # New Year's Day
+    (5, 1),  # Labour Day
+    (5, 17),  # Constitution Day
+    (12, 24),  # Christmas Eve
+    (12, 25),  # Christmas Day
+    (12, 26),  # Boxing Day
+    (12, 31),  # New Year's Eve
+)
+
+# Holidays relative to Easter Sunday: days after Easter
+EASTER_HOLIDAYS = (
+    -3,  # Maundy Thursday
+    -2,  # Good Friday
+    1,  # Easter Monday
+    39,  # Ascension Day
+    50,  # Whit Monday
+)
+
+# Half days (early close at 13:00): days after Easter Sunday
+EASTER_HALF_DAYS = (
+    -4,  # Wednesday before Maundy Thursday
+)
+
+# ==============================================================================
+# Part 3: Holidays
+# ==============================================================================
+
+def _to_date(value):
+    """Convert a 'YYYY-MM-DD' string, datetime, Timestamp or date to a date."""
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def easter_sunday(year):
+    """Return the date of Easter Sunday (Gregorian calendar, anonymous algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def holidays(year):
+    """Return the exchange holidays of a year (including those on weekends), sorted."""
+    easter = easter_sunday(year)
+    days = {date(year, month, day) for month, day in FIXED_HOLIDAYS}
+    days.update(easter + timedelta(days=offset) for offset in EASTER_HOLIDAYS)
+    return sorted(days)
+
+
+def half_days(year):
+    """Return the trading days of a year on which the exchange closes early."""
+    easter = easter_sunday(year)
+    return [easter + timedelta(days=offset) for offset in EASTER_HALF_DAYS]
+
+
+# ==============================================================================
+# Part 4: Trading-day index
+# ==============================================================================
+
+@lru_cache(maxsize=1)
+def _index():
+    """Return the sorted trading days and half days of FIRST_YEAR..LAST_YEAR as datetime64[D] arrays."""
+    closed = [day for year in range(FIRST_YEAR, LAST_YEAR + 1) for day in holidays(year)]
+    calendar = np.busdaycalendar(holidays=np.array(closed, dtype="datetime64[D]"))
+    days = np.arange(f"{FIRST_YEAR}-01-01", f"{LAST_YEAR + 1}-01-01", dtype="datetime64[D]")
+    half = [day for year in range(FIRST_YEAR, LAST_YEAR + 1) for day in half_days(year)]
+    return days[np.is_busday(days, busdaycal=calendar)], np.array(half, dtype="datetime64[D]")
+
+
+def _position(day):
+    """Return (index of the first trading day on or after `day`, whether `day` is a trading day)."""
+    day = _to_date(day)
+    if not FIRST_YEAR <= day.year <= LAST_YEAR:
+        raise ValueError(f"The date {day} is outside the trading calendar ({FIRST_YEAR}-{LAST_YEAR}).")
+    sessions = _index()[0]
+    position = int(sessions.searchsorted(np.datetime64(day, "D")))
+    return position, position < len(sessions) and sessions[position] == np.datetime64(day, "D")
+
+
+def _session(position):
+    """Return the trading day at a position of the index."""
+    sessions = _index()[0]
+    if not 0 <= position < len(sessions):
+        raise ValueError(f"The trading day is outside the trading calendar ({FIRST_YEAR}-{LAST_YEAR}).")
+    return sessions[position].astype(date)
+
+
+def is_trading_day(day):
+    """Whether Oslo Børs is open on a date."""
+    return _position(day)[1]
+
+
+def is_half_day(day):
+    """Whether Oslo Børs closes early on a date."""
+    return np.datetime64(_to_date(day), "D") in _index()[1]
+
+
+def next_trading_day(day, count=1):
+    """Return the `count`-th trading day after a date."""
+    position, is_session = _position(day)
+    return _session(position + count - 1 + is_session)
+
+
+def previous_trading_day(day, count=1):
+    """Return the `count`-th trading day before a date."""
+    position, _ = _position(day)
+    return _session(position - count)
+
+
+def trading_days_between(start, end):
+    """Return the number of trading days in [start, end)."""
+    return max(0, _position(end)[0] - _position(start)[0])
+
+
+def trading_days(start, end):
+    """Return the trading days in [start, end) as a list of dates."""
+    first, last = _position(start)[0], _position(end)[0]
+    return [day.astype(date) for day in _index()[0][first:last]]